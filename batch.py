@@ -0,0 +1,193 @@
+"""
+Headless batch runner for the Research Agent
+
+Reads research jobs from a JSONL file, one per line, either
+{"query": "..."} or {"template": "technology", "topic": "..."}, with an
+optional "id". Jobs run concurrently and each result is appended to the
+output JSONL as soon as it completes. Re-running with the same output file
+skips jobs that already completed successfully.
+
+Usage: python batch.py jobs.jsonl results.jsonl [--workers N] [--no-resume]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Set, Tuple
+
+from config import get_config
+from cache import get_cached_result, cache_result, single_flight
+from templates import get_template_queries, get_template_research_query
+
+def read_jobs(input_path: Path) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Yield (job id, job) for each non-empty line; the id defaults to line-<line number>"""
+    with open(input_path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                job = json.loads(line)
+            except json.JSONDecodeError as e:
+                job = {'invalid': f"line {line_number} is not valid JSON: {e}"}
+            if not isinstance(job, dict):
+                job = {'query': str(job)}
+            # Prefixed so a default id can never equal an explicit "id" on another line
+            yield str(job.get('id', f"line-{line_number}")), job
+
+def completed_ids(output_path: Path) -> Set[str]:
+    """Ids of jobs already recorded as successful in an output file"""
+    done = set()
+    if not output_path.exists():
+        return done
+    with open(output_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A line cut short by an interrupted run; the job is simply redone
+                continue
+            if record.get('status') == 'ok':
+                done.add(str(record.get('id')))
+    return done
+
+def run_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Research one job and return its ResearchResponse as a dict, using and filling the research cache"""
+    # Imported lazily so --help works without building the agent
+    from main import run_research_agent, run_template_research
+    
+    if 'invalid' in job:
+        raise ValueError(job['invalid'])
+    
+    if 'template' in job:
+        topic = str(job.get('topic', '')).strip()
+        questions = get_template_queries(job['template'], topic)
+        if not topic or not questions:
+            raise ValueError(f"unknown template '{job['template']}' or missing topic")
+        # Same cache key as template research from the interactive menu
+        cache_key = get_template_research_query(topic, questions)
+        research = lambda: run_template_research(topic, questions)
+    else:
+        cache_key = str(job.get('query', '')).strip()
+        if not cache_key:
+            raise ValueError("job has neither 'query' nor 'template'")
+        research = lambda: run_research_agent(cache_key)
+    
+    cached = get_cached_result(cache_key, "research")
+    if cached:
+        return cached
+    with single_flight(cache_key, "research"):
+        cached = get_cached_result(cache_key, "research")
+        if cached:
+            return cached
+        structured_response = research()
+        if structured_response is None:
+            raise RuntimeError("no sub-question could be answered")
+        result = structured_response.dict()
+        cache_result(cache_key, result, "research")
+        return result
+
+def run_batch(input_path: Path, output_path: Path, workers: Optional[int] = None, resume: bool = True) -> Dict[str, int]:
+    """
+    Run every job in input_path and append one JSON record per job to output_path.
+
+    At most workers jobs run at once and only a few more are read ahead, so
+    memory stays flat for inputs of any length. Upstream load is further
+    bounded by provider_rate_limits and provider_concurrency. With resume,
+    jobs whose id already has an "ok" record in output_path are skipped;
+    failed jobs are retried.
+    """
+    # Build the agent once here rather than racing to import it from the worker threads
+    import main  # noqa: F401
+    
+    workers = workers or get_config().batch_workers
+    done = completed_ids(output_path) if resume else set()
+    submitted: Set[str] = set()
+    counts = {'ok': 0, 'error': 0, 'skipped': 0}
+    started = time.perf_counter()
+    
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch")
+    with open(output_path, 'a' if resume else 'w', encoding='utf-8') as out:
+        running: Dict[Future, Tuple[str, Dict[str, Any], float]] = {}
+        
+        def write(job_id: str, job: Dict[str, Any], outcome: Dict[str, Any], job_started: float) -> None:
+            record = {'id': job_id, **{key: job[key] for key in ('query', 'template', 'topic') if key in job}, **outcome}
+            record.update(
+                elapsed_seconds=round(time.perf_counter() - job_started, 2),
+                completed_at=datetime.now().isoformat(timespec='seconds')
+            )
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+            counts[record['status']] += 1
+            print(f"[{counts['ok'] + counts['error']}] {record['status']}: {job_id} ({record['elapsed_seconds']}s)", file=sys.stderr)
+        
+        def collect(finished) -> None:
+            for future in finished:
+                job_id, job, job_started = running.pop(future)
+                try:
+                    outcome = {'status': 'ok', 'response': future.result()}
+                except Exception as e:
+                    outcome = {'status': 'error', 'error': str(e)}
+                write(job_id, job, outcome, job_started)
+        
+        try:
+            for job_id, job in read_jobs(input_path):
+                if job_id in submitted:
+                    write(job_id, job, {'status': 'error', 'error': f"duplicate job id '{job_id}'; give each job a unique id"}, time.perf_counter())
+                    continue
+                submitted.add(job_id)
+                if job_id in done:
+                    counts['skipped'] += 1
+                    continue
+                # Keep the queue short so a huge input is read as jobs finish
+                while len(running) >= workers * 2:
+                    finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                    collect(finished)
+                running[executor.submit(run_job, job)] = (job_id, job, time.perf_counter())
+            
+            while running:
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                collect(finished)
+        except KeyboardInterrupt:
+            # Drop queued jobs, then save the ones already running as they finish
+            for future in [future for future in running if future.cancel()]:
+                del running[future]
+            print(f"Interrupted; saving {len(running)} running jobs as they finish (Ctrl-C again to abandon them). "
+                  "Unsaved jobs will run on resume", file=sys.stderr)
+            try:
+                while running:
+                    finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                    collect(finished)
+            except KeyboardInterrupt:
+                print(f"Abandoned {len(running)} running jobs", file=sys.stderr)
+            raise
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    counts['seconds'] = round(time.perf_counter() - started)
+    return counts
+
+def main() -> None:
+    """Parse the command line and run a batch"""
+    arg_parser = argparse.ArgumentParser(description="Run research jobs from a JSONL file without the interactive menu")
+    arg_parser.add_argument("input", type=Path, help="JSONL file of jobs: {\"query\": ...} or {\"template\": ..., \"topic\": ...}")
+    arg_parser.add_argument("output", type=Path, help="JSONL file the results are appended to")
+    arg_parser.add_argument("--workers", type=int, default=None, help="jobs to run at once (default: batch_workers from the config)")
+    arg_parser.add_argument("--no-resume", action="store_true", help="overwrite the output instead of skipping jobs already completed in it")
+    args = arg_parser.parse_args()
+    
+    try:
+        counts = run_batch(args.input, args.output, args.workers, resume=not args.no_resume)
+    except KeyboardInterrupt:
+        # Exit without joining worker threads still running abandoned jobs; every saved record is already flushed
+        sys.stderr.flush()
+        os._exit(130)
+    print(f"Done: {counts['ok']} ok, {counts['error']} failed, {counts['skipped']} skipped in {counts['seconds']}s", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
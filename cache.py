@@ -1,13 +1,171 @@
 """
 Caching system for the Research Agent
 """
-import os
-import json
 import hashlib
+import json
+import os
+import threading
 import time
-from typing import Optional, Any, Dict
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Optional, Any, Callable, Dict, Iterator, List, Tuple
 from pathlib import Path
 from config import get_config
+from cache_backends import create_cache_backend
+from similarity import QuerySimilarityIndex
+
+def normalize_query(query: str) -> str:
+    """Collapse whitespace and lowercase a query, keeping the case of URLs, as cache keys do"""
+    query = " ".join(str(query).split())
+    if not query.lower().startswith(("http://", "https://")):
+        query = query.lower()
+    return query
+
+class MemoryCache:
+    """Bounded in-process LRU cache with per-entry expiry"""
+    
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._entries: "OrderedDict[str, Tuple[Any, int, float]]" = OrderedDict()
+        self._next_expiry = float('inf')
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value, or None if missing or expired"""
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            
+            value, size, expires_at = item
+            if expires_at <= time.time():
+                self._remove(key)
+                return None
+            
+            self._entries.move_to_end(key)
+            return value
+    
+    def put(self, key: str, value: Any, size: int, expires_at: float) -> None:
+        """Store a value, evicting expired and then least recently used entries"""
+        if size > self.max_bytes or self.max_entries <= 0:
+            return
+        
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            
+            self._entries[key] = (value, size, expires_at)
+            self.total_bytes += size
+            self._next_expiry = min(self._next_expiry, expires_at)
+            
+            if len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes:
+                self._evict_expired()
+            
+            while len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+    
+    def delete(self, key: str) -> None:
+        """Drop a key if present"""
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+    
+    def clear(self) -> None:
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+            self._next_expiry = float('inf')
+    
+    def _remove(self, key: str) -> None:
+        _, size, _ = self._entries.pop(key)
+        self.total_bytes -= size
+    
+    def _evict_expired(self) -> None:
+        """Drop expired entries; skipped entirely until the earliest expiry has passed"""
+        now = time.time()
+        if now < self._next_expiry:
+            return
+        
+        next_expiry = float('inf')
+        for key, (_, _, expires_at) in list(self._entries.items()):
+            if expires_at <= now:
+                self._remove(key)
+            else:
+                next_expiry = min(next_expiry, expires_at)
+        self._next_expiry = next_expiry
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+class FileLock:
+    """Exclusive cross-process lock backed by a lock file
+
+    On POSIX systems the lock file is removed on release; a waiter that
+    wakes up holding a lock on an already-removed file retries on the new
+    one, so stale lock files never accumulate.
+    """
+    
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._fd: Optional[int] = None
+    
+    def _try_lock(self, fd: int) -> bool:
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            return False
+    
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """Block until the lock is held or timeout seconds pass; return whether it was acquired"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            fd = os.open(str(self.path), os.O_RDWR | os.O_CREAT, 0o644)
+            if self._try_lock(fd):
+                if fcntl is None or (os.path.exists(self.path) and os.stat(self.path).st_ino == os.fstat(fd).st_ino):
+                    self._fd = fd
+                    return True
+            os.close(fd)
+            
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+    
+    def release(self) -> None:
+        """Release the lock and remove the lock file"""
+        if self._fd is None:
+            return
+        
+        if fcntl is not None:
+            try:
+                self.path.unlink()
+            except FileNotFoundError:
+                pass
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        else:
+            msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+        os.close(self._fd)
+        self._fd = None
+    
+    def __enter__(self) -> "FileLock":
+        self.acquire()
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        self.release()
 
 class CacheManager:
     """Manages caching of research results and API responses"""
@@ -16,127 +174,281 @@ class CacheManager:
         self.config = get_config()
         self.cache_dir = Path(self.config.cache_directory)
         self.cache_dir.mkdir(exist_ok=True)
+        self.backend = create_cache_backend(self.config)
+        self.memory = MemoryCache(
+            max_entries=self.config.memory_cache_max_entries,
+            max_bytes=int(self.config.memory_cache_max_mb * 1024 * 1024)
+        )
+        self.counters = {'memory_hits': 0, 'memory_misses': 0, 'disk_hits': 0, 'disk_misses': 0}
+        self._counters_lock = threading.Lock()
+        self._cleanup_thread: Optional[threading.Thread] = None
+        self._similarity_indexes: Dict[str, QuerySimilarityIndex] = {}
+        self._similarity_lock = threading.Lock()
+        self.lock_dir = self.cache_dir / "locks"
+        self.lock_dir.mkdir(exist_ok=True)
+        self._key_locks: Dict[str, list] = {}
+        self._key_locks_lock = threading.Lock()
     
     def _get_cache_key(self, query: str, tool_name: str = "general") -> str:
-        """Generate a cache key for a query"""
-        combined = f"{tool_name}:{query.lower().strip()}"
+        """Generate a cache key for a query; URL paths and query strings keep their case"""
+        combined = f"{tool_name}:{normalize_query(query)}"
         return hashlib.md5(combined.encode()).hexdigest()
     
-    def _get_cache_file(self, cache_key: str) -> Path:
-        """Get the cache file path for a given key"""
-        return self.cache_dir / f"{cache_key}.json"
+    def _count(self, counter: str, amount: int = 1) -> None:
+        # Lookups run on every worker thread, and += on a dict item is not atomic
+        with self._counters_lock:
+            self.counters[counter] += amount
     
-    def _is_cache_valid(self, cache_file: Path) -> bool:
-        """Check if cache file is still valid (not expired)"""
-        if not cache_file.exists():
-            return False
-        
-        try:
-            with open(cache_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            cached_time = data.get('timestamp', 0)
-            current_time = time.time()
-            
-            # Check if cache is within the valid duration
-            cache_duration_seconds = self.config.cache_duration_hours * 3600
-            return (current_time - cached_time) < cache_duration_seconds
-            
-        except (json.JSONDecodeError, KeyError):
-            return False
+    def _is_cache_valid(self, entry: Dict[str, Any]) -> bool:
+        """Check if a cache entry is still valid (not expired)"""
+        return time.time() < self._get_expiry(entry)
+    
+    def _get_ttl_seconds(self, tool_name: str) -> float:
+        """Get the TTL policy for a tool, falling back to cache_duration_hours"""
+        hours = self.config.cache_ttl_hours.get(tool_name, self.config.cache_duration_hours)
+        return hours * 3600
+    
+    def _get_expiry(self, entry: Dict[str, Any]) -> float:
+        """Get the absolute expiry time of an entry"""
+        if 'expires_at' in entry:
+            return entry['expires_at']
+        ttl_seconds = entry.get('ttl_seconds') or self._get_ttl_seconds(entry.get('tool_name', 'general'))
+        return entry.get('timestamp', 0) + ttl_seconds
+    
+    def _remember(self, cache_key: str, result: Any, expires_at: float) -> None:
+        """Keep a result in the memory tier until it expires"""
+        size = len(json.dumps(result, ensure_ascii=False, default=str).encode('utf-8'))
+        self.memory.put(cache_key, result, size, expires_at)
     
     def get_cached_result(self, query: str, tool_name: str = "general") -> Optional[Any]:
         """Get cached result for a query"""
         if not self.config.enable_caching:
             return None
         
-        cache_key = self._get_cache_key(query, tool_name)
-        cache_file = self._get_cache_file(cache_key)
+        return self._lookup(self._get_cache_key(query, tool_name))
+    
+    def _lookup(self, cache_key: str) -> Optional[Any]:
+        """Look a key up in the memory tier, then in the backend"""
+        result = self.memory.get(cache_key)
+        if result is not None:
+            self._count('memory_hits')
+            return result
+        self._count('memory_misses')
         
-        if self._is_cache_valid(cache_file):
-            try:
-                with open(cache_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                return data.get('result')
-            except (json.JSONDecodeError, KeyError):
-                pass
+        entry = self.backend.get(cache_key)
         
+        if entry and self._is_cache_valid(entry):
+            self._count('disk_hits')
+            self._remember(cache_key, entry.get('result'), self._get_expiry(entry))
+            return entry.get('result')
+        
+        self._count('disk_misses')
         return None
     
+    def get_cached_results(self, queries: List[str], tool_name: str = "general") -> Dict[str, Any]:
+        """Get cached results for several queries with one backend round trip, keyed by query"""
+        if not self.config.enable_caching:
+            return {}
+        
+        results = {}
+        missing = {}
+        for query in queries:
+            cache_key = self._get_cache_key(query, tool_name)
+            result = self.memory.get(cache_key)
+            if result is not None:
+                self._count('memory_hits')
+                results[query] = result
+            else:
+                self._count('memory_misses')
+                missing.setdefault(cache_key, []).append(query)
+        
+        entries = self.backend.get_many(list(missing)) if missing else {}
+        for cache_key, pending in missing.items():
+            entry = entries.get(cache_key)
+            if entry and self._is_cache_valid(entry):
+                self._count('disk_hits', len(pending))
+                self._remember(cache_key, entry.get('result'), self._get_expiry(entry))
+                results.update((query, entry.get('result')) for query in pending)
+            else:
+                self._count('disk_misses', len(pending))
+        return results
+    
     def cache_result(self, query: str, result: Any, tool_name: str = "general") -> None:
         """Cache a result for a query"""
         if not self.config.enable_caching:
             return
         
         cache_key = self._get_cache_key(query, tool_name)
-        cache_file = self._get_cache_file(cache_key)
         
         cache_data = {
             'query': query,
             'tool_name': tool_name,
             'result': result,
-            'timestamp': time.time()
+            'timestamp': time.time(),
+            'ttl_seconds': self._get_ttl_seconds(tool_name)
         }
+        cache_data['expires_at'] = cache_data['timestamp'] + cache_data['ttl_seconds']
         
         try:
-            with open(cache_file, 'w', encoding='utf-8') as f:
-                json.dump(cache_data, f, indent=2, ensure_ascii=False)
+            self.backend.put(cache_key, cache_data)
+            self._remember(cache_key, result, cache_data['expires_at'])
         except Exception as e:
             print(f"Warning: Could not cache result: {e}")
+            return
+        
+        index = self._similarity_indexes.get(tool_name)
+        if index is not None:
+            index.add(cache_key, query)
     
-    def clear_cache(self) -> int:
-        """Clear all cached files and return count of files deleted"""
-        deleted_count = 0
+    @contextmanager
+    def single_flight(self, query: str, tool_name: str = "general") -> Iterator[None]:
+        """Let only one thread or process at a time fill the cache entry for a query
+
+        Callers that arrive while another caller holds the key block until
+        it finishes, then re-check the cache instead of redoing the work. If
+        the holder takes longer than cache_lock_timeout_seconds the waiter
+        proceeds without the lock rather than failing.
+        """
+        cache_key = self._get_cache_key(query, tool_name)
+        
+        with self._key_locks_lock:
+            holder = self._key_locks.setdefault(cache_key, [threading.Lock(), 0])
+            holder[1] += 1
         
-        if self.cache_dir.exists():
-            for cache_file in self.cache_dir.glob("*.json"):
+        try:
+            with holder[0]:
+                file_lock = FileLock(self.lock_dir / f"{cache_key}.lock")
+                acquired = file_lock.acquire(self.config.cache_lock_timeout_seconds)
                 try:
-                    cache_file.unlink()
-                    deleted_count += 1
-                except Exception as e:
-                    print(f"Warning: Could not delete cache file {cache_file}: {e}")
+                    yield
+                finally:
+                    if acquired:
+                        file_lock.release()
+        finally:
+            with self._key_locks_lock:
+                holder[1] -= 1
+                if holder[1] == 0:
+                    del self._key_locks[cache_key]
+    
+    def get_or_compute(self, query: str, producer: Callable[[], Any], tool_name: str = "general",
+                       should_cache: Optional[Callable[[Any], bool]] = None) -> Any:
+        """Return the cached result for a query, computing it once across concurrent callers on a miss"""
+        result = self.get_cached_result(query, tool_name)
+        if result is not None or not self.config.enable_caching:
+            return result if result is not None else producer()
         
-        return deleted_count
+        with self.single_flight(query, tool_name):
+            # Another caller may have filled the entry while we waited
+            result = self.get_cached_result(query, tool_name)
+            if result is not None:
+                return result
+            
+            result = producer()
+            if should_cache is None or should_cache(result):
+                self.cache_result(query, result, tool_name)
+            return result
     
-    def get_cache_stats(self) -> Dict[str, Any]:
-        """Get statistics about the cache"""
-        if not self.cache_dir.exists():
-            return {'total_files': 0, 'total_size_mb': 0, 'valid_files': 0}
+    def _get_similarity_index(self, tool_name: str) -> QuerySimilarityIndex:
+        """Build the similarity index for a tool from the backend on first use"""
+        with self._similarity_lock:
+            index = self._similarity_indexes.get(tool_name)
+            if index is None:
+                index = QuerySimilarityIndex()
+                for cache_key, query in self.backend.iter_queries(tool_name, time.time()):
+                    index.add(cache_key, query)
+                self._similarity_indexes[tool_name] = index
+            return index
+    
+    def find_similar_result(self, query: str, tool_name: str = "research") -> Optional[Tuple[Any, str, float]]:
+        """Find a cached result for a near-duplicate query
+
+        Returns (result, matched query, similarity) when a prior query scores
+        at or above similarity_threshold, otherwise None.
+        """
+        if not (self.config.enable_caching and self.config.enable_similarity_cache):
+            return None
         
-        total_files = 0
-        total_size = 0
-        valid_files = 0
+        index = self._get_similarity_index(tool_name)
+        match = index.find(query, self.config.similarity_threshold)
+        if match is None:
+            return None
         
-        for cache_file in self.cache_dir.glob("*.json"):
-            total_files += 1
-            total_size += cache_file.stat().st_size
-            
-            if self._is_cache_valid(cache_file):
-                valid_files += 1
+        cache_key, matched_query, score = match
+        result = self._lookup(cache_key)
+        if result is None:
+            # The entry expired or was removed since it was indexed
+            index.remove(cache_key)
+            return None
+        return result, matched_query, score
+    
+    def clear_cache(self) -> int:
+        """Clear all cached entries and return count of entries deleted"""
+        self.memory.clear()
+        self._similarity_indexes.clear()
+        return self.backend.clear()
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Get statistics about the cache from the backend's expiry index"""
+        total_files, total_size, raw_size = self.backend.count_entries()
+        expired_files = self.backend.count_expired(time.time())
+        with self._counters_lock:
+            counters = dict(self.counters)
         
         return {
             'total_files': total_files,
             'total_size_mb': round(total_size / (1024 * 1024), 2),
-            'valid_files': valid_files,
-            'expired_files': total_files - valid_files
+            'uncompressed_size_mb': round(raw_size / (1024 * 1024), 2),
+            'compression_ratio': round(raw_size / total_size, 2) if total_size else 1.0,
+            'valid_files': total_files - expired_files,
+            'expired_files': expired_files,
+            'memory_entries': len(self.memory),
+            'memory_size_mb': round(self.memory.total_bytes / (1024 * 1024), 2),
+            **counters
         }
     
-    def cleanup_expired_cache(self) -> int:
-        """Remove expired cache files and return count of files deleted"""
-        deleted_count = 0
-        
-        if not self.cache_dir.exists():
-            return 0
+    def get_stale_result(self, query: str, tool_name: str = "general") -> Optional[Tuple[Any, float]]:
+        """Get an expired result that is still within the stale grace window
+
+        Returns (result, age in seconds) when stale_while_revalidate is on and
+        the entry expired less than stale_grace_hours ago, otherwise None.
+        """
+        if not (self.config.enable_caching and self.config.stale_while_revalidate):
+            return None
         
-        for cache_file in self.cache_dir.glob("*.json"):
-            if not self._is_cache_valid(cache_file):
-                try:
-                    cache_file.unlink()
-                    deleted_count += 1
-                except Exception as e:
-                    print(f"Warning: Could not delete expired cache file {cache_file}: {e}")
+        entry = self.backend.get(self._get_cache_key(query, tool_name))
+        if not entry:
+            return None
         
-        return deleted_count
+        now = time.time()
+        if now - self._get_expiry(entry) > self._get_stale_grace_seconds():
+            return None
+        return entry.get('result'), now - entry.get('timestamp', now)
+    
+    def _get_stale_grace_seconds(self) -> float:
+        """Get how long expired entries are kept for stale-while-revalidate"""
+        return self.config.stale_grace_hours * 3600 if self.config.stale_while_revalidate else 0
+    
+    def cleanup_expired_cache(self) -> int:
+        """Remove expired cache entries and return count of entries deleted"""
+        return self.backend.delete_expired(time.time() - self._get_stale_grace_seconds())
+    
+    def start_background_cleanup(self, batch_size: int = 500) -> threading.Thread:
+        """Remove expired cache entries in small batches on a daemon thread"""
+        if self._cleanup_thread is None or not self._cleanup_thread.is_alive():
+            self._cleanup_thread = threading.Thread(
+                target=self._sweep_expired, args=(batch_size,), name="cache-cleanup", daemon=True
+            )
+            self._cleanup_thread.start()
+        return self._cleanup_thread
+    
+    def _sweep_expired(self, batch_size: int) -> None:
+        """Delete expired entries batch by batch until none are left"""
+        try:
+            while self.backend.delete_expired(time.time() - self._get_stale_grace_seconds(), batch_size) >= batch_size:
+                # Give foreground readers and writers a chance at the store between batches
+                time.sleep(0.01)
+        except Exception as e:
+            print(f"Warning: Background cache cleanup failed: {e}")
 
 # Global cache manager instance
 cache_manager = CacheManager()
@@ -145,12 +457,33 @@ def get_cached_result(query: str, tool_name: str = "general") -> Optional[Any]:
     """Get cached result for a query"""
     return cache_manager.get_cached_result(query, tool_name)
 
+def get_cached_results(queries: List[str], tool_name: str = "general") -> Dict[str, Any]:
+    """Get cached results for several queries"""
+    return cache_manager.get_cached_results(queries, tool_name)
+
 def cache_result(query: str, result: Any, tool_name: str = "general") -> None:
     """Cache a result for a query"""
     cache_manager.cache_result(query, result, tool_name)
 
+def get_stale_result(query: str, tool_name: str = "general") -> Optional[Tuple[Any, float]]:
+    """Get an expired result still within the stale grace window"""
+    return cache_manager.get_stale_result(query, tool_name)
+
+def find_similar_result(query: str, tool_name: str = "research") -> Optional[Tuple[Any, str, float]]:
+    """Find a cached result for a near-duplicate query"""
+    return cache_manager.find_similar_result(query, tool_name)
+
+def single_flight(query: str, tool_name: str = "general"):
+    """Serialize fills of one cache entry across threads and processes"""
+    return cache_manager.single_flight(query, tool_name)
+
+def get_or_compute(query: str, producer: Callable[[], Any], tool_name: str = "general",
+                   should_cache: Optional[Callable[[Any], bool]] = None) -> Any:
+    """Get a cached result, computing it once on a miss"""
+    return cache_manager.get_or_compute(query, producer, tool_name, should_cache)
+
 def clear_cache() -> int:
-    """Clear all cached files"""
+    """Clear all cached entries"""
     return cache_manager.clear_cache()
 
 def get_cache_stats() -> Dict[str, Any]:
@@ -158,5 +491,9 @@ def get_cache_stats() -> Dict[str, Any]:
     return cache_manager.get_cache_stats()
 
 def cleanup_expired_cache() -> int:
-    """Remove expired cache files"""
+    """Remove expired cache entries"""
     return cache_manager.cleanup_expired_cache()
+
+def start_background_cleanup() -> threading.Thread:
+    """Remove expired cache entries incrementally in the background"""
+    return cache_manager.start_background_cleanup()
@@ -0,0 +1,853 @@
+"""
+Storage backends for the Research Agent cache
+"""
+import bisect
+import gzip
+import json
+import os
+import queue
+import random
+import socket
+import sqlite3
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional, Any, Callable, Dict, Iterator, List, Sequence, Tuple
+from urllib.parse import urlsplit, unquote
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# WATCH conflicts on one entry before a Redis transaction gives up; each retry re-reads the replaced sizes
+TRANSACTION_ATTEMPTS = 10
+
+def encode_payload(value: Any, compression: str = "auto", threshold: int = 1024) -> Tuple[bytes, int]:
+    """Serialize a cached result compactly, compressing it above threshold bytes
+
+    The first byte names the serializer (j = JSON, m = msgpack) and the
+    second the compression (n = none, g = gzip, z = zstd), so decode_payload
+    can read any mix of formats. Returns the encoded bytes and the size of
+    the uncompressed serialization.
+    """
+    if msgpack is not None:
+        codec, data = b"m", msgpack.packb(value, use_bin_type=True, default=str)
+    else:
+        codec, data = b"j", json.dumps(value, ensure_ascii=False, separators=(',', ':'), default=str).encode('utf-8')
+    
+    raw_size = len(data)
+    method = b"n"
+    if compression != "none" and raw_size > threshold:
+        if compression in ("auto", "zstd") and zstandard is not None:
+            compressed, candidate = zstandard.ZstdCompressor(level=6).compress(data), b"z"
+        else:
+            compressed, candidate = gzip.compress(data, compresslevel=6, mtime=0), b"g"
+        if len(compressed) < raw_size:
+            data, method = compressed, candidate
+    
+    return codec + method + data, raw_size
+
+def decode_payload(payload: Any) -> Any:
+    """Decode a payload written by encode_payload or a legacy JSON text value"""
+    if isinstance(payload, str):
+        return json.loads(payload)
+    
+    codec, method, data = payload[:1], payload[1:2], payload[2:]
+    if method == b"z":
+        if zstandard is None:
+            raise ValueError("zstandard is required to read this cache entry")
+        data = zstandard.ZstdDecompressor().decompress(data)
+    elif method == b"g":
+        data = gzip.decompress(data)
+    
+    if codec == b"m":
+        if msgpack is None:
+            raise ValueError("msgpack is required to read this cache entry")
+        return msgpack.unpackb(data, raw=False)
+    return json.loads(data.decode('utf-8'))
+
+class CacheBackend(ABC):
+    """Interface for persistent cache storage
+
+    Entries are plain dictionaries with 'query', 'tool_name', 'result',
+    'timestamp', 'ttl_seconds' and 'expires_at' keys, matching the layout of
+    the original JSON cache files plus the TTL policy applied when the entry
+    was written and the resulting absolute expiry time. Backends keep expiry in an
+    index so statistics and cleanup never need to load cached results.
+    """
+    
+    @abstractmethod
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the entry stored under key, or None"""
+    
+    def get_many(self, keys: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        """Return the entries stored under several keys, omitting missing ones"""
+        entries = {}
+        for key in keys:
+            entry = self.get(key)
+            if entry is not None:
+                entries[key] = entry
+        return entries
+    
+    @abstractmethod
+    def put(self, key: str, entry: Dict[str, Any]) -> None:
+        """Store an entry under key, replacing any existing one"""
+    
+    @abstractmethod
+    def delete(self, key: str) -> bool:
+        """Delete an entry and return whether it existed"""
+    
+    @abstractmethod
+    def clear(self) -> int:
+        """Delete all entries and return how many were removed"""
+    
+    @abstractmethod
+    def iter_queries(self, tool_name: str, now: float) -> Iterator[Tuple[str, str]]:
+        """Yield (key, query) for every unexpired entry of a tool"""
+    
+    @abstractmethod
+    def count_entries(self) -> Tuple[int, int, int]:
+        """Return the number of entries, their stored size and their uncompressed size in bytes"""
+    
+    @abstractmethod
+    def count_expired(self, now: float) -> int:
+        """Return the number of entries whose expiry is at or before now"""
+    
+    @abstractmethod
+    def delete_expired(self, now: float, limit: Optional[int] = None) -> int:
+        """Delete up to limit entries expired at now and return the count"""
+    
+    def close(self) -> None:
+        """Release any resources held by the backend"""
+
+class SQLiteCacheBackend(CacheBackend):
+    """Single-file cache store backed by SQLite in WAL mode
+
+    Entry counts and sizes are kept in a one-row cache_stats table that
+    triggers maintain, and expires_at is indexed, so statistics read one
+    row plus an index-only count and cleanup touches only expired rows. Results are stored
+    as encode_payload blobs; rows written as JSON text by older versions
+    are still readable.
+    """
+    
+    def __init__(self, db_path: Path, default_ttl_seconds: float = 24 * 3600,
+                 compression: str = "auto", compression_threshold: int = 1024):
+        self.db_path = Path(db_path)
+        self.compression = compression
+        self.compression_threshold = compression_threshold
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        # Wait for other processes' write transactions instead of failing with "database is locked"
+        self._conn.execute("PRAGMA busy_timeout=10000")
+        self._create_schema(default_ttl_seconds)
+    
+    def _create_schema(self, default_ttl_seconds: float) -> None:
+        """Create tables, indexes and triggers, upgrading older databases in place"""
+        # The upgrade runs in one write transaction so an interrupted upgrade leaves
+        # the old schema intact, and a concurrent process sees either schema whole
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS cache_entries (
+                    key TEXT PRIMARY KEY,
+                    tool_name TEXT NOT NULL,
+                    query TEXT NOT NULL,
+                    result TEXT NOT NULL,
+                    timestamp REAL NOT NULL,
+                    size INTEGER NOT NULL,
+                    expires_at REAL NOT NULL DEFAULT 0,
+                    ttl_seconds REAL NOT NULL DEFAULT 0,
+                    raw_size INTEGER NOT NULL DEFAULT 0
+                )"""
+            )
+            
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(cache_entries)")}
+            if 'expires_at' not in columns:
+                self._conn.execute("ALTER TABLE cache_entries ADD COLUMN expires_at REAL NOT NULL DEFAULT 0")
+                self._conn.execute("UPDATE cache_entries SET expires_at = timestamp + ?", (default_ttl_seconds,))
+            if 'ttl_seconds' not in columns:
+                self._conn.execute("ALTER TABLE cache_entries ADD COLUMN ttl_seconds REAL NOT NULL DEFAULT 0")
+                self._conn.execute("UPDATE cache_entries SET ttl_seconds = expires_at - timestamp")
+            if 'raw_size' not in columns:
+                self._conn.execute("ALTER TABLE cache_entries ADD COLUMN raw_size INTEGER NOT NULL DEFAULT 0")
+                self._conn.execute("UPDATE cache_entries SET raw_size = size")
+            
+            stats_columns = {row[1] for row in self._conn.execute("PRAGMA table_info(cache_stats)")}
+            if stats_columns and 'raw_bytes' not in stats_columns:
+                self._conn.execute("DROP TABLE cache_stats")
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        
+        # Triggers are recreated in one transaction so the counters never miss a write
+        self._conn.executescript(
+            """
+            BEGIN IMMEDIATE;
+            CREATE INDEX IF NOT EXISTS idx_cache_entries_timestamp ON cache_entries (timestamp);
+            CREATE INDEX IF NOT EXISTS idx_cache_entries_expires_at ON cache_entries (expires_at);
+            CREATE INDEX IF NOT EXISTS idx_cache_entries_tool_name ON cache_entries (tool_name, expires_at);
+            
+            CREATE TABLE IF NOT EXISTS cache_stats (
+                id INTEGER PRIMARY KEY CHECK (id = 0),
+                entries INTEGER NOT NULL,
+                bytes INTEGER NOT NULL,
+                raw_bytes INTEGER NOT NULL DEFAULT 0
+            );
+            INSERT OR IGNORE INTO cache_stats (id, entries, bytes, raw_bytes)
+                SELECT 0, COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(raw_size), 0) FROM cache_entries;
+            
+            DROP TRIGGER IF EXISTS cache_entries_insert;
+            DROP TRIGGER IF EXISTS cache_entries_update;
+            DROP TRIGGER IF EXISTS cache_entries_delete;
+            CREATE TRIGGER cache_entries_insert AFTER INSERT ON cache_entries BEGIN
+                UPDATE cache_stats SET entries = entries + 1, bytes = bytes + NEW.size,
+                    raw_bytes = raw_bytes + NEW.raw_size WHERE id = 0;
+            END;
+            CREATE TRIGGER cache_entries_update AFTER UPDATE OF size, raw_size ON cache_entries BEGIN
+                UPDATE cache_stats SET bytes = bytes + NEW.size - OLD.size,
+                    raw_bytes = raw_bytes + NEW.raw_size - OLD.raw_size WHERE id = 0;
+            END;
+            CREATE TRIGGER cache_entries_delete AFTER DELETE ON cache_entries BEGIN
+                UPDATE cache_stats SET entries = entries - 1, bytes = bytes - OLD.size,
+                    raw_bytes = raw_bytes - OLD.raw_size WHERE id = 0;
+            END;
+            COMMIT;
+            """
+        )
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self.get_many([key]).get(key)
+    
+    def get_many(self, keys: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        if not keys:
+            return {}
+        
+        placeholders = ", ".join("?" for _ in keys)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, query, tool_name, result, timestamp, expires_at, ttl_seconds "
+                f"FROM cache_entries WHERE key IN ({placeholders})",
+                list(keys)
+            ).fetchall()
+        
+        entries = {}
+        for key, *row in rows:
+            try:
+                result = decode_payload(row[2])
+            except (ValueError, OSError, EOFError):
+                continue
+            entries[key] = {
+                'query': row[0], 'tool_name': row[1], 'result': result,
+                'timestamp': row[3], 'expires_at': row[4], 'ttl_seconds': row[5]
+            }
+        return entries
+    
+    def put(self, key: str, entry: Dict[str, Any]) -> None:
+        payload, raw_size = encode_payload(entry.get('result'), self.compression, self.compression_threshold)
+        timestamp = entry.get('timestamp', 0)
+        with self._lock:
+            # An upsert (rather than INSERT OR REPLACE) keeps the stats triggers accurate
+            self._conn.execute(
+                """INSERT INTO cache_entries
+                    (key, tool_name, query, result, timestamp, size, expires_at, ttl_seconds, raw_size)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (key) DO UPDATE SET
+                    tool_name = excluded.tool_name, query = excluded.query, result = excluded.result,
+                    timestamp = excluded.timestamp, size = excluded.size, expires_at = excluded.expires_at,
+                    ttl_seconds = excluded.ttl_seconds, raw_size = excluded.raw_size""",
+                (key, entry.get('tool_name', 'general'), entry.get('query', ''), payload,
+                 timestamp, len(payload), entry.get('expires_at', timestamp),
+                 entry.get('ttl_seconds', 0), raw_size)
+            )
+    
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+        return cursor.rowcount > 0
+    
+    def clear(self) -> int:
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM cache_entries")
+        return cursor.rowcount
+    
+    def iter_queries(self, tool_name: str, now: float) -> Iterator[Tuple[str, str]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, query FROM cache_entries WHERE tool_name = ? AND expires_at > ?",
+                (tool_name, now)
+            ).fetchall()
+        yield from rows
+    
+    def count_entries(self) -> Tuple[int, int, int]:
+        with self._lock:
+            row = self._conn.execute("SELECT entries, bytes, raw_bytes FROM cache_stats WHERE id = 0").fetchone()
+        return tuple(row) if row else (0, 0, 0)
+    
+    def count_expired(self, now: float) -> int:
+        with self._lock:
+            # Counted on the expiry index alone, without visiting any table rows
+            row = self._conn.execute(
+                "SELECT COUNT(*) FROM cache_entries INDEXED BY idx_cache_entries_expires_at WHERE expires_at <= ?",
+                (now,)
+            ).fetchone()
+        return row[0]
+    
+    def delete_expired(self, now: float, limit: Optional[int] = None) -> int:
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM cache_entries WHERE key IN "
+                "(SELECT key FROM cache_entries WHERE expires_at <= ? LIMIT ?)",
+                (now, -1 if limit is None else limit)
+            )
+        return cursor.rowcount
+    
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+class JsonFileCacheBackend(CacheBackend):
+    """Legacy layout storing one JSON file per cache key
+
+    Expiry metadata is held in a sorted in-memory index that is built from
+    the directory on first use and then maintained on every write.
+    """
+    
+    def __init__(self, cache_dir: Path, default_ttl_seconds: float = 24 * 3600):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(exist_ok=True)
+        self.default_ttl_seconds = default_ttl_seconds
+        self._lock = threading.Lock()
+        self._index: Optional[Dict[str, Tuple[float, int]]] = None
+        self._expiry_order: List[Tuple[float, str]] = []
+        self._total_size = 0
+    
+    def _get_cache_file(self, key: str) -> Path:
+        """Get the cache file path for a given key"""
+        return self.cache_dir / f"{key}.json"
+    
+    def _load_index(self) -> Dict[str, Tuple[float, int]]:
+        """Build the expiry index with one directory scan, then reuse it"""
+        if self._index is None:
+            self._index = {}
+            for cache_file in self.cache_dir.glob("*.json"):
+                entry = self.get(cache_file.stem) or {}
+                timestamp = entry.get('timestamp', 0)
+                expires_at = entry.get('expires_at', timestamp + self.default_ttl_seconds)
+                self._index_add(cache_file.stem, expires_at, cache_file.stat().st_size)
+        return self._index
+    
+    def _index_add(self, key: str, expires_at: float, size: int) -> None:
+        self._index[key] = (expires_at, size)
+        bisect.insort(self._expiry_order, (expires_at, key))
+        self._total_size += size
+    
+    def _index_remove(self, key: str) -> None:
+        if self._index is None or key not in self._index:
+            return
+        expires_at, size = self._index.pop(key)
+        position = bisect.bisect_left(self._expiry_order, (expires_at, key))
+        if position < len(self._expiry_order) and self._expiry_order[position] == (expires_at, key):
+            del self._expiry_order[position]
+        self._total_size -= size
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._get_cache_file(key), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+    
+    def put(self, key: str, entry: Dict[str, Any]) -> None:
+        cache_file = self._get_cache_file(key)
+        
+        # Write to a temporary file and rename it into place so readers never see a partial entry
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=f".{key}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(temp_path, cache_file)
+        except BaseException:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
+        
+        with self._lock:
+            if self._index is not None:
+                self._index_remove(key)
+                expires_at = entry.get('expires_at', entry.get('timestamp', 0) + self.default_ttl_seconds)
+                self._index_add(key, expires_at, cache_file.stat().st_size)
+    
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            self._index_remove(key)
+        try:
+            self._get_cache_file(key).unlink()
+            return True
+        except FileNotFoundError:
+            return False
+    
+    def clear(self) -> int:
+        deleted_count = 0
+        for cache_file in self.cache_dir.glob("*.json"):
+            try:
+                cache_file.unlink()
+                deleted_count += 1
+            except OSError as e:
+                print(f"Warning: Could not delete cache file {cache_file}: {e}")
+        
+        with self._lock:
+            self._index = {}
+            self._expiry_order = []
+            self._total_size = 0
+        return deleted_count
+    
+    def iter_queries(self, tool_name: str, now: float) -> Iterator[Tuple[str, str]]:
+        with self._lock:
+            keys = [key for key, (expires_at, _) in self._load_index().items() if expires_at > now]
+        
+        for key in keys:
+            entry = self.get(key)
+            if entry and entry.get('tool_name') == tool_name:
+                yield key, entry.get('query', '')
+    
+    def count_entries(self) -> Tuple[int, int, int]:
+        with self._lock:
+            return len(self._load_index()), self._total_size, self._total_size
+    
+    def count_expired(self, now: float) -> int:
+        with self._lock:
+            self._load_index()
+            return bisect.bisect_right(self._expiry_order, (now, '\uffff'))
+    
+    def delete_expired(self, now: float, limit: Optional[int] = None) -> int:
+        with self._lock:
+            self._load_index()
+            count = bisect.bisect_right(self._expiry_order, (now, '\uffff'))
+            expired = [key for _, key in self._expiry_order[:count if limit is None else min(count, limit)]]
+        
+        return sum(1 for key in expired if self.delete(key))
+
+class RespError(Exception):
+    """Error reply from a Redis-compatible server"""
+
+class RespConnection:
+    """A single connection speaking the Redis serialization protocol (RESP2)"""
+    
+    def __init__(self, host: str, port: int, timeout: float):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.reader = self.sock.makefile('rb')
+    
+    @staticmethod
+    def _encode(args: Sequence[Any]) -> bytes:
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            if isinstance(arg, str):
+                arg = arg.encode('utf-8')
+            elif not isinstance(arg, bytes):
+                arg = str(arg).encode('utf-8')
+            parts.extend((b"$%d\r\n" % len(arg), arg, b"\r\n"))
+        return b"".join(parts)
+    
+    def _read_reply(self) -> Any:
+        line = self.reader.readline()
+        if not line.endswith(b"\r\n"):
+            raise ConnectionError("Connection closed by cache server")
+        
+        prefix, body = line[:1], line[1:-2]
+        if prefix == b"+":
+            return body.decode('utf-8')
+        if prefix == b"-":
+            return RespError(body.decode('utf-8'))
+        if prefix == b":":
+            return int(body)
+        if prefix == b"$":
+            length = int(body)
+            return None if length < 0 else self.reader.read(length + 2)[:-2]
+        if prefix == b"*":
+            length = int(body)
+            return None if length < 0 else [self._read_reply() for _ in range(length)]
+        raise ConnectionError(f"Unexpected reply from cache server: {line[:50]!r}")
+    
+    def pipeline(self, commands: Sequence[Sequence[Any]]) -> List[Any]:
+        """Send several commands in one round trip and return their replies in order
+
+        Error replies are returned as RespError instances rather than raised,
+        so one failing command does not leave unread replies on the socket.
+        """
+        self.sock.sendall(b"".join(self._encode(command) for command in commands))
+        return [self._read_reply() for _ in commands]
+    
+    def execute(self, *args: Any) -> Any:
+        """Send one command and return its reply"""
+        reply = self.pipeline([args])[0]
+        if isinstance(reply, RespError):
+            raise reply
+        return reply
+    
+    def close(self) -> None:
+        try:
+            self.reader.close()
+            self.sock.close()
+        except OSError:
+            pass
+
+class RespConnectionPool:
+    """Bounded pool of keep-alive RESP connections created from a redis:// URL"""
+    
+    def __init__(self, url: str, max_connections: int = 8, timeout: float = 2.0):
+        parsed = urlsplit(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.db = int(parsed.path.strip("/") or 0)
+        self.timeout = timeout
+        self._idle: "queue.LifoQueue[RespConnection]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_connections)
+    
+    def _connect(self) -> RespConnection:
+        connection = RespConnection(self.host, self.port, self.timeout)
+        try:
+            if self.password:
+                connection.execute("AUTH", self.password)
+            if self.db:
+                connection.execute("SELECT", self.db)
+        except Exception:
+            connection.close()
+            raise
+        return connection
+    
+    @contextmanager
+    def connection(self) -> Iterator[RespConnection]:
+        """Borrow a connection, discarding it instead of returning it to the pool if anything fails"""
+        if not self._slots.acquire(timeout=self.timeout):
+            raise ConnectionError("Timed out waiting for a cache server connection")
+        
+        try:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                connection = self._connect()
+            
+            healthy = False
+            try:
+                yield connection
+                healthy = True
+            finally:
+                # After any error the connection may hold unread replies or an open WATCH
+                if healthy:
+                    self._idle.put(connection)
+                else:
+                    connection.close()
+        finally:
+            self._slots.release()
+    
+    def close(self) -> None:
+        """Close every idle connection"""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+class RedisCacheBackend(CacheBackend):
+    """Shared cache store on a Redis-compatible server
+
+    Each entry is one encode_payload blob under <namespace>:entry:<key>.
+    A sorted set scored by expires_at is the expiry index, a hash holds
+    per-entry metadata (tool, query, sizes) and another hash keeps running
+    byte totals, so statistics and cleanup never fetch cached results.
+    Entry values also get a server-side TTL of their expiry plus
+    retention_seconds, so the server reclaims them even if no node sweeps;
+    their index records are dropped the next time statistics are read.
+    """
+    
+    def __init__(self, pool: RespConnectionPool, namespace: str = "raworc", compression: str = "auto",
+                 compression_threshold: int = 1024, retention_seconds: float = 0):
+        self.pool = pool
+        self.namespace = namespace
+        self.compression = compression
+        self.compression_threshold = compression_threshold
+        self.retention_seconds = retention_seconds
+        self.expiry_key = f"{namespace}:expiry"
+        self.meta_key = f"{namespace}:meta"
+        self.stats_key = f"{namespace}:stats"
+    
+    def _entry_key(self, key: str) -> str:
+        return f"{self.namespace}:entry:{key}"
+    
+    def _pipeline(self, commands: Sequence[Sequence[Any]]) -> List[Any]:
+        with self.pool.connection() as connection:
+            replies = connection.pipeline(commands)
+        for reply in replies:
+            if isinstance(reply, RespError):
+                raise reply
+        return replies
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self.get_many([key]).get(key)
+    
+    def get_many(self, keys: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        if not keys:
+            return {}
+        
+        payloads = self._pipeline([["MGET", *[self._entry_key(key) for key in keys]]])[0]
+        entries = {}
+        for key, payload in zip(keys, payloads):
+            if payload is None:
+                continue
+            try:
+                entries[key] = decode_payload(payload)
+            except (ValueError, OSError, EOFError):
+                continue
+        return entries
+    
+    def _transaction(self, keys: Sequence[str], read: Callable[[RespConnection], Any],
+                     build: Callable[[Any], List[Sequence[Any]]]) -> List[Any]:
+        """Run build(read(connection)) as one MULTI/EXEC transaction and return its replies
+
+        The value keys of the entries are WATCHed before reading, so if
+        another client writes or deletes one of them in between, EXEC is
+        refused and the read is repeated. Byte totals are therefore always
+        adjusted by the sizes actually replaced, while writers of different
+        entries never conflict.
+        """
+        with self.pool.connection() as connection:
+            for attempt in range(TRANSACTION_ATTEMPTS):
+                if attempt:
+                    time.sleep(random.uniform(0, 0.001 * attempt))
+                connection.execute("WATCH", *[self._entry_key(key) for key in keys])
+                commands = build(read(connection))
+                replies = connection.pipeline([["MULTI"], *commands, ["EXEC"]])
+                for reply in replies[:-1]:
+                    if isinstance(reply, RespError):
+                        raise reply
+                if isinstance(replies[-1], RespError):
+                    raise replies[-1]
+                if replies[-1] is not None:
+                    return replies[-1]
+        raise RespError(f"Cache index kept changing; gave up after {TRANSACTION_ATTEMPTS} attempts")
+    
+    def put(self, key: str, entry: Dict[str, Any]) -> None:
+        payload, raw_size = encode_payload(entry, self.compression, self.compression_threshold)
+        expires_at = entry.get('expires_at', entry.get('timestamp', 0))
+        meta = json.dumps({
+            'tool_name': entry.get('tool_name', 'general'), 'query': entry.get('query', ''),
+            'expires_at': expires_at, 'size': len(payload), 'raw_size': raw_size
+        }, ensure_ascii=False)
+        ttl_ms = max(1, int((expires_at + self.retention_seconds - time.time()) * 1000))
+        
+        def build(old_meta: Optional[bytes]) -> List[Sequence[Any]]:
+            old = json.loads(old_meta) if old_meta else {'size': 0, 'raw_size': 0}
+            return [
+                ["SET", self._entry_key(key), payload, "PX", ttl_ms],
+                ["ZADD", self.expiry_key, expires_at, key],
+                ["HSET", self.meta_key, key, meta],
+                ["HINCRBY", self.stats_key, "bytes", len(payload) - old['size']],
+                ["HINCRBY", self.stats_key, "raw_bytes", raw_size - old['raw_size']]
+            ]
+        
+        self._transaction([key], lambda connection: connection.execute("HGET", self.meta_key, key), build)
+    
+    def _delete_keys(self, keys: Sequence[str]) -> int:
+        """Delete entries and their index records in one transaction and return how many values existed"""
+        if not keys:
+            return 0
+        
+        def build(metas: List[Optional[bytes]]) -> List[Sequence[Any]]:
+            sizes = [json.loads(meta) for meta in metas if meta]
+            return [
+                ["DEL", *[self._entry_key(key) for key in keys]],
+                ["ZREM", self.expiry_key, *keys],
+                ["HDEL", self.meta_key, *keys],
+                ["HINCRBY", self.stats_key, "bytes", -sum(meta['size'] for meta in sizes)],
+                ["HINCRBY", self.stats_key, "raw_bytes", -sum(meta['raw_size'] for meta in sizes)]
+            ]
+        
+        deleted, *_ = self._transaction(keys, lambda connection: connection.execute("HMGET", self.meta_key, *keys), build)
+        return deleted
+    
+    def _drop_reclaimed(self, now: float) -> None:
+        """Remove the index records of entries whose value the server has already expired
+
+        Values carry a server-side TTL but the expiry index, meta hash and
+        byte totals cannot, so they are reconciled here before counting.
+        """
+        command = ["ZRANGEBYSCORE", self.expiry_key, "-inf", now - self.retention_seconds, "LIMIT", 0, 500]
+        while True:
+            keys = [key.decode('utf-8') for key in self._pipeline([command])[0]]
+            if not keys:
+                return
+            # The value keys are already gone, so the DEL count is zero; ZREM still shrinks the index
+            self._delete_keys(keys)
+    
+    def delete(self, key: str) -> bool:
+        return self._delete_keys([key]) > 0
+    
+    def clear(self) -> int:
+        count = self._pipeline([["ZCARD", self.expiry_key]])[0]
+        cursor = b"0"
+        while True:
+            cursor, keys = self._pipeline([["SCAN", cursor, "MATCH", f"{self.namespace}:*", "COUNT", 500]])[0]
+            if keys:
+                self._pipeline([["DEL", *keys]])
+            if cursor == b"0":
+                return count
+    
+    def iter_queries(self, tool_name: str, now: float) -> Iterator[Tuple[str, str]]:
+        cursor = b"0"
+        while True:
+            cursor, fields = self._pipeline([["HSCAN", self.meta_key, cursor, "COUNT", 500]])[0]
+            for key, meta in zip(fields[::2], fields[1::2]):
+                meta = json.loads(meta)
+                if meta['tool_name'] == tool_name and meta['expires_at'] > now:
+                    yield key.decode('utf-8'), meta['query']
+            if cursor == b"0":
+                return
+    
+    def count_entries(self) -> Tuple[int, int, int]:
+        self._drop_reclaimed(time.time())
+        count, (stored, raw) = self._pipeline([
+            ["ZCARD", self.expiry_key],
+            ["HMGET", self.stats_key, "bytes", "raw_bytes"]
+        ])
+        return count, int(stored or 0), int(raw or 0)
+    
+    def count_expired(self, now: float) -> int:
+        return self._pipeline([["ZCOUNT", self.expiry_key, "-inf", now]])[0]
+    
+    def delete_expired(self, now: float, limit: Optional[int] = None) -> int:
+        command = ["ZRANGEBYSCORE", self.expiry_key, "-inf", now]
+        if limit is not None:
+            command += ["LIMIT", 0, limit]
+        keys = [key.decode('utf-8') for key in self._pipeline([command])[0]]
+        return self._delete_keys(keys)
+    
+    def close(self) -> None:
+        self.pool.close()
+
+class FallbackCacheBackend(CacheBackend):
+    """Use a shared backend while it is reachable and a local backend otherwise
+
+    After a failure the shared backend is skipped for retry_seconds, so an
+    outage costs one connection timeout rather than one per lookup.
+    """
+    
+    def __init__(self, primary: CacheBackend, fallback: CacheBackend, retry_seconds: float = 30):
+        self.primary = primary
+        self.fallback = fallback
+        self.retry_seconds = retry_seconds
+        self._down_until = 0.0
+    
+    def _call(self, method: str, *args: Any) -> Any:
+        if time.monotonic() >= self._down_until:
+            try:
+                result = getattr(self.primary, method)(*args)
+                # Materialize generators so connection errors surface here
+                return list(result) if method == "iter_queries" else result
+            except (OSError, RespError) as e:
+                print(f"Warning: Shared cache unavailable ({e}), using local cache for {self.retry_seconds:.0f}s")
+                self._down_until = time.monotonic() + self.retry_seconds
+        return getattr(self.fallback, method)(*args)
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self._call("get", key)
+    
+    def get_many(self, keys: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        return self._call("get_many", keys)
+    
+    def put(self, key: str, entry: Dict[str, Any]) -> None:
+        self._call("put", key, entry)
+    
+    def delete(self, key: str) -> bool:
+        return self._call("delete", key)
+    
+    def clear(self) -> int:
+        return self._call("clear")
+    
+    def iter_queries(self, tool_name: str, now: float) -> Iterator[Tuple[str, str]]:
+        return iter(self._call("iter_queries", tool_name, now))
+    
+    def count_entries(self) -> Tuple[int, int, int]:
+        return self._call("count_entries")
+    
+    def count_expired(self, now: float) -> int:
+        return self._call("count_expired", now)
+    
+    def delete_expired(self, now: float, limit: Optional[int] = None) -> int:
+        return self._call("delete_expired", now, limit)
+    
+    def close(self) -> None:
+        self.primary.close()
+        self.fallback.close()
+
+def migrate_json_cache(cache_dir: Path, backend: CacheBackend, default_ttl_seconds: float = 24 * 3600) -> int:
+    """Import legacy <key>.json cache files into backend and remove them
+
+    Returns the number of entries migrated. Unreadable files are left in
+    place so they can be inspected by hand.
+    """
+    migrated = 0
+    for cache_file in Path(cache_dir).glob("*.json"):
+        try:
+            with open(cache_file, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            entry.setdefault('expires_at', entry.get('timestamp', 0) + default_ttl_seconds)
+            backend.put(cache_file.stem, entry)
+            cache_file.unlink()
+            migrated += 1
+        except (OSError, json.JSONDecodeError, TypeError) as e:
+            print(f"Warning: Could not migrate cache file {cache_file}: {e}")
+    return migrated
+
+def create_cache_backend(config) -> CacheBackend:
+    """Create the storage backend selected by config.cache_backend ('sqlite', 'json' or 'redis')
+
+    The default TTL (cache_duration_hours) is used to derive an expiry for
+    entries written before expiry times were stored alongside them. The
+    redis backend falls back to the local SQLite store while the server is
+    unreachable.
+    """
+    cache_dir = Path(config.cache_directory)
+    cache_dir.mkdir(exist_ok=True)
+    default_ttl_seconds = config.cache_duration_hours * 3600
+    
+    if config.cache_backend == "json":
+        return JsonFileCacheBackend(cache_dir, default_ttl_seconds)
+    
+    if config.cache_backend not in ("sqlite", "redis"):
+        print(f"Warning: Unknown cache backend '{config.cache_backend}', using sqlite")
+    
+    backend = SQLiteCacheBackend(
+        cache_dir / "cache.sqlite3", default_ttl_seconds,
+        compression=config.cache_compression,
+        compression_threshold=config.cache_compression_threshold_bytes
+    )
+    migrated = migrate_json_cache(cache_dir, backend, default_ttl_seconds)
+    if migrated:
+        print(f"Migrated {migrated} cache files into {backend.db_path}")
+    
+    if config.cache_backend == "redis":
+        shared = RedisCacheBackend(
+            RespConnectionPool(config.redis_url, config.redis_pool_size, config.redis_timeout_seconds),
+            namespace=config.redis_namespace,
+            compression=config.cache_compression,
+            compression_threshold=config.cache_compression_threshold_bytes,
+            retention_seconds=config.stale_grace_hours * 3600 if config.stale_while_revalidate else 0
+        )
+        return FallbackCacheBackend(shared, backend)
+    return backend
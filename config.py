@@ -3,8 +3,8 @@ Configuration management for the Research Agent
 """
 import os
 import json
-from typing import Dict, Any, Optional
-from dataclasses import dataclass, asdict
+from typing import Dict, Any, List, Optional
+from dataclasses import dataclass, asdict, field
 from pathlib import Path
 
 @dataclass
@@ -15,12 +15,80 @@ class AgentConfig:
     model_name: str = "claude-3-5-sonnet-20240620"
     temperature: float = 0.1
     max_tokens: Optional[int] = None
+    async_agent_execution: bool = True
+    parallel_template_research: bool = True
+    template_max_concurrency: int = 5
+    batch_workers: int = 4
+    
+    # Service settings (python service.py)
+    service_host: str = "127.0.0.1"
+    service_port: int = 8080
+    service_workers: int = 4
+    service_queue_size: int = 100
+    service_job_ttl_seconds: float = 3600
     
     # Search settings
     max_search_results: int = 8
     max_wikipedia_results: int = 3
     max_arxiv_results: int = 3
     max_news_results: int = 5
+    # Providers behind web_search and news_search, in order of preference
+    search_providers: List[str] = field(default_factory=lambda: ["duckduckgo_api", "duckduckgo_html"])
+    enable_hedged_search: bool = True
+    hedge_min_delay_seconds: float = 0.3
+    hedge_max_delay_seconds: float = 3.0
+    hedge_min_samples: int = 20
+    
+    # HTTP settings
+    http_timeout_seconds: float = 10
+    http_pool_hosts: int = 32
+    http_max_connections_per_host: int = 6
+    web_content_max_bytes: int = 1048576
+    web_content_max_chars: int = 3000
+    web_batch_max_urls: int = 8
+    web_batch_workers: int = 4
+    enable_http_cache: bool = True
+    http_cache_max_entries: int = 5000
+    
+    # Observation settings (passage ranking and deduplication)
+    enable_passage_ranking: bool = True
+    passage_scan_chars: int = 20000
+    passage_words: int = 60
+    wikipedia_max_chars: int = 3000
+    arxiv_max_chars: int = 2000
+    enable_observation_dedup: bool = True
+    dedup_similarity_threshold: float = 0.6
+    dedup_min_words: int = 12
+    enable_evidence_pool: bool = True
+    evidence_recall_max_chars: int = 3000
+    
+    # Local corpus settings (search_local_corpus is only offered when a directory is set)
+    local_corpus_directory: str = ""
+    local_corpus_max_results: int = 5
+    local_corpus_refresh_seconds: float = 60
+    local_corpus_max_file_mb: float = 20
+    
+    # Resilience settings
+    # Requests per second allowed to each provider; "web" applies to every host fetched by get_web_content
+    provider_rate_limits: Dict[str, float] = field(default_factory=lambda: {
+        "duckduckgo": 1.0,
+        "wikipedia": 5.0,
+        "arxiv": 0.34,
+        "web": 5.0
+    })
+    provider_burst: int = 3
+    # Requests in flight at once per provider (each web host counts separately); missing or 0 means unlimited
+    provider_concurrency: Dict[str, int] = field(default_factory=lambda: {
+        "duckduckgo": 2,
+        "wikipedia": 4,
+        "arxiv": 1,
+        "web": 4
+    })
+    tool_max_retries: int = 2
+    retry_backoff_seconds: float = 0.5
+    retry_backoff_max_seconds: float = 8.0
+    circuit_failure_threshold: int = 5
+    circuit_reset_seconds: float = 60
     
     # Output settings
     max_key_points: int = 10
@@ -34,12 +102,36 @@ class AgentConfig:
     # UI settings
     use_rich_formatting: bool = True
     show_progress_bars: bool = True
+    stream_agent_output: bool = True
     verbose_mode: bool = False
     
     # Cache settings
     enable_caching: bool = True
     cache_duration_hours: int = 24
+    # Per-tool TTL policies in hours; tools not listed use cache_duration_hours
+    cache_ttl_hours: Dict[str, float] = field(default_factory=lambda: {
+        "research": 24,
+        "news_search": 0.25,
+        "web_search": 6,
+        "get_web_content": 12,
+        "wikipedia": 168,
+        "arxiv": 336
+    })
     cache_directory: str = ".cache"
+    cache_backend: str = "sqlite"  # sqlite, json, redis
+    redis_url: str = "redis://localhost:6379/0"
+    redis_namespace: str = "raworc"
+    redis_pool_size: int = 8
+    redis_timeout_seconds: float = 2.0
+    cache_compression: str = "auto"  # auto, zstd, gzip, none
+    cache_compression_threshold_bytes: int = 1024
+    enable_similarity_cache: bool = False
+    similarity_threshold: float = 0.85
+    cache_lock_timeout_seconds: float = 900
+    stale_while_revalidate: bool = False
+    stale_grace_hours: float = 24
+    memory_cache_max_entries: int = 512
+    memory_cache_max_mb: float = 32.0
 
 class ConfigManager:
     """Manages configuration loading and saving"""
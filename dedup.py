@@ -0,0 +1,125 @@
+"""
+Near-duplicate detection for Research Agent tool observations
+"""
+import hashlib
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from passages import split_passages
+from similarity import canonical_tokens
+
+TRACKING_PARAMS = frozenset({"fbclid", "gclid", "dclid", "msclkid", "mc_cid", "mc_eid", "ref", "ref_src", "igshid"})
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+def canonical_url(url: str) -> str:
+    """
+    Reduce a URL to a canonical form so trivially different links to one page compare equal.
+
+    Lowercases the scheme and host, drops "www.", default ports, fragments,
+    trailing slashes and tracking parameters (utm_*, fbclid, ...), and sorts
+    the remaining query parameters.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    netloc = host if parts.port in (None, DEFAULT_PORTS.get(scheme)) else f"{host}:{parts.port}"
+    
+    query = sorted(
+        (name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not name.lower().startswith("utm_") and name.lower() not in TRACKING_PARAMS
+    )
+    return urlunsplit((scheme, netloc, parts.path.rstrip("/") or "/", urlencode(query), ""))
+
+def shingles(text: str, size: int = 3) -> Set[int]:
+    """Hashed word shingles (runs of size canonical tokens) of text"""
+    tokens = canonical_tokens(text)
+    return {
+        int.from_bytes(hashlib.blake2b(" ".join(tokens[i:i + size]).encode("utf-8"), digest_size=8).digest(), "big")
+        for i in range(max(1, len(tokens) - size + 1))
+    }
+
+class ObservationLedger:
+    """Passages and URLs already shown to the agent in one research session
+
+    Passages are compared by the Jaccard similarity of their word
+    shingles. An inverted index from shingle to passage means a lookup only
+    scores passages that share at least one shingle with the probe.
+    """
+    
+    def __init__(self, threshold: float = 0.6):
+        self.threshold = threshold
+        self._passages: List[Tuple[Set[int], str]] = []
+        self._postings: Dict[int, List[int]] = defaultdict(list)
+        self._urls: Dict[str, str] = {}
+        self._lock = threading.Lock()
+    
+    def _find(self, probe: Set[int]) -> Optional[str]:
+        overlaps: Counter = Counter()
+        for shingle in probe:
+            overlaps.update(self._postings.get(shingle, ()))
+        for index, shared in overlaps.most_common():
+            seen, label = self._passages[index]
+            if shared / (len(probe) + len(seen) - shared) >= self.threshold:
+                return label
+        return None
+    
+    def _add(self, probe: Set[int], label: str) -> None:
+        self._passages.append((probe, label))
+        for shingle in probe:
+            self._postings[shingle].append(len(self._passages) - 1)
+    
+    def previous_url(self, url: str) -> Optional[str]:
+        """Return the label of the observation that already showed this URL, if any"""
+        with self._lock:
+            return self._urls.get(canonical_url(url))
+    
+    def record_url(self, url: str, label: str) -> None:
+        """Remember that the observation under label showed this URL"""
+        with self._lock:
+            self._urls.setdefault(canonical_url(url), label)
+    
+    def filter(self, text: str, label: str, min_words: int = 12, passage_words: int = 40) -> str:
+        """
+        Replace passages already seen in this session with a short reference to where they appeared.
+
+        Passages are kept short (passage_words) so that a shared sentence is
+        caught even when it sits next to new text. Passages shorter than
+        min_words (titles, headers) are always kept. Consecutive repeats from
+        the same source collapse into one reference, and an observation with
+        nothing new becomes a single reference.
+        """
+        lines = []
+        repeated_from: List[str] = []
+        new_content = False
+        with self._lock:
+            for line in text.split("\n"):
+                kept: List[str] = []
+                for passage in split_passages(line, passage_words):
+                    if len(passage.split()) < min_words:
+                        kept.append(passage)
+                        continue
+                    
+                    probe = shingles(passage)
+                    previous = self._find(probe)
+                    if previous is None:
+                        self._add(probe, label)
+                        kept.append(passage)
+                        new_content = True
+                        continue
+                    
+                    if previous not in repeated_from:
+                        repeated_from.append(previous)
+                    reference = f"[repeats content from {previous}]"
+                    if not kept or kept[-1] != reference:
+                        kept.append(reference)
+                lines.append(" ".join(kept))
+        
+        if not repeated_from:
+            return text
+        if not new_content:
+            return f"[No new content: repeats {', '.join(repeated_from)} from earlier in this research session]"
+        return "\n".join(lines)
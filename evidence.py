@@ -0,0 +1,93 @@
+"""
+Evidence pool shared by the agent runs of one research session
+"""
+import threading
+from typing import Callable, Dict, List, Tuple
+
+from passages import bm25_scores, split_passages
+from similarity import canonical_tokens
+
+def observation_label(tool_name: str, tool_input: str) -> str:
+    """Short human-readable name of a tool call, e.g. web_search('solar panels')"""
+    return f"{tool_name}({' '.join(str(tool_input).split())[:80]!r})"
+
+class EvidencePool:
+    """Tool observations gathered in one research session, stored once per (tool, normalized input)
+
+    Every agent run in the session (for example the parallel sub-questions
+    of a template) reads from and adds to the same pool, so a search one
+    of them already made is answered from memory. A call that is already
+    in flight in another run is waited for instead of being repeated.
+    Passages are tokenized on insert so search() only scores them.
+    """
+    
+    def __init__(self):
+        self._entries: Dict[Tuple[str, str], str] = {}
+        self._labels: Dict[Tuple[str, str], str] = {}
+        self._passages: List[Tuple[str, str, List[str]]] = []
+        self._inflight: Dict[Tuple[str, str], threading.Event] = {}
+        self._lock = threading.Lock()
+        self.counters = {'hits': 0, 'misses': 0}
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def get_or_compute(self, tool_name: str, key: str, label: str, compute: Callable[[], str],
+                       should_store: Callable[[str], bool]) -> str:
+        """Return the pooled observation for a tool call, computing and pooling it on a miss"""
+        pool_key = (tool_name, key)
+        while True:
+            with self._lock:
+                if pool_key in self._entries:
+                    self.counters['hits'] += 1
+                    return self._entries[pool_key]
+                event = self._inflight.get(pool_key)
+                if event is None:
+                    self._inflight[pool_key] = threading.Event()
+                    self.counters['misses'] += 1
+                    break
+            # Another run is making this call; if it fails, try again ourselves
+            event.wait()
+        
+        try:
+            result = compute()
+            if should_store(result):
+                self.add(tool_name, key, label, result)
+            return result
+        finally:
+            with self._lock:
+                self._inflight.pop(pool_key).set()
+    
+    def add(self, tool_name: str, key: str, label: str, text: str) -> None:
+        """Pool an observation and index its passages"""
+        passages = [(label, passage, canonical_tokens(passage)) for passage in split_passages(text)]
+        with self._lock:
+            if (tool_name, key) in self._entries:
+                return
+            self._entries[(tool_name, key)] = text
+            self._labels[(tool_name, key)] = label
+            self._passages.extend(passages)
+    
+    def labels(self) -> List[str]:
+        """Labels of the pooled tool calls, oldest first"""
+        with self._lock:
+            return list(self._labels.values())
+    
+    def search(self, query: str, budget: int) -> str:
+        """Return the pooled passages most relevant to query, best first, within budget characters"""
+        with self._lock:
+            passages = list(self._passages)
+        scores = bm25_scores([terms for _, _, terms in passages], canonical_tokens(query))
+        
+        lines = []
+        used = 0
+        for index in sorted(range(len(passages)), key=lambda index: -scores[index]):
+            if scores[index] <= 0:
+                break
+            label, passage, _ = passages[index]
+            line = f"[{label}] {passage}"
+            if used + len(line) > budget:
+                continue
+            lines.append(line)
+            used += len(line) + 1
+        return "\n".join(lines)
@@ -0,0 +1,281 @@
+"""
+HTTP-semantics cache of extracted page text for the Research Agent
+"""
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from config import get_config
+
+MAX_AGE = re.compile(r"(?:^|,)\s*max-age\s*=\s*\"?(\d+)", re.IGNORECASE)
+# Cap for heuristic freshness of responses that only carry Last-Modified (RFC 9111, section 4.2.2)
+HEURISTIC_MAX_SECONDS = 24 * 3600
+
+def _http_date(value: Optional[str]) -> Optional[float]:
+    """Parse an HTTP date header to a timestamp, or None if missing or malformed"""
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return None
+
+def freshness_seconds(headers: Any, now: float) -> Optional[float]:
+    """
+    How long a response may be reused without revalidation, or None if it must not be stored.
+
+    Follows Cache-Control (no-store, no-cache, max-age and Age), then
+    Expires, then the usual heuristic of 10% of the time since
+    Last-Modified. no-cache and responses without any of these are stored
+    but revalidated on every use.
+    """
+    cache_control = (headers.get('Cache-Control') or "").lower()
+    if "no-store" in cache_control:
+        return None
+    if "no-cache" in cache_control:
+        return 0.0
+    
+    match = MAX_AGE.search(cache_control)
+    if match:
+        age = headers.get('Age') or "0"
+        return max(0.0, int(match.group(1)) - (int(age) if age.isdigit() else 0))
+    
+    date = _http_date(headers.get('Date')) or now
+    expires = headers.get('Expires')
+    if expires is not None:
+        expires_at = _http_date(expires)
+        return max(0.0, expires_at - date) if expires_at else 0.0
+    
+    last_modified = _http_date(headers.get('Last-Modified'))
+    if last_modified is not None and last_modified < date:
+        return min((date - last_modified) / 10, HEURISTIC_MAX_SECONDS)
+    return 0.0
+
+class HttpCache:
+    """Extracted page text kept with the validators needed to revalidate it
+
+    responses maps a URL to its ETag, Last-Modified, freshness lifetime and
+    the SHA-256 digest of its body. texts holds one extract per (digest,
+    variant), where the variant names the extraction settings, so identical
+    pages served under different URLs are extracted and stored once.
+    """
+    
+    def __init__(self, db_path: Path, max_entries: int = 5000):
+        self.db_path = Path(db_path)
+        self.max_entries = max_entries
+        self.counters = {'fresh_hits': 0, 'revalidated': 0, 'shared_bodies': 0, 'fetches': 0}
+        self._counters_lock = threading.Lock()
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=10000")
+        self._conn.executescript(
+            """
+            BEGIN IMMEDIATE;
+            CREATE TABLE IF NOT EXISTS responses (
+                url TEXT PRIMARY KEY,
+                digest TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                fresh_until REAL NOT NULL,
+                used_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_responses_digest ON responses (digest);
+            CREATE INDEX IF NOT EXISTS idx_responses_used_at ON responses (used_at);
+            CREATE TABLE IF NOT EXISTS texts (
+                digest TEXT NOT NULL,
+                variant TEXT NOT NULL,
+                text TEXT NOT NULL,
+                PRIMARY KEY (digest, variant)
+            ) WITHOUT ROWID;
+            COMMIT;
+            """
+        )
+    
+    def lookup(self, url: str, variant: str) -> Optional[Tuple[str, Optional[str], Optional[str], float]]:
+        """Return (text, etag, last_modified, fresh_until) stored for a URL, if its extract exists for variant"""
+        with self._lock:
+            return self._conn.execute(
+                """SELECT texts.text, responses.etag, responses.last_modified, responses.fresh_until
+                FROM responses JOIN texts ON texts.digest = responses.digest AND texts.variant = ?
+                WHERE responses.url = ?""",
+                (variant, url)
+            ).fetchone()
+    
+    def text_for_digest(self, digest: str, variant: str) -> Optional[str]:
+        """Return the stored extract of a body, whichever URL it was fetched from"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT text FROM texts WHERE digest = ? AND variant = ?", (digest, variant)
+            ).fetchone()
+        return row[0] if row else None
+    
+    def store(self, url: str, digest: str, variant: str, text: str, headers: Any, fresh_for: float) -> None:
+        """Record a full response for a URL and its extract, dropping the URL's previous body if now unused"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                previous = self._conn.execute("SELECT digest FROM responses WHERE url = ?", (url,)).fetchone()
+                self._conn.execute(
+                    """INSERT OR REPLACE INTO responses (url, digest, etag, last_modified, fresh_until, used_at)
+                    VALUES (?, ?, ?, ?, ?, ?)""",
+                    (url, digest, headers.get('ETag'), headers.get('Last-Modified'), now + fresh_for, now)
+                )
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO texts (digest, variant, text) VALUES (?, ?, ?)", (digest, variant, text)
+                )
+                if previous and previous[0] != digest:
+                    self._delete_orphan(previous[0])
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            
+            self._writes += 1
+            if self._writes % 100 == 0:
+                self._evict()
+    
+    def refresh(self, url: str, headers: Any, fresh_for: float) -> None:
+        """Record a 304 for a URL: extend its freshness and take any updated validators"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                """UPDATE responses SET etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified),
+                fresh_until = ?, used_at = ? WHERE url = ?""",
+                (headers.get('ETag'), headers.get('Last-Modified'), now + fresh_for, now, url)
+            )
+    
+    def touch(self, url: str) -> None:
+        """Mark a URL as recently used so eviction keeps it"""
+        with self._lock:
+            self._conn.execute("UPDATE responses SET used_at = ? WHERE url = ?", (time.time(), url))
+    
+    def _count(self, counter: str) -> None:
+        # Fetches run on every worker thread, and += on a dict item is not atomic
+        with self._counters_lock:
+            self.counters[counter] += 1
+    
+    def _delete_orphan(self, digest: str) -> None:
+        self._conn.execute(
+            "DELETE FROM texts WHERE digest = ? AND NOT EXISTS (SELECT 1 FROM responses WHERE digest = ?)",
+            (digest, digest)
+        )
+    
+    def _evict(self) -> None:
+        """Drop the least recently used URLs beyond max_entries and the bodies no URL refers to any more"""
+        self._conn.execute("BEGIN IMMEDIATE")
+        self._conn.execute(
+            "DELETE FROM responses WHERE url IN (SELECT url FROM responses ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+        self._conn.execute("DELETE FROM texts WHERE digest NOT IN (SELECT digest FROM responses)")
+        self._conn.execute("COMMIT")
+    
+    def clear(self) -> int:
+        """Remove every stored response and return how many there were"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            count = self._conn.execute("DELETE FROM responses").rowcount
+            self._conn.execute("DELETE FROM texts")
+            self._conn.execute("COMMIT")
+        return count
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get entry counts and hit counters"""
+        with self._lock:
+            urls, bodies = self._conn.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT digest) FROM responses"
+            ).fetchone()
+        with self._counters_lock:
+            return {'urls': urls, 'bodies': bodies, **self.counters}
+    
+    def fetch_text(self, url: str, request: Callable[[Dict[str, str]], Dict[str, Any]],
+                   extract: Callable[[Dict[str, Any]], str], variant: str) -> str:
+        """
+        Return the extracted text of a URL, going to the network only when needed.
+
+        A stored response that is still fresh is returned directly. A stale
+        one is revalidated with If-None-Match / If-Modified-Since, and a 304
+        reuses the stored extract without downloading or parsing the page. A
+        full response whose body matches one already stored (from any URL) is
+        not parsed again. request takes the conditional headers and returns
+        an http_client.fetch_response dict; extract turns such a dict into text.
+        """
+        stored = self.lookup(url, variant)
+        headers: Dict[str, str] = {}
+        if stored is not None:
+            text, etag, last_modified, fresh_until = stored
+            if time.time() < fresh_until:
+                self._count('fresh_hits')
+                self.touch(url)
+                return text
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+        
+        response = request(headers)
+        self._count('fetches')
+        fresh_for = freshness_seconds(response['headers'], time.time())
+        if response['status'] == 304 and stored is not None:
+            self._count('revalidated')
+            self.refresh(url, response['headers'], fresh_for or 0.0)
+            return stored[0]
+        
+        digest = hashlib.sha256(response['body']).hexdigest()
+        text = self.text_for_digest(digest, variant)
+        if text is None:
+            text = extract(response)
+        else:
+            self._count('shared_bodies')
+        
+        if fresh_for is not None:
+            self.store(url, digest, variant, text, response['headers'], fresh_for)
+        return text
+    
+    def close(self) -> None:
+        """Close the cache database"""
+        self._conn.close()
+
+_cache: Optional[HttpCache] = None
+_cache_lock = threading.Lock()
+
+def get_http_cache() -> Optional[HttpCache]:
+    """Get the shared HTTP cache, or None when it is disabled"""
+    global _cache
+    config = get_config()
+    if not (config.enable_caching and config.enable_http_cache):
+        return None
+    
+    with _cache_lock:
+        if _cache is None:
+            cache_dir = Path(config.cache_directory)
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            _cache = HttpCache(cache_dir / "http_cache.sqlite3", config.http_cache_max_entries)
+        return _cache
+
+def fetch_text(url: str, request: Callable[[Dict[str, str]], Dict[str, Any]],
+               extract: Callable[[Dict[str, Any]], str], variant: str) -> str:
+    """Fetch and extract a URL through the shared HTTP cache, or directly when it is disabled"""
+    cache = get_http_cache()
+    if cache is None:
+        return extract(request({}))
+    return cache.fetch_text(url, request, extract, variant)
+
+def get_http_cache_stats() -> Dict[str, Any]:
+    """Get statistics of the shared HTTP cache (empty when it is disabled)"""
+    cache = get_http_cache()
+    return cache.get_stats() if cache else {}
+
+def clear_http_cache() -> int:
+    """Remove every response from the shared HTTP cache and return how many there were"""
+    cache = get_http_cache()
+    return cache.clear() if cache else 0
@@ -0,0 +1,109 @@
+"""
+Shared HTTP client for the Research Agent tools
+"""
+import atexit
+import threading
+from typing import Any, Dict, Optional, Sequence
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import get_config
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+def create_session(pool_hosts: int = 32, max_connections_per_host: int = 6) -> requests.Session:
+    """
+    Create a keep-alive session with one bounded connection pool per host.
+
+    pool_block makes a thread wait for a free connection to a host instead
+    of opening (and then discarding) extra ones past the per-host limit.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=pool_hosts,
+        pool_maxsize=max_connections_per_host,
+        pool_block=True
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({'User-Agent': USER_AGENT})
+    return session
+
+def get_session() -> requests.Session:
+    """Get the process-wide HTTP session, creating it on first use"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                config = get_config()
+                _session = create_session(config.http_pool_hosts, config.http_max_connections_per_host)
+    return _session
+
+def get(url: str, timeout: Optional[float] = None, **kwargs) -> requests.Response:
+    """GET a URL through the shared session"""
+    if timeout is None:
+        timeout = get_config().http_timeout_seconds
+    return get_session().get(url, timeout=timeout, **kwargs)
+
+def fetch_response(url: str, max_bytes: int, allowed_types: Optional[Sequence[str]] = None,
+                   timeout: Optional[float] = None, headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """
+    Stream a response body, stopping after max_bytes.
+
+    Responses whose media type is not in allowed_types are rejected from
+    the headers alone, before any of the body is downloaded. Returns a dict
+    with the status code, response headers, body, media type, declared
+    charset (if any) and whether the body was cut off at the byte cap. A 304
+    Not Modified answer to a conditional request has an empty body.
+    """
+    with get(url, timeout=timeout, stream=True, headers=headers) as response:
+        response.raise_for_status()
+        result = {
+            'status': response.status_code,
+            'headers': response.headers,
+            'body': b"",
+            'media_type': "",
+            'charset': None,
+            'truncated': False
+        }
+        if response.status_code == 304:
+            return result
+        
+        content_type = response.headers.get('Content-Type', '')
+        media_type = content_type.split(';')[0].strip().lower()
+        if allowed_types and media_type and media_type not in allowed_types:
+            raise ValueError(f"unsupported content type '{media_type}'")
+        
+        charset = None
+        for param in content_type.split(';')[1:]:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'charset':
+                charset = value.strip().strip('"\'') or None
+        
+        chunks = []
+        received = 0
+        truncated = False
+        for chunk in response.iter_content(chunk_size=16384):
+            chunks.append(chunk)
+            received += len(chunk)
+            if received >= max_bytes:
+                # Closing the response early drops the connection instead of draining the rest
+                truncated = received > max_bytes
+                break
+        
+        result.update(body=b"".join(chunks)[:max_bytes], media_type=media_type, charset=charset, truncated=truncated)
+        return result
+
+def close_session() -> None:
+    """Close pooled connections; registered to run when the process exits"""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+atexit.register(close_session)
@@ -0,0 +1,321 @@
+"""
+Offline full-text search over a local document directory for the Research Agent
+"""
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from bs4 import BeautifulSoup
+
+from config import get_config
+from passages import split_passages
+from similarity import canonical_tokens
+
+try:
+    import pypdf
+except ImportError:
+    pypdf = None
+
+TEXT_EXTENSIONS = frozenset({".txt", ".text", ".md", ".markdown", ".rst", ".csv", ".log"})
+HTML_EXTENSIONS = frozenset({".html", ".htm", ".xhtml"})
+
+def read_document(path: Path) -> str:
+    """Read the plain text of a supported file (text, Markdown, HTML, or PDF when pypdf is installed)"""
+    suffix = path.suffix.lower()
+    if suffix == ".pdf":
+        reader = pypdf.PdfReader(str(path))
+        return "\n".join(page.extract_text() or "" for page in reader.pages)
+    
+    raw = path.read_bytes()
+    if suffix in HTML_EXTENSIONS:
+        soup = BeautifulSoup(raw, "html.parser")
+        for element in soup(["script", "style", "noscript", "template"]):
+            element.decompose()
+        return soup.get_text("\n")
+    return raw.decode("utf-8", errors="replace")
+
+class LocalCorpusIndex:
+    """Inverted index of a document directory in SQLite, ranked with BM25 at passage level
+
+    Documents are split into passages that are indexed as (term, passage,
+    term frequency) postings, so a query only reads the postings of its own
+    terms and returns ranked snippets directly. refresh() re-indexes only
+    files whose modification time or size changed and drops deleted ones.
+    """
+    
+    def __init__(self, corpus_dir: Path, db_path: Path, passage_words: int = 60, max_file_bytes: int = 20 * 1024 * 1024):
+        self.corpus_dir = Path(corpus_dir)
+        self.db_path = Path(db_path)
+        self.passage_words = passage_words
+        self.max_file_bytes = max_file_bytes
+        self.extensions = TEXT_EXTENSIONS | HTML_EXTENSIONS | ({".pdf"} if pypdf is not None else set())
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self.last_refresh = 0.0
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=10000")
+        self._create_schema()
+    
+    def _create_schema(self) -> None:
+        """Create tables, indexes and the triggers that keep corpus_stats current"""
+        self._conn.executescript(
+            """
+            BEGIN IMMEDIATE;
+            CREATE TABLE IF NOT EXISTS documents (
+                id INTEGER PRIMARY KEY,
+                path TEXT NOT NULL UNIQUE,
+                mtime REAL NOT NULL,
+                size INTEGER NOT NULL,
+                title TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS passages (
+                id INTEGER PRIMARY KEY,
+                doc_id INTEGER NOT NULL,
+                position INTEGER NOT NULL,
+                text TEXT NOT NULL,
+                length INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS postings (
+                term TEXT NOT NULL,
+                passage_id INTEGER NOT NULL,
+                tf INTEGER NOT NULL,
+                PRIMARY KEY (term, passage_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_passages_doc_id ON passages (doc_id);
+
+            CREATE TABLE IF NOT EXISTS corpus_stats (
+                id INTEGER PRIMARY KEY CHECK (id = 0),
+                passages INTEGER NOT NULL,
+                total_length INTEGER NOT NULL
+            );
+            INSERT OR IGNORE INTO corpus_stats (id, passages, total_length)
+                SELECT 0, COUNT(*), COALESCE(SUM(length), 0) FROM passages;
+
+            CREATE TRIGGER IF NOT EXISTS passages_insert AFTER INSERT ON passages BEGIN
+                UPDATE corpus_stats SET passages = passages + 1, total_length = total_length + NEW.length WHERE id = 0;
+            END;
+            CREATE TRIGGER IF NOT EXISTS passages_delete AFTER DELETE ON passages BEGIN
+                UPDATE corpus_stats SET passages = passages - 1, total_length = total_length - OLD.length WHERE id = 0;
+            END;
+            COMMIT;
+            """
+        )
+    
+    def _scan(self) -> Dict[str, Tuple[float, int]]:
+        """Map each supported file under the corpus directory to its (mtime, size)"""
+        files = {}
+        for root, _, names in os.walk(self.corpus_dir):
+            for name in names:
+                path = Path(root) / name
+                if path.suffix.lower() not in self.extensions:
+                    continue
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                if stat.st_size <= self.max_file_bytes:
+                    files[str(path.relative_to(self.corpus_dir))] = (stat.st_mtime, stat.st_size)
+        return files
+    
+    def _delete_document(self, doc_id: int) -> None:
+        """Remove a document with its passages and postings (caller holds the lock and a transaction)"""
+        # Postings are keyed by term first, so re-tokenize the stored passages to delete them by key
+        # rather than paying for a second index on passage_id on every insert
+        passages = self._conn.execute("SELECT id, text FROM passages WHERE doc_id = ?", (doc_id,)).fetchall()
+        self._conn.executemany(
+            "DELETE FROM postings WHERE term = ? AND passage_id = ?",
+            [(term, passage_id) for passage_id, text in passages for term in set(canonical_tokens(text))]
+        )
+        self._conn.execute("DELETE FROM passages WHERE doc_id = ?", (doc_id,))
+        self._conn.execute("DELETE FROM documents WHERE id = ?", (doc_id,))
+    
+    def _index_document(self, relative_path: str, mtime: float, size: int, text: str) -> None:
+        """Replace a document's passages and postings in one transaction"""
+        passages = split_passages(text, self.passage_words)
+        title = next((line.strip("# \t") for line in text.splitlines() if line.strip("# \t")), relative_path)[:120]
+        
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT id FROM documents WHERE path = ?", (relative_path,)).fetchone()
+                if row:
+                    self._delete_document(row[0])
+                doc_id = self._conn.execute(
+                    "INSERT INTO documents (path, mtime, size, title) VALUES (?, ?, ?, ?)",
+                    (relative_path, mtime, size, title)
+                ).lastrowid
+                
+                for position, passage in enumerate(passages):
+                    terms = Counter(canonical_tokens(passage))
+                    if not terms:
+                        continue
+                    passage_id = self._conn.execute(
+                        "INSERT INTO passages (doc_id, position, text, length) VALUES (?, ?, ?, ?)",
+                        (doc_id, position, passage, sum(terms.values()))
+                    ).lastrowid
+                    self._conn.executemany(
+                        "INSERT INTO postings (term, passage_id, tf) VALUES (?, ?, ?)",
+                        [(term, passage_id, count) for term, count in sorted(terms.items())]
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+    
+    def refresh(self) -> Tuple[int, int]:
+        """
+        Bring the index in line with the directory and return (files indexed, files removed).
+
+        Only files whose mtime or size changed since they were indexed are
+        read again. Concurrent callers do not wait: if a refresh is already
+        running, this returns (0, 0) immediately.
+        """
+        if not self._refresh_lock.acquire(blocking=False):
+            return 0, 0
+        
+        try:
+            files = self._scan()
+            with self._lock:
+                indexed = {
+                    path: (doc_id, mtime, size)
+                    for doc_id, path, mtime, size in self._conn.execute("SELECT id, path, mtime, size FROM documents")
+                }
+            
+            removed = [doc_id for path, (doc_id, _, _) in indexed.items() if path not in files]
+            if removed:
+                with self._lock:
+                    self._conn.execute("BEGIN IMMEDIATE")
+                    for doc_id in removed:
+                        self._delete_document(doc_id)
+                    self._conn.execute("COMMIT")
+            
+            updated = 0
+            for path, (mtime, size) in files.items():
+                previous = indexed.get(path)
+                if previous and previous[1] == mtime and previous[2] == size:
+                    continue
+                try:
+                    text = read_document(self.corpus_dir / path)
+                except Exception as e:
+                    print(f"Warning: Could not index {path}: {e}")
+                    continue
+                self._index_document(path, mtime, size, text)
+                updated += 1
+            
+            self.last_refresh = time.time()
+            return updated, len(removed)
+        finally:
+            self._refresh_lock.release()
+    
+    @property
+    def refreshing(self) -> bool:
+        """Whether a refresh is currently running"""
+        return self._refresh_lock.locked()
+    
+    def start_background_refresh(self) -> threading.Thread:
+        """Refresh the index on a daemon thread so startup is not blocked by a large corpus"""
+        thread = threading.Thread(target=self.refresh, name="local-corpus-index", daemon=True)
+        thread.start()
+        return thread
+    
+    def refresh_if_stale(self, max_age_seconds: float) -> None:
+        """Start a background refresh if the last one finished more than max_age_seconds ago"""
+        if time.time() - self.last_refresh >= max_age_seconds and not self.refreshing:
+            self.start_background_refresh()
+    
+    def search(self, query: str, limit: int = 5, per_document: int = 2,
+               k1: float = 1.2, b: float = 0.75) -> List[Dict[str, Any]]:
+        """
+        Return the top passages for a query as dicts with path, title, snippet and score.
+
+        Scoring is Okapi BM25 over passages, computed in SQL from the postings
+        of the query terms only. At most per_document passages are returned
+        from any one file so a single long document cannot crowd out the rest.
+        """
+        terms = sorted(set(canonical_tokens(query)))
+        if not terms:
+            return []
+        
+        with self._lock:
+            passage_count, total_length = self._conn.execute(
+                "SELECT passages, total_length FROM corpus_stats WHERE id = 0"
+            ).fetchone()
+            if not passage_count:
+                return []
+            
+            document_frequency = self._conn.execute(
+                f"SELECT term, COUNT(*) FROM postings WHERE term IN ({','.join('?' * len(terms))}) GROUP BY term",
+                terms
+            ).fetchall()
+            if not document_frequency:
+                return []
+            
+            weights = [
+                value
+                for term, frequency in document_frequency
+                for value in (term, math.log(1 + (passage_count - frequency + 0.5) / (frequency + 0.5)))
+            ]
+            rows = self._conn.execute(
+                f"""
+                WITH query_terms (term, idf) AS (VALUES {','.join('(?, ?)' for _ in document_frequency)})
+                SELECT documents.path, documents.title, passages.text,
+                       SUM(query_terms.idf * postings.tf * (? + 1)
+                           / (postings.tf + ? * (1 - ? + ? * passages.length / ?))) AS score
+                FROM query_terms
+                JOIN postings ON postings.term = query_terms.term
+                JOIN passages ON passages.id = postings.passage_id
+                JOIN documents ON documents.id = passages.doc_id
+                GROUP BY passages.id
+                ORDER BY score DESC
+                LIMIT ?
+                """,
+                weights + [k1, k1, b, b, total_length / passage_count, limit * per_document * 3]
+            ).fetchall()
+        
+        results = []
+        per_path: Counter = Counter()
+        for path, title, snippet, score in rows:
+            if per_path[path] >= per_document:
+                continue
+            per_path[path] += 1
+            results.append({'path': path, 'title': title, 'snippet': snippet, 'score': score})
+            if len(results) == limit:
+                break
+        return results
+    
+    def close(self) -> None:
+        """Close the index database"""
+        self._conn.close()
+
+_index: Optional[LocalCorpusIndex] = None
+_index_lock = threading.Lock()
+
+def get_corpus_index() -> Optional[LocalCorpusIndex]:
+    """Get the shared index of config.local_corpus_directory, or None when no corpus is configured"""
+    global _index
+    config = get_config()
+    if not config.local_corpus_directory:
+        return None
+    
+    with _index_lock:
+        if _index is None:
+            corpus_dir = Path(config.local_corpus_directory).expanduser()
+            if not corpus_dir.is_dir():
+                print(f"Warning: Local corpus directory {corpus_dir} does not exist")
+                return None
+            cache_dir = Path(config.cache_directory)
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            _index = LocalCorpusIndex(
+                corpus_dir,
+                cache_dir / "local_corpus.sqlite3",
+                passage_words=config.passage_words,
+                max_file_bytes=int(config.local_corpus_max_file_mb * 1024 * 1024)
+            )
+        return _index
@@ -4,14 +4,16 @@ from langchain_openai import ChatOpenAI
 from langchain_anthropic import ChatAnthropic
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import PydanticOutputParser
+from langchain_core.utils.json import parse_partial_json
 from langchain.agents import create_tool_calling_agent, AgentExecutor
 from tools import get_research_tools
+import asyncio
 import json
 import os
 import sys
 from datetime import datetime
 from pathlib import Path
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 
 # Enhanced imports
 from reportlab.lib.pagesizes import letter, A4
@@ -20,6 +22,8 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from rich.console import Console
 from rich.panel import Panel
+from rich.live import Live
+from rich.markup import escape
 from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, TimeRemainingColumn
 from rich.table import Table
 from rich.text import Text
@@ -28,11 +32,18 @@ from rich.tree import Tree
 from rich.markdown import Markdown
 from tqdm import tqdm
 import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # Import our new modules
 from config import get_config, update_config, ensure_directories
-from cache import get_cached_result, cache_result, get_cache_stats, cleanup_expired_cache
-from templates import get_available_templates, get_template_queries, get_template_info
+from cache import get_cached_result, cache_result, find_similar_result, get_stale_result, single_flight, get_cache_stats, cleanup_expired_cache, clear_cache, start_background_cleanup
+from evidence import EvidencePool
+from http_cache import clear_http_cache, get_http_cache_stats
+from resilience import get_provider_stats
+from search_providers import get_latency_stats
+from session import research_session
+from templates import get_available_templates, get_template_queries, get_template_research_query, get_template_info
 
 load_dotenv()
 
@@ -74,7 +85,7 @@ prompt = ChatPromptTemplate.from_messages([
      Make sure all JSON is properly closed with matching braces and brackets.
      
      {format_instructions}"""),
-
+    
     ("placeholder","{chat_history}"),
     ("human", "{query}"),
     ("placeholder", "{agent_scratchpad}"),
@@ -89,16 +100,39 @@ agent = create_tool_calling_agent(
     tools=tools
 )
 
-def print_research_results(structured_response: ResearchResponse):
-    """Print research results with enhanced rich formatting"""
+# Merges the answers to a template's sub-questions in one model call, without tools
+synthesis_prompt = ChatPromptTemplate.from_messages([
+    ("system",
+    """You are a research assistant combining the findings of several research sub-questions about one topic.
+     Write a single coherent summary covering every sub-question, merge overlapping key points,
+     and keep every source that supports the merged key points. Do not invent new facts or sources.
+     
+     IMPORTANT: Your final response must be ONLY valid JSON in the exact format specified below.
+     Do not include any explanatory text before or after the JSON.
+     
+     {format_instructions}"""),
+    ("human", "Topic: {topic}\n\nFindings for each sub-question:\n{findings}"),
+]
+).partial(format_instructions=parser.get_format_instructions())
+
+def print_research_results(structured_response: ResearchResponse, stale_age_hours: Optional[float] = None):
+    """Print research results with enhanced rich formatting
+
+    stale_age_hours marks the results as a stale cached copy of that age.
+    """
     if config.use_rich_formatting:
         # Create a beautiful panel for the results
         console.print("\n")
+        stale_notice = (
+            f"\n[bold yellow]⚠️ STALE: cached {stale_age_hours:.1f} hours ago, refreshing in the background[/bold yellow]"
+            if stale_age_hours is not None else ""
+        )
         console.print(Panel.fit(
             f"[bold blue]RESEARCH RESULTS[/bold blue]\n"
             f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
-            f"Topic: [bold]{structured_response.topic}[/bold]",
-            border_style="blue"
+            f"Topic: [bold]{structured_response.topic}[/bold]"
+            f"{stale_notice}",
+            border_style="yellow" if stale_age_hours is not None else "blue"
         ))
         
         # Executive Summary
@@ -146,6 +180,8 @@ def print_research_results(structured_response: ResearchResponse):
         print("\nRESEARCH RESULTS")
         print(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
         print(f"Topic: {structured_response.topic}")
+        if stale_age_hours is not None:
+            print(f"STALE: cached {stale_age_hours:.1f} hours ago, refreshing in the background")
         
         print("\nEXECUTIVE SUMMARY")
         print("-" * 50)
@@ -396,49 +432,222 @@ def save_all_formats(structured_response: ResearchResponse):
     else:
         print(f"\nFiles saved: {', '.join(files_saved)}")
 
-def conduct_research(query: str):
-    """Conduct research on a given query with caching and enhanced progress tracking"""
-    
-    # Check cache first
-    cached_result = get_cached_result(query, "research")
-    if cached_result and not config.verbose_mode:
+def show_cached_research(cached_result: Dict[str, Any], stale_age_hours: Optional[float] = None) -> Optional[ResearchResponse]:
+    """Display a cached research result, returning None if it cannot be rebuilt"""
+    try:
+        # Reconstruct ResearchResponse from cached data
+        structured_response = ResearchResponse(**cached_result)
+    except Exception:
         if config.use_rich_formatting:
-            console.print("📄 [yellow]Using cached result...[/yellow]")
+            console.print(f"⚠️ [yellow]Cache corrupted, performing fresh research...[/yellow]")
         else:
-            print("Using cached result...")
-        
-        try:
-            # Reconstruct ResearchResponse from cached data
-            structured_response = ResearchResponse(**cached_result)
-            print_research_results(structured_response)
-            offer_download_options(structured_response)
-            return structured_response
-        except Exception as e:
-            if config.use_rich_formatting:
-                console.print(f"⚠️ [yellow]Cache corrupted, performing fresh research...[/yellow]")
-            else:
-                print("Cache corrupted, performing fresh research...")
+            print("Cache corrupted, performing fresh research...")
+        return None
     
-    # Start fresh research
-    if config.use_rich_formatting:
-        console.print("\n🔍 [bold blue]Starting Research Agent[/bold blue]")
-        console.print(f"📝 [cyan]Query: {query}[/cyan]")
-        console.print("─" * 80)
-    else:
-        print("Starting research agent...")
-        print(f"Processing query: '{query}'")
-        print("-" * 80)
+    print_research_results(structured_response, stale_age_hours)
+    offer_download_options(structured_response)
+    return structured_response
 
-    agent_executor = AgentExecutor(
+def create_agent_executor(verbose: bool = False) -> AgentExecutor:
+    """Create an AgentExecutor around the shared agent and tools"""
+    return AgentExecutor(
         agent=agent, 
         tools=tools, 
-        verbose=config.verbose_mode,
+        verbose=verbose,
         max_iterations=15,
         early_stopping_method="generate"
     )
+
+def agent_inputs(session, query: str) -> Dict[str, Any]:
+    """Build the AgentExecutor input for a query, listing evidence the session already holds"""
+    gathered = session.evidence.labels() if config.enable_evidence_pool else []
+    if not gathered:
+        return {"query": query}
+    return {"query": (
+        f"{query}\n\nEvidence already gathered in this research session (search it with "
+        f"recall_evidence instead of repeating these calls): {', '.join(gathered)}"
+    )}
+
+def execute_agent(agent_executor: AgentExecutor, query: str, evidence: Optional[EvidencePool] = None) -> Dict[str, Any]:
+    """Run an AgentExecutor on a query, concurrently executing parallel tool calls when enabled
+
+    Runs sharing an evidence pool reuse each other's tool observations, and
+    the agent is told up front which calls have already been made.
+    """
+    # The session tells tools which research their observations are for
+    with research_session(query, evidence) as session:
+        inputs = agent_inputs(session, query)
+        if config.async_agent_execution:
+            # ainvoke gathers the tool calls from one model turn instead of running them in sequence
+            return asyncio.run(agent_executor.ainvoke(inputs))
+        return agent_executor.invoke(inputs)
+
+def chunk_text(chunk: Any) -> str:
+    """Text carried by a streamed model chunk, skipping tool-call argument deltas"""
+    content = getattr(chunk, "content", chunk)
+    if isinstance(content, str):
+        return content
+    return "".join(
+        part.get("text", "") for part in content
+        if isinstance(part, dict) and part.get("type", "text") == "text"
+    )
+
+def partial_answer(text: str) -> Optional[Dict[str, Any]]:
+    """Parse the JSON answer streamed so far, or None while the text is not (yet) the JSON answer"""
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.split("\n", 1)[1] if "\n" in text else ""
+    if not text.startswith("{"):
+        return None
+    parsed = parse_partial_json(text)
+    return parsed if isinstance(parsed, dict) else None
+
+class StreamingResearchDisplay:
+    """Live view of an agent run: tool calls and observations scroll by, the answer renders as it streams"""
+    
+    def __init__(self):
+        self.live = Live(console=console, refresh_per_second=8, transient=True)
+        self.model_text: Dict[str, str] = {}
+        self.answer: Optional[Dict[str, Any]] = None
+        self.status = "🤖 AI Agent is researching..."
+        self.tool_calls = 0
+    
+    def __enter__(self):
+        self.live.__enter__()
+        self.refresh()
+        return self
+    
+    def __exit__(self, *exc_info):
+        return self.live.__exit__(*exc_info)
+    
+    def tool_started(self, name: str, tool_input: Any) -> None:
+        if isinstance(tool_input, dict) and len(tool_input) == 1:
+            tool_input = next(iter(tool_input.values()))
+        self.tool_calls += 1
+        self.status = f"🔧 Running {name}..."
+        console.print(f"🔧 [bold blue]{name}[/bold blue] [cyan]{escape(str(tool_input)[:120])}[/cyan]")
+        self.refresh()
+    
+    def tool_finished(self, name: str, output: Any) -> None:
+        text = " ".join(str(getattr(output, "content", output)).split())
+        console.print(f"   [dim]↳ {escape(text[:160])}{'...' if len(text) > 160 else ''}[/dim]")
+        self.status = "🤖 AI Agent is researching..."
+        self.refresh()
+    
+    def add_tokens(self, run_id: str, text: str) -> None:
+        if not text:
+            return
+        self.model_text[run_id] = self.model_text.get(run_id, "") + text
+        answer = partial_answer(self.model_text[run_id])
+        if answer is not None:
+            self.answer = answer
+            self.status = "✍️ Writing the answer..."
+        self.refresh()
+    
+    def refresh(self) -> None:
+        if not self.answer:
+            self.live.update(Text(f"{self.status} ({self.tool_calls} tool calls so far)", style="bold"))
+            return
+        
+        body = Text()
+        summary = self.answer.get("summary")
+        if isinstance(summary, str):
+            body.append(summary + "\n")
+        key_points = self.answer.get("key_points")
+        if isinstance(key_points, list):
+            for point in key_points:
+                body.append(f"\n• {point}")
+        self.live.update(Panel(body, title=f"[bold blue]{escape(str(self.answer.get('topic') or 'Research'))}[/bold blue]",
+                               subtitle=self.status, border_style="blue"))
+
+async def astream_agent(agent_executor: AgentExecutor, inputs: Dict[str, Any], display: StreamingResearchDisplay) -> Dict[str, Any]:
+    """Run an AgentExecutor through its event stream, feeding tool activity and answer tokens to display"""
+    final_output = None
+    async for event in agent_executor.astream_events(inputs, version="v2"):
+        kind = event["event"]
+        if kind == "on_tool_start":
+            display.tool_started(event["name"], event["data"].get("input"))
+        elif kind == "on_tool_end":
+            display.tool_finished(event["name"], event["data"].get("output"))
+        elif kind == "on_chat_model_stream":
+            display.add_tokens(event["run_id"], chunk_text(event["data"]["chunk"]))
+        elif kind == "on_chain_end" and not event.get("parent_ids"):
+            # The outermost chain is the AgentExecutor itself
+            final_output = event["data"].get("output")
+    
+    if not isinstance(final_output, dict):
+        raise RuntimeError("the agent finished without a final answer")
+    return final_output
+
+def stream_agent(agent_executor: AgentExecutor, query: str) -> Dict[str, Any]:
+    """Run an AgentExecutor on a query, showing tool calls and the answer live as they stream"""
+    with research_session(query) as session, StreamingResearchDisplay() as display:
+        return asyncio.run(astream_agent(agent_executor, agent_inputs(session, query), display))
+
+def extract_output_text(raw_response: Dict[str, Any]) -> Any:
+    """Get the final answer text from an AgentExecutor response"""
+    # AgentExecutor returns the final output in the 'output' key
+    output_text = raw_response.get("output", "")
+    
+    # Handle case where output might be a list
+    if isinstance(output_text, list) and len(output_text) > 0:
+        if isinstance(output_text[0], dict) and 'text' in output_text[0]:
+            output_text = output_text[0]['text']
+        else:
+            output_text = str(output_text[0])
+    
+    return output_text
+
+def run_research_agent(query: str) -> ResearchResponse:
+    """Run the research agent without console output and parse its answer
+
+    Raises if the agent fails or its output is not a valid ResearchResponse.
+    """
+    raw_response = execute_agent(create_agent_executor(), query)
+    return parser.parse(extract_output_text(raw_response))
+
+_refreshing_queries = set()
+_refreshing_lock = threading.Lock()
+
+def refresh_research_in_background(query: str) -> None:
+    """Re-run research for a stale query on a daemon thread and update the cache"""
+    refresh_key = query.lower().strip()
+    with _refreshing_lock:
+        if refresh_key in _refreshing_queries:
+            return
+        _refreshing_queries.add(refresh_key)
+    
+    def refresh():
+        try:
+            with single_flight(query, "research"):
+                # Another session may already have refreshed this query
+                if get_cached_result(query, "research"):
+                    return
+                structured_response = run_research_agent(query)
+                cache_result(query, structured_response.dict(), "research")
+        except Exception as e:
+            if config.verbose_mode:
+                print(f"Warning: Background refresh of '{query}' failed: {e}")
+        finally:
+            with _refreshing_lock:
+                _refreshing_queries.discard(refresh_key)
+    
+    threading.Thread(target=refresh, name="research-refresh", daemon=True).start()
+
+def invoke_research_agent(query: str) -> Optional[Any]:
+    """Run the research agent on a query and return its final output text, or None on failure"""
+    agent_executor = create_agent_executor(verbose=config.verbose_mode)
+    
+    # Stream tool activity and the answer as they arrive
+    if config.stream_agent_output and config.use_rich_formatting and not config.verbose_mode:
+        try:
+            raw_response = stream_agent(agent_executor, query)
+        except Exception as e:
+            console.print(f"❌ [red]Research failed: {e}[/red]")
+            return None
     
     # Show progress with spinner
-    if config.show_progress_bars and config.use_rich_formatting:
+    elif config.show_progress_bars and config.use_rich_formatting:
         with Progress(
             SpinnerColumn(),
             TextColumn("[progress.description]{task.description}"),
@@ -448,48 +657,33 @@ def conduct_research(query: str):
             task = progress.add_task("🤖 AI Agent is researching...", total=None)
             
             try:
-                raw_response = agent_executor.invoke({"query": query})
+                raw_response = execute_agent(agent_executor, query)
             except Exception as e:
                 console.print(f"❌ [red]Research failed: {e}[/red]")
                 return None
     else:
         try:
-            raw_response = agent_executor.invoke({"query": query})
+            raw_response = execute_agent(agent_executor, query)
         except Exception as e:
             print(f"Research failed: {e}")
             return None
-
+    
     # Debug output for verbose mode
     if config.verbose_mode:
         console.print(f"\n🔧 [dim]DEBUG - Raw response type: {type(raw_response)}[/dim]") if config.use_rich_formatting else print(f"\nDEBUG - Raw response type: {type(raw_response)}")
         console.print(f"🔧 [dim]DEBUG - Raw response keys: {raw_response.keys() if isinstance(raw_response, dict) else 'Not a dict'}[/dim]") if config.use_rich_formatting else print(f"DEBUG - Raw response keys: {raw_response.keys() if isinstance(raw_response, dict) else 'Not a dict'}")
     
-    # AgentExecutor returns the final output in the 'output' key
-    output_text = raw_response.get("output", "")
-    
-    # Handle case where output might be a list
-    if isinstance(output_text, list) and len(output_text) > 0:
-        if isinstance(output_text[0], dict) and 'text' in output_text[0]:
-            output_text = output_text[0]['text']
-        else:
-            output_text = str(output_text[0])
+    output_text = extract_output_text(raw_response)
     
     if config.verbose_mode:
         console.print(f"🔧 [dim]DEBUG - Output text preview: {str(output_text)[:200]}...[/dim]") if config.use_rich_formatting else print(f"DEBUG - Output text preview: {str(output_text)[:200]}...")
+    
+    return output_text
 
+def parse_research_output(output_text: Any, query: str) -> Optional[ResearchResponse]:
+    """Parse the agent's output into a ResearchResponse, falling back to a basic response"""
     try:
-        structured_response = parser.parse(output_text)
-        
-        # Cache the successful result
-        cache_result(query, structured_response.dict(), "research")
-        
-        # Print beautifully formatted results
-        print_research_results(structured_response)
-        
-        # Offer download options
-        offer_download_options(structured_response)
-        
-        return structured_response
+        return parser.parse(output_text)
         
     except Exception as e:
         if config.use_rich_formatting:
@@ -507,16 +701,10 @@ def conduct_research(query: str):
             fallback_response = create_fallback_response(output_text, query)
             
             if fallback_response:
-                # Cache the fallback result too
-                cache_result(query, fallback_response.dict(), "research")
-                
                 if config.use_rich_formatting:
                     console.print("✅ [green]Fallback response created successfully![/green]")
                 else:
                     print("Fallback response created successfully!")
-                
-                print_research_results(fallback_response)
-                offer_download_options(fallback_response)
                 return fallback_response
             
         except Exception as fallback_error:
@@ -525,38 +713,122 @@ def conduct_research(query: str):
             else:
                 print(f"Fallback also failed: {fallback_error}")
         
-        # Show raw output for debugging
-        if config.verbose_mode:
+        return None
+
+def conduct_research(query: str):
+    """Conduct research on a given query with caching and enhanced progress tracking"""
+    
+    # Check cache first, then a stale copy within the grace window, then a near-duplicate prior query
+    cached_result = get_cached_result(query, "research")
+    stale_match = None
+    similar_match = None
+    if not cached_result and not config.verbose_mode:
+        stale_match = get_stale_result(query, "research")
+        if stale_match:
+            cached_result = stale_match[0]
+    
+    if not cached_result and not config.verbose_mode:
+        similar_match = find_similar_result(query, "research")
+        if similar_match:
+            cached_result = similar_match[0]
+    
+    if cached_result and not config.verbose_mode:
+        stale_age_hours = None
+        if stale_match:
+            stale_age_hours = stale_match[1] / 3600
             if config.use_rich_formatting:
-                console.print("\n📄 [yellow]Raw output received:[/yellow]")
-                console.print(Panel(str(output_text), title="Raw Output", border_style="yellow"))
+                console.print(f"📄 [yellow]Using stale cached result ({stale_age_hours:.1f} hours old) while refreshing in the background...[/yellow]")
             else:
-                print("\nRaw output received:")
-                print("-" * 30)
-                print(output_text)
-                print("-" * 30)
-        
-        # Offer to save raw output
-        if config.use_rich_formatting:
-            save_raw = Confirm.ask("Would you like to save the raw output as text?")
+                print(f"Using stale cached result ({stale_age_hours:.1f} hours old) while refreshing in the background...")
+            refresh_research_in_background(query)
+        elif similar_match:
+            _, matched_query, similarity = similar_match
+            if config.use_rich_formatting:
+                console.print(f"📄 [yellow]Using cached result for a similar query:[/yellow] [cyan]{matched_query}[/cyan] [dim](similarity {similarity:.2f})[/dim]")
+            else:
+                print(f"Using cached result for a similar query: '{matched_query}' (similarity {similarity:.2f})")
+        elif config.use_rich_formatting:
+            console.print("📄 [yellow]Using cached result...[/yellow]")
         else:
-            save_raw = input("Would you like to save the raw output as text? (y/n): ").strip().lower() in ['y', 'yes']
+            print("Using cached result...")
         
-        if save_raw:
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            filename = Path(config.output_directory) / f"raw_output_{timestamp}.txt"
-            with open(filename, 'w', encoding='utf-8') as f:
-                f.write(f"Query: {query}\n")
-                f.write(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-                f.write("="*50 + "\n\n")
-                f.write(str(output_text))
-            
+        structured_response = show_cached_research(cached_result, stale_age_hours)
+        if structured_response:
+            return structured_response
+    
+    # Only one thread or process fills a given query; the others wait here for its result
+    with single_flight(query, "research"):
+        cached_result = get_cached_result(query, "research") if not config.verbose_mode else None
+        if cached_result:
             if config.use_rich_formatting:
-                console.print(f"📄 [green]Raw output saved to: {filename}[/green]")
+                console.print("📄 [yellow]Another session just finished this research, using its result...[/yellow]")
             else:
-                print(f"Raw output saved to: {filename}")
+                print("Another session just finished this research, using its result...")
+            structured_response = show_cached_research(cached_result)
+            if structured_response:
+                return structured_response
         
-        return None
+        # Start fresh research
+        if config.use_rich_formatting:
+            console.print("\n🔍 [bold blue]Starting Research Agent[/bold blue]")
+            console.print(f"📝 [cyan]Query: {query}[/cyan]")
+            console.print("─" * 80)
+        else:
+            print("Starting research agent...")
+            print(f"Processing query: '{query}'")
+            print("-" * 80)
+        
+        output_text = invoke_research_agent(query)
+        if output_text is None:
+            return None
+        
+        structured_response = parse_research_output(output_text, query)
+        
+        # Cache the successful (or fallback) result before releasing waiting sessions
+        if structured_response:
+            cache_result(query, structured_response.dict(), "research")
+    
+    if structured_response:
+        # Print beautifully formatted results
+        print_research_results(structured_response)
+        
+        # Offer download options
+        offer_download_options(structured_response)
+        
+        return structured_response
+    
+    # Show raw output for debugging
+    if config.verbose_mode:
+        if config.use_rich_formatting:
+            console.print("\n📄 [yellow]Raw output received:[/yellow]")
+            console.print(Panel(str(output_text), title="Raw Output", border_style="yellow"))
+        else:
+            print("\nRaw output received:")
+            print("-" * 30)
+            print(output_text)
+            print("-" * 30)
+    
+    # Offer to save raw output
+    if config.use_rich_formatting:
+        save_raw = Confirm.ask("Would you like to save the raw output as text?")
+    else:
+        save_raw = input("Would you like to save the raw output as text? (y/n): ").strip().lower() in ['y', 'yes']
+    
+    if save_raw:
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        filename = Path(config.output_directory) / f"raw_output_{timestamp}.txt"
+        with open(filename, 'w', encoding='utf-8') as f:
+            f.write(f"Query: {query}\n")
+            f.write(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+            f.write("="*50 + "\n\n")
+            f.write(str(output_text))
+        
+        if config.use_rich_formatting:
+            console.print(f"📄 [green]Raw output saved to: {filename}[/green]")
+        else:
+            print(f"Raw output saved to: {filename}")
+    
+    return None
 
 def create_fallback_response(raw_text: str, query: str) -> ResearchResponse:
     """Create a fallback structured response from raw text"""
@@ -582,6 +854,154 @@ def create_fallback_response(raw_text: str, query: str) -> ResearchResponse:
     
     return fallback
 
+def research_subquestion(question: str, evidence: Optional[EvidencePool] = None) -> ResearchResponse:
+    """Answer one template sub-question, reusing a cached answer when there is one"""
+    cached_result = get_cached_result(question, "research") if not config.verbose_mode else None
+    if cached_result:
+        try:
+            return ResearchResponse(**cached_result)
+        except Exception:
+            pass
+    
+    raw_response = execute_agent(create_agent_executor(), question, evidence)
+    output_text = extract_output_text(raw_response)
+    try:
+        structured_response = parser.parse(output_text)
+    except Exception:
+        structured_response = create_fallback_response(output_text, question)
+    cache_result(question, structured_response.dict(), "research")
+    return structured_response
+
+def merge_research_responses(topic: str, responses: List[ResearchResponse]) -> ResearchResponse:
+    """Combine sub-question answers without a model call, keeping the first copy of repeated items"""
+    def unique(items):
+        return list(dict.fromkeys(item for item in items if item))
+    
+    return ResearchResponse(
+        topic=topic,
+        summary="\n\n".join(response.summary for response in responses),
+        key_points=unique(point for response in responses for point in response.key_points),
+        sources=unique(source for response in responses for source in response.sources),
+        tools_used=unique(tool for response in responses for tool in response.tools_used)
+    )
+
+def synthesize_research(topic: str, subquestion_results: List[Tuple[str, ResearchResponse]]) -> ResearchResponse:
+    """Merge (question, ResearchResponse) pairs into one response with a single model call
+
+    Falls back to a mechanical merge if the model call or its parsing fails.
+    tools_used is always the union of the sub-answers' tools.
+    """
+    responses = [response for _, response in subquestion_results]
+    merged = merge_research_responses(topic, responses)
+    findings = "\n\n".join(
+        f"Q{i}: {question}\n{json.dumps(response.dict(), ensure_ascii=False)}"
+        for i, (question, response) in enumerate(subquestion_results, 1)
+    )
+    
+    try:
+        message = llm.invoke(synthesis_prompt.format_messages(topic=topic, findings=findings))
+        content = message.content
+        if isinstance(content, list):
+            content = "".join(part.get('text', '') if isinstance(part, dict) else str(part) for part in content)
+        synthesized = parser.parse(content)
+    except Exception as e:
+        if config.verbose_mode:
+            print(f"Warning: Synthesis failed, merging sub-question answers directly: {e}")
+        return merged
+    
+    synthesized.tools_used = merged.tools_used
+    if not synthesized.sources:
+        synthesized.sources = merged.sources
+    return synthesized
+
+def run_template_research(topic: str, questions: List[str], on_done=None) -> Optional[ResearchResponse]:
+    """
+    Research each sub-question as its own agent run, concurrently, then synthesize one response.
+
+    At most template_max_concurrency runs are in flight. on_done(question,
+    error) is called as each sub-question finishes. Failed sub-questions are
+    left out of the synthesis; returns None if all of them fail. The runs
+    share one evidence pool, so overlapping searches are made only once.
+    """
+    evidence = EvidencePool()
+    results: Dict[str, ResearchResponse] = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(config.template_max_concurrency, len(questions))),
+                            thread_name_prefix="subquestion") as executor:
+        futures = {executor.submit(research_subquestion, question, evidence): question for question in questions}
+        for future in as_completed(futures):
+            question = futures[future]
+            error = None
+            try:
+                results[question] = future.result()
+            except Exception as e:
+                error = e
+            if on_done:
+                on_done(question, error)
+    
+    # Keep the template's question order for the synthesis prompt
+    subquestion_results = [(question, results[question]) for question in questions if question in results]
+    if not subquestion_results:
+        return None
+    return synthesize_research(topic, subquestion_results)
+
+def conduct_template_research(topic: str, questions: List[str], cache_key: str):
+    """Conduct template research with parallel sub-questions, sharing the cache key of the combined query"""
+    cached_result = get_cached_result(cache_key, "research") if not config.verbose_mode else None
+    if cached_result:
+        if config.use_rich_formatting:
+            console.print("📄 [yellow]Using cached result...[/yellow]")
+        else:
+            print("Using cached result...")
+        structured_response = show_cached_research(cached_result)
+        if structured_response:
+            return structured_response
+    
+    with single_flight(cache_key, "research"):
+        if config.use_rich_formatting:
+            console.print(f"\n🔍 [bold blue]Researching {len(questions)} questions in parallel[/bold blue] [dim](up to {config.template_max_concurrency} at a time)[/dim]")
+            console.print("─" * 80)
+        else:
+            print(f"Researching {len(questions)} questions in parallel (up to {config.template_max_concurrency} at a time)...")
+            print("-" * 80)
+        
+        def report(question: str, error: Optional[Exception]) -> None:
+            if config.use_rich_formatting:
+                console.print(f"✅ [green]Done:[/green] {question}" if error is None else f"❌ [red]Failed:[/red] {question} ({error})")
+            else:
+                print(f"Done: {question}" if error is None else f"Failed: {question} ({error})")
+        
+        if config.show_progress_bars and config.use_rich_formatting:
+            with Progress(
+                SpinnerColumn(),
+                TextColumn("[progress.description]{task.description}"),
+                BarColumn(),
+                TextColumn("{task.completed}/{task.total}"),
+                console=console,
+                transient=True
+            ) as progress:
+                task = progress.add_task("🤖 AI Agents are researching...", total=len(questions))
+                
+                def advance(question: str, error: Optional[Exception]) -> None:
+                    report(question, error)
+                    progress.advance(task)
+                
+                structured_response = run_template_research(topic, questions, advance)
+        else:
+            structured_response = run_template_research(topic, questions, report)
+        
+        if structured_response is None:
+            if config.use_rich_formatting:
+                console.print("❌ [red]Research failed: no sub-question could be answered[/red]")
+            else:
+                print("Research failed: no sub-question could be answered")
+            return None
+        
+        cache_result(cache_key, structured_response.dict(), "research")
+    
+    print_research_results(structured_response)
+    offer_download_options(structured_response)
+    return structured_response
+
 def get_user_query():
     """Get research query from user with enhanced input handling"""
     if config.use_rich_formatting:
@@ -699,6 +1119,33 @@ def show_template_options():
             print("Invalid input. Using custom query.")
         return None, None
 
+def network_stats_rows() -> List[Tuple[str, str]]:
+    """(metric, value) rows about the page cache, upstream providers and search latency for the cache statistics screens"""
+    rows = []
+    pages = get_http_cache_stats()
+    if pages:
+        rows.append(("Page Cache", f"{pages['urls']} URLs, {pages['bodies']} distinct bodies"))
+        rows.append(("Page Fresh Hits / Revalidated / Fetches",
+                     f"{pages['fresh_hits']} / {pages['revalidated']} / {pages['fetches']} ({pages['shared_bodies']} shared bodies)"))
+    web = {'hosts': 0, 'calls': 0, 'retries': 0, 'failures': 0, 'rejected': 0, 'open': 0}
+    for name, stats in sorted(get_provider_stats().items()):
+        if name.startswith("web:"):
+            # One guard per web host; summed so the table stays short
+            web['hosts'] += 1
+            web['open'] += stats['state'] != "closed"
+            for counter in ('calls', 'retries', 'failures', 'rejected'):
+                web[counter] += stats[counter]
+            continue
+        rows.append((f"Provider {name}", f"{stats['calls']} calls, {stats['retries']} retries, "
+                     f"{stats['failures']} failures, {stats['rejected']} rejected, circuit {stats['state']}"))
+    if web['hosts']:
+        rows.append((f"Web Hosts ({web['hosts']})", f"{web['calls']} calls, {web['retries']} retries, "
+                     f"{web['failures']} failures, {web['rejected']} rejected, {web['open']} circuits not closed"))
+    for name, latency in sorted(get_latency_stats().items()):
+        if latency['count']:
+            rows.append((f"Search Latency {name}", f"p50 {latency['p50']:.2f}s, p95 {latency['p95']:.2f}s ({latency['count']} samples)"))
+    return rows
+
 def show_settings_menu():
     """Show settings configuration menu"""
     if config.use_rich_formatting:
@@ -732,15 +1179,16 @@ def show_settings_menu():
         options_table.add_row("3", "Toggle auto-save")
         options_table.add_row("4", "Change default format")
         options_table.add_row("5", "View cache statistics")
-        options_table.add_row("6", "Clear cache")
-        options_table.add_row("7", "Reset to defaults")
+        options_table.add_row("6", "Clear expired cache")
+        options_table.add_row("7", "Clear all cache")
+        options_table.add_row("8", "Reset to defaults")
         options_table.add_row("0", "Back to main menu")
         
         console.print(options_table)
         
         choice = Prompt.ask(
             "\n[bold]Select an option[/bold]",
-            choices=["0", "1", "2", "3", "4", "5", "6", "7"],
+            choices=["0", "1", "2", "3", "4", "5", "6", "7", "8"],
             default="0"
         )
     else:
@@ -761,11 +1209,12 @@ def show_settings_menu():
         print("3. Toggle auto-save")
         print("4. Change default format")
         print("5. View cache statistics")
-        print("6. Clear cache")
-        print("7. Reset to defaults")
+        print("6. Clear expired cache")
+        print("7. Clear all cache")
+        print("8. Reset to defaults")
         print("0. Back to main menu")
         
-        choice = input("\nSelect an option (0-7): ").strip()
+        choice = input("\nSelect an option (0-8): ").strip()
     
     if choice == "1":
         update_config(verbose_mode=not config.verbose_mode)
@@ -825,29 +1274,55 @@ def show_settings_menu():
             
             stats_table.add_row("Total Files", str(stats['total_files']))
             stats_table.add_row("Total Size", f"{stats['total_size_mb']} MB")
+            stats_table.add_row("Compression Ratio", f"{stats['compression_ratio']}x ({stats['uncompressed_size_mb']} MB uncompressed)")
             stats_table.add_row("Valid Files", str(stats['valid_files']))
             stats_table.add_row("Expired Files", str(stats['expired_files']))
+            stats_table.add_row("Memory Entries", f"{stats['memory_entries']} ({stats['memory_size_mb']} MB)")
+            stats_table.add_row("Memory Hits / Misses", f"{stats['memory_hits']} / {stats['memory_misses']}")
+            stats_table.add_row("Disk Hits / Misses", f"{stats['disk_hits']} / {stats['disk_misses']}")
+            for metric, value in network_stats_rows():
+                stats_table.add_row(metric, value)
             
             console.print(stats_table)
         else:
             print(f"\nCache Statistics:")
             print(f"  Total Files: {stats['total_files']}")
             print(f"  Total Size: {stats['total_size_mb']} MB")
+            print(f"  Compression Ratio: {stats['compression_ratio']}x ({stats['uncompressed_size_mb']} MB uncompressed)")
             print(f"  Valid Files: {stats['valid_files']}")
             print(f"  Expired Files: {stats['expired_files']}")
+            print(f"  Memory Entries: {stats['memory_entries']} ({stats['memory_size_mb']} MB)")
+            print(f"  Memory Hits / Misses: {stats['memory_hits']} / {stats['memory_misses']}")
+            print(f"  Disk Hits / Misses: {stats['disk_hits']} / {stats['disk_misses']}")
+            for metric, value in network_stats_rows():
+                print(f"  {metric}: {value}")
     
     elif choice == "6":
+        # Cached pages do not expire: stale ones are revalidated, so only the result cache is swept
         if config.use_rich_formatting:
-            if Confirm.ask("Are you sure you want to clear the cache?"):
+            if Confirm.ask("Are you sure you want to clear expired cache entries?"):
                 deleted_count = cleanup_expired_cache()
-                console.print(f"✅ [green]Cleared {deleted_count} expired cache files[/green]")
+                console.print(f"✅ [green]Cleared {deleted_count} expired cache entries (cached pages are kept)[/green]")
         else:
-            confirm = input("Are you sure you want to clear the cache? (y/n): ").strip().lower()
+            confirm = input("Are you sure you want to clear expired cache entries? (y/n): ").strip().lower()
             if confirm in ['y', 'yes']:
                 deleted_count = cleanup_expired_cache()
-                print(f"Cleared {deleted_count} expired cache files")
+                print(f"Cleared {deleted_count} expired cache entries (cached pages are kept)")
     
     elif choice == "7":
+        if config.use_rich_formatting:
+            if Confirm.ask("Are you sure you want to clear the whole cache?"):
+                deleted_count = clear_cache()
+                page_count = clear_http_cache()
+                console.print(f"✅ [green]Cleared all {deleted_count} cache entries and {page_count} cached pages[/green]")
+        else:
+            confirm = input("Are you sure you want to clear the whole cache? (y/n): ").strip().lower()
+            if confirm in ['y', 'yes']:
+                deleted_count = clear_cache()
+                page_count = clear_http_cache()
+                print(f"Cleared all {deleted_count} cache entries and {page_count} cached pages")
+    
+    elif choice == "8":
         if config.use_rich_formatting:
             if Confirm.ask("Are you sure you want to reset all settings to defaults?"):
                 config_manager.reset_to_defaults()
@@ -972,9 +1447,9 @@ def main():
         print("Enhanced with multiple search tools, caching, and smart templates")
         print("Powered by Raworc AI")
     
-    # Cleanup expired cache on startup
+    # Sweep expired cache entries in the background so the menu appears immediately
     if config.enable_caching:
-        cleanup_expired_cache()
+        start_background_cleanup()
     
     while True:
         display_menu()
@@ -1009,15 +1484,19 @@ def main():
                             console.print(f"  {i}. {q}")
                         
                         # Combine queries for comprehensive research
-                        combined_query = f"Research about {topic}: " + " ".join(template_queries)
+                        combined_query = get_template_research_query(topic, template_queries)
                     else:
                         print(f"\nUsing {template_name.title()} template for: {topic}")
                         print("Generated Research Questions:")
                         for i, q in enumerate(template_queries, 1):
                             print(f"  {i}. {q}")
-                        combined_query = f"Research about {topic}: " + " ".join(template_queries)
+                        combined_query = get_template_research_query(topic, template_queries)
                     
-                    conduct_research(combined_query)
+                    if config.parallel_template_research:
+                        # One agent per question, run concurrently and merged in a synthesis step
+                        conduct_template_research(topic, template_queries, combined_query)
+                    else:
+                        conduct_research(combined_query)
                 else:
                     # Fall back to custom query
                     query = get_user_query()
@@ -1045,18 +1524,30 @@ def main():
                     
                     table.add_row("Total Cache Files", str(stats['total_files']))
                     table.add_row("Total Size", f"{stats['total_size_mb']} MB")
+                    table.add_row("Compression Ratio", f"{stats['compression_ratio']}x ({stats['uncompressed_size_mb']} MB uncompressed)")
                     table.add_row("Valid Files", str(stats['valid_files']))
                     table.add_row("Expired Files", str(stats['expired_files']))
+                    table.add_row("Memory Entries", f"{stats['memory_entries']} ({stats['memory_size_mb']} MB)")
+                    table.add_row("Memory Hits / Misses", f"{stats['memory_hits']} / {stats['memory_misses']}")
+                    table.add_row("Disk Hits / Misses", f"{stats['disk_hits']} / {stats['disk_misses']}")
                     table.add_row("Cache Status", "✅ Enabled" if config.enable_caching else "❌ Disabled")
+                    for metric, value in network_stats_rows():
+                        table.add_row(metric, value)
                     
                     console.print(table)
                 else:
                     print(f"\nCache Statistics:")
                     print(f"  Total Cache Files: {stats['total_files']}")
                     print(f"  Total Size: {stats['total_size_mb']} MB")
+                    print(f"  Compression Ratio: {stats['compression_ratio']}x ({stats['uncompressed_size_mb']} MB uncompressed)")
                     print(f"  Valid Files: {stats['valid_files']}")
                     print(f"  Expired Files: {stats['expired_files']}")
+                    print(f"  Memory Entries: {stats['memory_entries']} ({stats['memory_size_mb']} MB)")
+                    print(f"  Memory Hits / Misses: {stats['memory_hits']} / {stats['memory_misses']}")
+                    print(f"  Disk Hits / Misses: {stats['disk_hits']} / {stats['disk_misses']}")
                     print(f"  Cache Status: {'Enabled' if config.enable_caching else 'Disabled'}")
+                    for metric, value in network_stats_rows():
+                        print(f"  {metric}: {value}")
                 
             elif choice == "6":
                 show_help()
@@ -0,0 +1,120 @@
+"""
+Query-focused passage selection for Research Agent tool observations
+"""
+import math
+import re
+from collections import Counter
+from typing import List, Optional, Pattern
+
+from similarity import canonical_tokens
+
+SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+|\n+")
+PASSAGE_SEPARATOR = " ... "
+
+def split_passages(text: str, passage_words: int = 60) -> List[str]:
+    """
+    Split text into passages of roughly passage_words words on sentence and line boundaries.
+
+    Lines are never merged, so structured output (e.g. "Title: ..." lines)
+    keeps its own passages; long runs of sentences are grouped, and text
+    without punctuation (menus, link lists) is cut into word windows.
+    """
+    passages = []
+    for line in text.split("\n"):
+        current: List[str] = []
+        words = 0
+        for sentence in SENTENCE_BREAK.split(line):
+            sentence_words = sentence.split()
+            if not sentence_words:
+                continue
+            if len(sentence_words) > passage_words:
+                if current:
+                    passages.append(" ".join(current))
+                    current, words = [], 0
+                passages.extend(
+                    " ".join(sentence_words[start:start + passage_words])
+                    for start in range(0, len(sentence_words), passage_words)
+                )
+                continue
+            sentence = " ".join(sentence_words)
+            count = len(sentence_words)
+            if current and words + count > passage_words:
+                passages.append(" ".join(current))
+                current, words = [], 0
+            current.append(sentence)
+            words += count
+        if current:
+            passages.append(" ".join(current))
+    return passages
+
+def bm25_scores(passages: List[List[str]], query_terms: List[str], k1: float = 1.5, b: float = 0.75) -> List[float]:
+    """Okapi BM25 score of each tokenized passage for the query, using the passages themselves as the corpus"""
+    if not passages:
+        return []
+    
+    average_length = sum(len(terms) for terms in passages) / len(passages) or 1.0
+    document_frequency = Counter(term for terms in passages for term in set(terms))
+    idf = {
+        term: math.log(1 + (len(passages) - document_frequency[term] + 0.5) / (document_frequency[term] + 0.5))
+        for term in set(query_terms)
+    }
+    
+    scores = []
+    for terms in passages:
+        counts = Counter(terms)
+        norm = k1 * (1 - b + b * len(terms) / average_length)
+        scores.append(sum(
+            idf[term] * counts[term] * (k1 + 1) / (counts[term] + norm)
+            for term in idf if counts[term]
+        ))
+    return scores
+
+def select_passages(text: str, query: Optional[str], budget: int, passage_words: int = 60,
+                    pinned: Optional[Pattern] = None) -> str:
+    """
+    Keep the passages most relevant to query that fit in budget characters, in document order.
+
+    Text that already fits is returned unchanged. Passages matching pinned
+    (e.g. titles) are always kept. Without a query, or when no passage
+    matches it, this falls back to the leading budget characters.
+    """
+    if len(text) <= budget:
+        return text
+    
+    query_terms = canonical_tokens(query or "")
+    passages = split_passages(text, passage_words)
+    scores = bm25_scores([canonical_tokens(passage) for passage in passages], query_terms)
+    if not any(scores):
+        return text[:budget] + "..."
+    
+    chosen = set()
+    used = 0
+    
+    def take(index: int) -> None:
+        nonlocal used
+        cost = len(passages[index]) + (len(PASSAGE_SEPARATOR) if chosen else 0)
+        if used + cost <= budget:
+            chosen.add(index)
+            used += cost
+    
+    if pinned is not None:
+        for index, passage in enumerate(passages):
+            if pinned.match(passage):
+                take(index)
+    
+    ranked = sorted(range(len(passages)), key=lambda index: (-scores[index], index))
+    matching = [index for index in ranked if scores[index] > 0]
+    for index in matching:
+        take(index)
+    
+    # Spend any budget left on the passages around the best matches for context
+    for index in matching:
+        for neighbour in (index + 1, index - 1):
+            if 0 <= neighbour < len(passages) and neighbour not in chosen:
+                take(neighbour)
+    
+    if not any(scores[index] > 0 for index in chosen):
+        # The best passage alone is over budget, so return a cut-down copy of it
+        best = passages[ranked[0]]
+        return best[:budget] + "..."
+    return PASSAGE_SEPARATOR.join(passages[index] for index in sorted(chosen))
@@ -0,0 +1,302 @@
+"""
+Rate limiting, retries and circuit breakers for the Research Agent tools
+"""
+import random
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+from config import get_config
+
+RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+# A half-open probe that has not reported back after this long is treated as failed
+PROBE_TIMEOUT_SECONDS = 120.0
+# Guards kept at most, since every web host gets its own
+MAX_PROVIDER_GUARDS = 256
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider whose circuit breaker is open"""
+    
+    def __init__(self, provider: str, retry_in: float):
+        super().__init__(f"{provider} is temporarily unavailable after repeated failures (retry in {retry_in:.0f}s)")
+        self.provider = provider
+        self.retry_in = retry_in
+
+class TokenBucket:
+    """Thread-safe token bucket allowing rate calls per second with bursts of up to capacity
+
+    Callers reserve a token under the lock and sleep outside it, so waiting
+    threads are served in arrival order without holding the lock.
+    """
+    
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self) -> float:
+        """Take one token, sleeping until it is available; returns the time waited"""
+        if self.rate <= 0:
+            return 0.0
+        
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+class CircuitBreaker:
+    """Stop calling a provider after consecutive failures, probing it again after reset_seconds
+
+    States follow the usual closed -> open -> half-open cycle: while open
+    every call fails fast, and once reset_seconds have passed a single
+    probe call decides whether to close the circuit or reopen it. A probe
+    that never reports back within probe_timeout_seconds (its thread died,
+    say) reopens the circuit, so the provider is not shut out for good.
+    """
+    
+    def __init__(self, failure_threshold: int, reset_seconds: float,
+                 probe_timeout_seconds: float = PROBE_TIMEOUT_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.probe_timeout_seconds = probe_timeout_seconds
+        self.failures = 0
+        self.state = "closed"
+        self._opened_at = 0.0
+        self._probe_started = 0.0
+        self._lock = threading.Lock()
+    
+    def before_call(self, provider: str) -> None:
+        """Raise CircuitOpenError unless a call may go through now"""
+        with self._lock:
+            if self.state == "closed":
+                return
+            
+            now = time.monotonic()
+            if self.state == "half_open" and now - self._probe_started >= self.probe_timeout_seconds:
+                self.state = "open"
+                self._opened_at = now
+            
+            retry_in = self._opened_at + self.reset_seconds - now
+            if self.state == "open" and retry_in <= 0:
+                # Let exactly one caller probe the provider
+                self.state = "half_open"
+                self._probe_started = now
+                return
+            # While a probe is in flight, retry_in is zero or negative: the verdict is due any moment
+            raise CircuitOpenError(provider, max(retry_in, 0))
+    
+    def can_forget(self) -> bool:
+        """Whether a new breaker would let calls through just as this one does"""
+        with self._lock:
+            if self.state == "closed":
+                return True
+            return self.state == "open" and time.monotonic() - self._opened_at >= self.reset_seconds
+    
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.state = "closed"
+    
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                self.state = "open"
+                self._opened_at = time.monotonic()
+
+def is_retryable(error: Exception) -> bool:
+    """Whether an error looks transient (throttling, timeouts, server errors) rather than a bad request"""
+    if isinstance(error, CircuitOpenError):
+        return False
+    
+    response = getattr(error, "response", None)
+    status_code = getattr(response, "status_code", None)
+    if status_code is not None:
+        return status_code in RETRYABLE_STATUS_CODES
+    
+    # Bad input (e.g. an unsupported content type) will not succeed on retry
+    return not isinstance(error, (ValueError, TypeError))
+
+def _retry_after_seconds(error: Exception) -> Optional[float]:
+    """Read a numeric Retry-After header from an HTTP error, if present"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+class ProviderLimits:
+    """Token bucket and concurrency slots, shared by every guard under the same policy
+
+    max_concurrency bounds the requests in flight at once (0 means no limit).
+    """
+    
+    def __init__(self, rate: float, burst: int, max_concurrency: int = 0):
+        self.bucket = TokenBucket(rate, burst)
+        self.slots = threading.BoundedSemaphore(max_concurrency) if max_concurrency > 0 else None
+
+class ProviderGuard:
+    """Rate limit, concurrency limit, retry and circuit breaker for one upstream provider
+
+    max_concurrency bounds the requests in flight at once (0 means no
+    limit); a slot is held only while func runs, not during backoff.
+    Passing limits makes the guard draw from those shared limits instead
+    of its own rate, burst and max_concurrency, while it keeps its own
+    circuit breaker.
+    """
+    
+    def __init__(self, name: str, rate: float, burst: int, max_retries: int,
+                 backoff_seconds: float, backoff_max_seconds: float,
+                 failure_threshold: int, reset_seconds: float, max_concurrency: int = 0,
+                 limits: Optional[ProviderLimits] = None):
+        self.name = name
+        self.limits = limits or ProviderLimits(rate, burst, max_concurrency)
+        self.bucket = self.limits.bucket
+        self.slots = self.limits.slots
+        self.breaker = CircuitBreaker(failure_threshold, reset_seconds)
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self.counters = {'calls': 0, 'retries': 0, 'failures': 0, 'rejected': 0}
+        self._counters_lock = threading.Lock()
+    
+    def _count(self, counter: str) -> None:
+        # Guards are shared by every worker thread, and += on a dict item is not atomic
+        with self._counters_lock:
+            self.counters[counter] += 1
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get a consistent copy of the counters and the circuit state"""
+        with self._counters_lock:
+            return dict(self.counters, state=self.breaker.state)
+    
+    def _backoff(self, attempt: int, error: Optional[Exception]) -> float:
+        """Exponential backoff with jitter, honouring Retry-After when the provider sends it"""
+        retry_after = _retry_after_seconds(error) if error is not None else None
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max_seconds)
+        delay = min(self.backoff_max_seconds, self.backoff_seconds * (2 ** attempt))
+        return delay * random.uniform(0.5, 1.0)
+    
+    def call(self, func: Callable[..., Any], *args: Any,
+             is_failure: Optional[Callable[[Any], bool]] = None, **kwargs: Any) -> Any:
+        """
+        Call func through the rate limiter, retrying transient errors with backoff.
+
+        is_failure marks results that signal an error without raising (e.g.
+        an error string); they are retried like exceptions and, if retries
+        run out, the last such result is returned. Raises CircuitOpenError
+        without calling func while the provider's circuit is open.
+        """
+        try:
+            self.breaker.before_call(self.name)
+        except CircuitOpenError:
+            self._count('rejected')
+            raise
+        
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            self._count('calls')
+            error = None
+            try:
+                if self.slots is None:
+                    result = func(*args, **kwargs)
+                else:
+                    with self.slots:
+                        result = func(*args, **kwargs)
+            except Exception as e:
+                if not is_retryable(e):
+                    # The provider answered; the request itself was bad
+                    self.breaker.record_success()
+                    raise
+                error = e
+            else:
+                if is_failure is None or not is_failure(result):
+                    self.breaker.record_success()
+                    return result
+            
+            if attempt == self.max_retries:
+                break
+            self._count('retries')
+            time.sleep(self._backoff(attempt, error))
+        
+        self._count('failures')
+        self.breaker.record_failure()
+        if error is not None:
+            raise error
+        return result
+
+_limits: Dict[str, ProviderLimits] = {}
+_guards: "OrderedDict[str, ProviderGuard]" = OrderedDict()
+_guards_lock = threading.Lock()
+
+def get_guard(provider: str, policy: Optional[str] = None, shared_limits: Optional[str] = None) -> ProviderGuard:
+    """
+    Get the shared guard for a provider, creating it from the config on first use.
+
+    policy names the provider_rate_limits and provider_concurrency entries
+    to use when they differ from the provider name, e.g. each web host is
+    limited to the "web" rate. Providers created with the same
+    shared_limits name draw from one bucket and one set of slots, while
+    each keeps its own circuit breaker. Guards are kept in least recently
+    used order, and beyond MAX_PROVIDER_GUARDS the oldest ones whose
+    circuit could be forgotten are dropped.
+    """
+    with _guards_lock:
+        guard = _guards.get(provider)
+        if guard is not None:
+            _guards.move_to_end(provider)
+            return guard
+        
+        config = get_config()
+        rate = config.provider_rate_limits.get(policy or provider, 0)
+        max_concurrency = config.provider_concurrency.get(policy or provider, 0)
+        limits = None
+        if shared_limits is not None:
+            limits = _limits.get(shared_limits)
+            if limits is None:
+                limits = _limits[shared_limits] = ProviderLimits(rate, config.provider_burst, max_concurrency)
+        guard = _guards[provider] = ProviderGuard(
+            provider, rate, config.provider_burst,
+            max_retries=config.tool_max_retries,
+            backoff_seconds=config.retry_backoff_seconds,
+            backoff_max_seconds=config.retry_backoff_max_seconds,
+            failure_threshold=config.circuit_failure_threshold,
+            reset_seconds=config.circuit_reset_seconds,
+            max_concurrency=max_concurrency,
+            limits=limits
+        )
+        _evict_guards()
+        return guard
+
+def _evict_guards() -> None:
+    """Drop the least recently used guards beyond MAX_PROVIDER_GUARDS; the caller holds _guards_lock"""
+    excess = len(_guards) - MAX_PROVIDER_GUARDS
+    for name in list(_guards):
+        if excess <= 0:
+            break
+        if _guards[name].breaker.can_forget():
+            del _guards[name]
+            excess -= 1
+
+def call_provider(provider: str, func: Callable[..., Any], *args: Any, policy: Optional[str] = None,
+                  shared_limits: Optional[str] = None, is_failure: Optional[Callable[[Any], bool]] = None,
+                  **kwargs: Any) -> Any:
+    """Call func through the guard for a provider"""
+    return get_guard(provider, policy, shared_limits).call(func, *args, is_failure=is_failure, **kwargs)
+
+def get_provider_stats() -> Dict[str, Dict[str, Any]]:
+    """Get call counters and circuit state for every provider whose guard is still kept"""
+    with _guards_lock:
+        guards = list(_guards.values())
+    return {guard.name: guard.get_stats() for guard in guards}
@@ -0,0 +1,216 @@
+"""
+Pluggable web search providers with hedged requests for the Research Agent
+"""
+import bisect
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from langchain_community.tools import DuckDuckGoSearchRun
+from langchain_community.utilities import DuckDuckGoSearchAPIWrapper
+
+from config import get_config
+from resilience import call_provider
+
+class LatencyHistogram:
+    """Thread-safe latency histogram with logarithmic buckets from 10 ms to about 10 minutes
+
+    Counts are halved once max_samples is reached, so quantiles follow the
+    provider's recent behaviour rather than its whole history.
+    """
+    
+    BOUNDS = tuple(0.01 * 1.25 ** i for i in range(50))
+    
+    def __init__(self, max_samples: int = 1000):
+        self.max_samples = max_samples
+        self._counts = [0] * (len(self.BOUNDS) + 1)
+        self._total = 0
+        self._lock = threading.Lock()
+    
+    @property
+    def count(self) -> int:
+        return self._total
+    
+    def record(self, seconds: float) -> None:
+        """Add one observed latency"""
+        with self._lock:
+            if self._total >= self.max_samples:
+                self._counts = [count // 2 for count in self._counts]
+                self._total = sum(self._counts)
+            self._counts[bisect.bisect_left(self.BOUNDS, seconds)] += 1
+            self._total += 1
+    
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-th quantile, or None without samples"""
+        with self._lock:
+            if self._total == 0:
+                return None
+            rank = q * self._total
+            seen = 0
+            for index, count in enumerate(self._counts):
+                seen += count
+                if seen >= rank and count:
+                    return self.BOUNDS[min(index, len(self.BOUNDS) - 1)]
+            return self.BOUNDS[-1]
+
+class SearchProvider(ABC):
+    """A web search backend returning a text block of results"""
+    
+    name: str = "provider"
+    
+    def __init__(self):
+        self.latency = LatencyHistogram()
+    
+    @abstractmethod
+    def search(self, query: str, max_results: int, region: str = "wt-wt", time_range: Optional[str] = "y") -> str:
+        """Run a search and return the results as text; raise on failure"""
+    
+    def timed_search(self, query: str, max_results: int, region: str = "wt-wt", time_range: Optional[str] = "y") -> str:
+        """Run a search and record how long it took, including failures"""
+        start = time.perf_counter()
+        try:
+            return self.search(query, max_results, region, time_range)
+        finally:
+            self.latency.record(time.perf_counter() - start)
+
+@lru_cache(maxsize=None)
+def _duckduckgo_tool(backend: str, max_results: int, region: str, time_range: Optional[str]) -> DuckDuckGoSearchRun:
+    """Build a DuckDuckGo search tool once per settings combination"""
+    search_wrapper = DuckDuckGoSearchAPIWrapper(region=region, time=time_range, max_results=max_results, backend=backend)
+    return DuckDuckGoSearchRun(api_wrapper=search_wrapper)
+
+class DuckDuckGoProvider(SearchProvider):
+    """DuckDuckGo through one of duckduckgo-search's backends ('api', 'html' or 'lite')
+
+    Every backend draws from one "duckduckgo" rate and concurrency limit
+    but has its own circuit breaker, so one backend failing does not stop
+    the others.
+    """
+    
+    def __init__(self, backend: str = "api"):
+        super().__init__()
+        self.backend = backend
+        self.name = f"duckduckgo_{backend}"
+    
+    def search(self, query: str, max_results: int, region: str = "wt-wt", time_range: Optional[str] = "y") -> str:
+        search_tool = _duckduckgo_tool(self.backend, max_results, region, time_range)
+        return call_provider(
+            f"duckduckgo:{self.backend}", search_tool.run, query, policy="duckduckgo", shared_limits="duckduckgo"
+        )
+
+class StaticSearchProvider(SearchProvider):
+    """Local stand-in provider answering from a fixed text or callable, with optional latency and failures
+
+    Meant for tests and offline runs; register it with register_provider
+    and list its name in config.search_providers.
+    """
+    
+    def __init__(self, name: str, results: Any = "", latency_seconds: float = 0.0,
+                 error: Optional[Exception] = None):
+        super().__init__()
+        self.name = name
+        self.results = results
+        self.latency_seconds = latency_seconds
+        self.error = error
+        self.calls = 0
+    
+    def search(self, query: str, max_results: int, region: str = "wt-wt", time_range: Optional[str] = "y") -> str:
+        self.calls += 1
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        if self.error is not None:
+            raise self.error
+        return self.results(query) if callable(self.results) else str(self.results)
+
+PROVIDER_FACTORIES: Dict[str, Callable[[], SearchProvider]] = {
+    "duckduckgo_api": lambda: DuckDuckGoProvider("api"),
+    "duckduckgo_html": lambda: DuckDuckGoProvider("html"),
+    "duckduckgo_lite": lambda: DuckDuckGoProvider("lite"),
+}
+
+_providers: Dict[str, SearchProvider] = {}
+_providers_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="search-hedge")
+
+def register_provider(provider: SearchProvider) -> None:
+    """Make a provider instance available under its name, replacing any existing one"""
+    with _providers_lock:
+        _providers[provider.name] = provider
+
+def get_provider(name: str) -> SearchProvider:
+    """Get the shared instance of a named provider"""
+    with _providers_lock:
+        if name not in _providers:
+            if name not in PROVIDER_FACTORIES:
+                raise ValueError(f"Unknown search provider '{name}'")
+            _providers[name] = PROVIDER_FACTORIES[name]()
+        return _providers[name]
+
+def get_hedge_delay(provider: SearchProvider) -> float:
+    """Seconds to wait on a provider before hedging: its p95 latency, clamped to the configured bounds"""
+    config = get_config()
+    p95 = provider.latency.quantile(0.95) if provider.latency.count >= config.hedge_min_samples else None
+    if p95 is None:
+        return config.hedge_max_delay_seconds
+    return min(max(p95, config.hedge_min_delay_seconds), config.hedge_max_delay_seconds)
+
+def search(query: str, max_results: int, region: str = "wt-wt", time_range: Optional[str] = "y") -> Tuple[str, str]:
+    """
+    Search with the configured providers and return (provider name, results).
+
+    The first provider is asked first. With hedged search enabled, the next
+    provider is also asked if the first has not answered within its p95
+    latency (or as soon as it fails), and the first successful answer wins.
+    Without hedging, providers are tried one after another until one succeeds.
+    """
+    config = get_config()
+    providers = [get_provider(name) for name in config.search_providers]
+    if not providers:
+        raise ValueError("No search providers configured")
+    
+    owners: Dict[Future, SearchProvider] = {}
+    
+    def submit(provider: SearchProvider) -> Future:
+        future = _executor.submit(provider.timed_search, query, max_results, region, time_range)
+        owners[future] = provider
+        return future
+    
+    errors: List[str] = []
+    if not config.enable_hedged_search:
+        for provider in providers:
+            try:
+                return provider.name, provider.timed_search(query, max_results, region, time_range)
+            except Exception as e:
+                errors.append(f"{provider.name}: {e}")
+        raise RuntimeError("; ".join(errors))
+    
+    pending = {submit(providers[0])}
+    remaining = providers[1:]
+    while pending:
+        # Only the newest request can trigger a hedge; older ones just keep running
+        timeout = get_hedge_delay(providers[len(providers) - len(remaining) - 1]) if remaining else None
+        done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            try:
+                return owners[future].name, future.result()
+            except Exception as e:
+                errors.append(f"{owners[future].name}: {e}")
+        if remaining:
+            pending.add(submit(remaining.pop(0)))
+    raise RuntimeError("; ".join(errors))
+
+def get_latency_stats() -> Dict[str, Dict[str, Any]]:
+    """Get sample count, p50 and p95 latency for every provider used so far"""
+    with _providers_lock:
+        providers = list(_providers.values())
+    return {
+        provider.name: {
+            'count': provider.latency.count,
+            'p50': provider.latency.quantile(0.5),
+            'p95': provider.latency.quantile(0.95)
+        }
+        for provider in providers
+    }
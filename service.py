@@ -0,0 +1,299 @@
+"""
+Long-running HTTP research service for the Research Agent
+
+Endpoints (JSON in, JSON out):
+  POST /research           {"query": "..."}                      -> 202 job
+  POST /research/template  {"template": "...", "topic": "..."}   -> 202 job
+  GET  /jobs/<id>          job status
+  GET  /jobs/<id>/result   200 with the ResearchResponse once done, 202 while pending
+  GET  /health             queue and worker counts
+
+Usage: python service.py [--host HOST] [--port PORT] [--workers N]
+"""
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from config import get_config
+from batch import run_job
+from cache import normalize_query
+from templates import get_template_queries, get_template_research_query
+
+MAX_BODY_BYTES = 64 * 1024
+REASONS = {200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 429: "Too Many Requests", 500: "Internal Server Error"}
+
+class ResearchJob:
+    """One research request and its outcome"""
+    
+    def __init__(self, job: Dict[str, Any], key: str):
+        self.id = uuid.uuid4().hex
+        self.job = job
+        self.key = key
+        self.status = "queued"
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.requests = 1
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'id': self.id,
+            'status': self.status,
+            **{key: self.job[key] for key in ('query', 'template', 'topic') if key in self.job},
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'coalesced_requests': self.requests - 1,
+            'error': self.error
+        }
+
+def job_key(job: Dict[str, Any]) -> str:
+    """Key under which identical requests are coalesced, the same as their research cache key"""
+    if 'template' in job:
+        topic = str(job.get('topic', '')).strip()
+        return normalize_query(get_template_research_query(topic, get_template_queries(job['template'], topic)))
+    return normalize_query(job.get('query', ''))
+
+class ResearchService:
+    """Bounded job queue served by a fixed number of research workers
+
+    Admission control: once queue_size jobs are waiting, new work is
+    refused with 429 and a Retry-After estimate instead of piling up.
+    A request identical to a job still queued or running gets that job
+    back rather than a new one. Finished jobs are kept for job_ttl_seconds
+    so clients can poll for their results.
+    """
+    
+    def __init__(self, workers: int = 4, queue_size: int = 100, job_ttl_seconds: float = 3600):
+        self.workers = workers
+        self.queue: "asyncio.Queue[ResearchJob]" = asyncio.Queue(maxsize=queue_size)
+        self.jobs: Dict[str, ResearchJob] = {}
+        # Finished jobs in the order they finished, so expiry never waits on a long-running job
+        self.finished: "OrderedDict[str, ResearchJob]" = OrderedDict()
+        self.inflight: Dict[str, ResearchJob] = {}
+        self.job_ttl_seconds = job_ttl_seconds
+        self.running = 0
+        self.completed = 0
+        self.average_seconds = 60.0
+        self._tasks = []
+    
+    def start(self) -> None:
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+    
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+    
+    def _purge(self) -> None:
+        """Forget finished jobs older than job_ttl_seconds"""
+        cutoff = time.time() - self.job_ttl_seconds
+        while self.finished:
+            job = next(iter(self.finished.values()))
+            if job.finished_at > cutoff:
+                break
+            self.finished.popitem(last=False)
+            self.jobs.pop(job.id, None)
+    
+    def submit(self, job: Dict[str, Any]) -> Tuple[Optional[ResearchJob], bool]:
+        """Queue a job, returning (job, coalesced), or (None, False) when the queue is full"""
+        self._purge()
+        key = job_key(job)
+        existing = self.inflight.get(key)
+        if existing is not None:
+            existing.requests += 1
+            return existing, True
+        
+        research_job = ResearchJob(job, key)
+        try:
+            self.queue.put_nowait(research_job)
+        except asyncio.QueueFull:
+            return None, False
+        self.jobs[research_job.id] = research_job
+        self.inflight[key] = research_job
+        return research_job, False
+    
+    def retry_after(self) -> int:
+        """Seconds until a queue slot is likely to free up"""
+        return max(1, round(self.average_seconds * (self.queue.qsize() + 1) / self.workers))
+    
+    async def _worker(self) -> None:
+        while True:
+            job = await self.queue.get()
+            job.status = "running"
+            job.started_at = time.time()
+            self.running += 1
+            try:
+                # The agent, its tools and their clients block, so each job runs on a thread
+                job.result = await asyncio.to_thread(run_job, job.job)
+                job.status = "done"
+            except Exception as e:
+                job.status = "failed"
+                job.error = str(e)
+            finally:
+                job.finished_at = time.time()
+                self.running -= 1
+                self.completed += 1
+                self.average_seconds = 0.8 * self.average_seconds + 0.2 * (job.finished_at - job.started_at)
+                self.inflight.pop(job.key, None)
+                self.finished[job.id] = job
+                self.queue.task_done()
+    
+    def health(self) -> Dict[str, Any]:
+        return {
+            'status': 'ok',
+            'workers': self.workers,
+            'running': self.running,
+            'queued': self.queue.qsize(),
+            'queue_capacity': self.queue.maxsize,
+            'completed': self.completed,
+            'average_job_seconds': round(self.average_seconds, 1)
+        }
+    
+    def handle(self, method: str, path: str, body: Any) -> Tuple[int, Dict[str, Any], Dict[str, str]]:
+        """Route one request and return (status, JSON body, extra headers)"""
+        parts = [part for part in path.split("?")[0].split("/") if part]
+        
+        if parts == ["health"]:
+            return 200, self.health(), {}
+        
+        if parts in (["research"], ["research", "template"]):
+            if method != "POST":
+                return 405, {'error': "use POST"}, {'Allow': "POST"}
+            if not isinstance(body, dict):
+                return 400, {'error': "request body must be a JSON object"}, {}
+            if parts == ["research"]:
+                if not str(body.get('query', '')).strip():
+                    return 400, {'error': "missing 'query'"}, {}
+                job = {'query': str(body['query']).strip()}
+            else:
+                topic = str(body.get('topic', '')).strip()
+                if not topic or not get_template_queries(str(body.get('template', '')), topic):
+                    return 400, {'error': "missing 'topic' or unknown 'template'"}, {}
+                job = {'template': str(body['template']), 'topic': topic}
+            
+            research_job, coalesced = self.submit(job)
+            if research_job is None:
+                retry_after = self.retry_after()
+                return 429, {'error': "research queue is full", 'retry_after_seconds': retry_after}, {'Retry-After': str(retry_after)}
+            return 202, dict(research_job.to_dict(), coalesced=coalesced), {'Location': f"/jobs/{research_job.id}"}
+        
+        if len(parts) in (2, 3) and parts[0] == "jobs" and (len(parts) == 2 or parts[2] == "result"):
+            if method != "GET":
+                return 405, {'error': "use GET"}, {'Allow': "GET"}
+            research_job = self.jobs.get(parts[1])
+            if research_job is None:
+                return 404, {'error': "unknown or expired job"}, {}
+            if len(parts) == 2:
+                return 200, research_job.to_dict(), {}
+            if research_job.status == "done":
+                return 200, research_job.result, {}
+            if research_job.status == "failed":
+                return 500, {'error': research_job.error}, {}
+            return 202, research_job.to_dict(), {'Retry-After': "5"}
+        
+        return 404, {'error': "not found"}, {}
+
+async def read_request(reader: asyncio.StreamReader) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+    """Read one HTTP/1.1 request; None when the client closed the connection"""
+    request_line = await reader.readline()
+    if not request_line.strip():
+        return None
+    method, path, _ = request_line.decode('latin-1').split(" ", 2)
+    
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode('latin-1').partition(":")
+        headers[name.strip().lower()] = value.strip()
+    
+    length = int(headers.get('content-length', 0) or 0)
+    if length > MAX_BODY_BYTES:
+        raise ValueError("payload too large")
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), path, headers, body
+
+def render_response(status: int, payload: Any, extra_headers: Dict[str, str], keep_alive: bool) -> bytes:
+    body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    headers = {
+        'Content-Type': "application/json; charset=utf-8",
+        'Content-Length': str(len(body)),
+        'Connection': "keep-alive" if keep_alive else "close",
+        **extra_headers
+    }
+    head = f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n" + "".join(f"{name}: {value}\r\n" for name, value in headers.items())
+    return head.encode('latin-1') + b"\r\n" + body
+
+async def serve(host: str, port: int, workers: int) -> None:
+    """Build the agent once, then serve research requests until cancelled"""
+    # Importing main builds the LLM, agent and tools once for the whole process
+    import main  # noqa: F401
+    
+    config = get_config()
+    service = ResearchService(workers, config.service_queue_size, config.service_job_ttl_seconds)
+    service.start()
+    
+    async def handle_connection(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                except (ValueError, asyncio.IncompleteReadError) as e:
+                    status = 413 if "too large" in str(e) else 400
+                    writer.write(render_response(status, {'error': str(e)}, {}, keep_alive=False))
+                    break
+                if request is None:
+                    break
+                
+                method, path, headers, raw_body = request
+                try:
+                    body = json.loads(raw_body) if raw_body else None
+                    status, payload, extra_headers = service.handle(method, path, body)
+                except json.JSONDecodeError:
+                    status, payload, extra_headers = 400, {'error': "request body is not valid JSON"}, {}
+                except Exception as e:
+                    status, payload, extra_headers = 500, {'error': str(e)}, {}
+                
+                keep_alive = headers.get('connection', '').lower() != "close"
+                writer.write(render_response(status, payload, extra_headers, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+    
+    server = await asyncio.start_server(handle_connection, host, port)
+    print(f"Research service listening on http://{host}:{port} with {workers} workers")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.stop()
+
+def main() -> None:
+    """Parse the command line and run the service"""
+    config = get_config()
+    arg_parser = argparse.ArgumentParser(description="Serve research over HTTP with a bounded job queue")
+    arg_parser.add_argument("--host", default=config.service_host)
+    arg_parser.add_argument("--port", type=int, default=config.service_port)
+    arg_parser.add_argument("--workers", type=int, default=config.service_workers, help="research jobs run at once")
+    args = arg_parser.parse_args()
+    
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
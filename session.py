@@ -0,0 +1,51 @@
+"""
+Per-research session state shared with the Research Agent tools
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+from config import get_config
+from dedup import ObservationLedger
+from evidence import EvidencePool
+
+class ResearchSession:
+    """State for one research run, visible to every tool call made on its behalf
+
+    The ledger belongs to this run alone, since it tracks what this agent
+    has seen; the evidence pool may be shared with other runs of the same
+    research, such as the sub-questions of a template.
+    """
+    
+    def __init__(self, query: str, evidence: Optional[EvidencePool] = None):
+        self.query = query
+        self.ledger = ObservationLedger(get_config().dedup_similarity_threshold)
+        self.evidence = evidence if evidence is not None else EvidencePool()
+
+_current_session: ContextVar[Optional[ResearchSession]] = ContextVar("research_session", default=None)
+
+@contextmanager
+def research_session(query: str, evidence: Optional[EvidencePool] = None) -> Iterator[ResearchSession]:
+    """
+    Make a research session current for the duration of an agent run.
+
+    The session lives in a context variable, so it follows the run into
+    asyncio tasks and asyncio.to_thread workers but not into unrelated
+    threads or concurrent runs. Pass evidence to share an evidence pool
+    with other sessions.
+    """
+    session = ResearchSession(query, evidence)
+    token = _current_session.set(session)
+    try:
+        yield session
+    finally:
+        _current_session.reset(token)
+
+def get_session() -> Optional[ResearchSession]:
+    """Get the current research session, if any"""
+    return _current_session.get()
+
+def get_session_query() -> Optional[str]:
+    """Get the query of the current research session, if any"""
+    session = _current_session.get()
+    return session.query if session else None
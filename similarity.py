@@ -0,0 +1,119 @@
+"""
+Near-duplicate query matching for the Research Agent cache
+"""
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+from typing import Optional, Dict, List, Set, Tuple
+
+STOPWORDS = frozenset("""
+a about above after all also an and any are as at be been being between both but by can could did do does
+doing during each for from had has have having how i if in into is it its just me more most my no nor not
+now of on or other our out over own please same should so some such tell than that the their them then there
+these they this those through to too under until up very was we were what when where which while who whom
+why will with would you your
+""".split())
+
+# Only words that never change what a query asks: articles and auxiliary verbs. Negations,
+# question words and time or comparison words ("not", "why", "after", "over") all do.
+QUERY_STOPWORDS = frozenset("a an the am is are was were be been being do does did has have had".split())
+
+def _stem(word: str) -> str:
+    """Strip common plural suffixes so 'developments' matches 'development'"""
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+def canonical_tokens(text: str) -> List[str]:
+    """Lowercase, tokenize, drop stopwords and stem a query"""
+    words = re.findall(r"[a-z0-9]+", text.lower())
+    return [_stem(word) for word in words if word not in STOPWORDS]
+
+def query_tokens(text: str) -> List[str]:
+    """Lowercase, tokenize and stem a query, dropping only articles and auxiliary verbs"""
+    words = re.findall(r"[a-z0-9]+", text.lower())
+    return [_stem(word) for word in words if word not in QUERY_STOPWORDS]
+
+class QuerySimilarityIndex:
+    """In-memory TF-IDF index of cached queries for offline near-duplicate lookup
+
+    Documents are query_tokens bags keyed by cache key. A cached query
+    only matches if it has exactly the same set of terms as the probe, so
+    reordered or re-inflected wording matches but a query that adds,
+    drops or swaps a word ("not", "why" for "who", "after" for "before")
+    never does. Candidates are found through an inverted index, so a
+    lookup only scores queries that contain every term of the probe.
+    """
+    
+    def __init__(self):
+        self._documents: Dict[str, Counter] = {}
+        self._queries: Dict[str, str] = {}
+        self._postings: Dict[str, Set[str]] = defaultdict(set)
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self._documents)
+    
+    def add(self, key: str, query: str) -> None:
+        """Index a query under its cache key"""
+        terms = Counter(query_tokens(query))
+        with self._lock:
+            self._remove(key)
+            if not terms:
+                return
+            self._documents[key] = terms
+            self._queries[key] = query
+            for term in terms:
+                self._postings[term].add(key)
+    
+    def remove(self, key: str) -> None:
+        """Drop a cache key from the index"""
+        with self._lock:
+            self._remove(key)
+    
+    def _remove(self, key: str) -> None:
+        terms = self._documents.pop(key, None)
+        self._queries.pop(key, None)
+        for term in terms or ():
+            self._postings[term].discard(key)
+            if not self._postings[term]:
+                del self._postings[term]
+    
+    def _idf(self, term: str) -> float:
+        return math.log((len(self._documents) + 1) / (len(self._postings.get(term, ())) + 1)) + 1
+    
+    def _vector(self, terms: Counter) -> Dict[str, float]:
+        vector = {term: count * self._idf(term) for term, count in terms.items()}
+        norm = math.sqrt(sum(weight * weight for weight in vector.values())) or 1.0
+        return {term: weight / norm for term, weight in vector.items()}
+    
+    def find(self, query: str, threshold: float) -> Optional[Tuple[str, str, float]]:
+        """Return (cache key, matched query, cosine similarity) of the best match with the same terms at or above threshold"""
+        terms = Counter(query_tokens(query))
+        if not terms:
+            return None
+        
+        with self._lock:
+            candidates = None
+            for term in terms:
+                postings = self._postings.get(term, set())
+                candidates = set(postings) if candidates is None else candidates & postings
+                if not candidates:
+                    return None
+            
+            probe = self._vector(terms)
+            best: Optional[Tuple[str, str, float]] = None
+            for key in candidates:
+                if self._documents[key].keys() != terms.keys():
+                    continue
+                document = self._vector(self._documents[key])
+                score = sum(weight * document.get(term, 0.0) for term, weight in probe.items())
+                if best is None or score > best[2]:
+                    best = (key, self._queries[key], score)
+        
+        if best and best[2] >= threshold:
+            return best
+        return None
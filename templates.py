@@ -192,6 +192,10 @@ def get_template_queries(template_name: str, topic: str) -> List[str]:
     """Generate research queries using a template"""
     return template_manager.generate_queries(template_name, topic)
 
+def get_template_research_query(topic: str, queries: List[str]) -> str:
+    """Combine a template's queries into one research query, also used as its research cache key"""
+    return f"Research about {topic}: " + " ".join(queries)
+
 def get_template_info(template_name: str) -> Dict:
     """Get information about a specific template"""
     return template_manager.get_template_info(template_name)
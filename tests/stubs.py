@@ -0,0 +1,228 @@
+"""
+Local stand-in servers for tests: a minimal Redis (RESP2) server and an HTTP server with scripted replies
+"""
+import fnmatch
+import socket
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+class RespStubServer:
+    """In-process stand-in for a Redis server, implementing the commands RedisCacheBackend uses
+
+    Every command runs under one lock, as on a real single-threaded server.
+    WATCH/MULTI/EXEC follow Redis semantics: EXEC replies nil if a watched
+    key was written by another client after WATCH.
+    """
+    
+    def __init__(self):
+        self.strings: Dict[bytes, Tuple[bytes, Optional[float]]] = {}
+        self.hashes: Dict[bytes, Dict[bytes, bytes]] = {}
+        self.zsets: Dict[bytes, Dict[bytes, float]] = {}
+        self.versions: Dict[bytes, int] = {}
+        self.commands: List[bytes] = []
+        self.lock = threading.Lock()
+        stub = self
+        
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self) -> None:
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                state = {'watched': {}, 'queued': None}
+                while True:
+                    command = stub._read_command(self.rfile)
+                    if command is None:
+                        return
+                    self.wfile.write(stub._encode(stub._dispatch(command, state)))
+        
+        self.server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"redis://127.0.0.1:{self.server.server_address[1]}/0"
+    
+    def __enter__(self) -> "RespStubServer":
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+    
+    @staticmethod
+    def _read_command(rfile) -> Optional[List[bytes]]:
+        line = rfile.readline()
+        if not line:
+            return None
+        args = []
+        for _ in range(int(line[1:])):
+            length = int(rfile.readline()[1:])
+            args.append(rfile.read(length + 2)[:-2])
+        return args
+    
+    def _encode(self, reply: Any) -> bytes:
+        if reply is None:
+            return b"$-1\r\n"
+        if isinstance(reply, Exception):
+            return b"-ERR " + str(reply).encode() + b"\r\n"
+        if reply in ("OK", "QUEUED"):
+            return b"+%s\r\n" % reply.encode()
+        if isinstance(reply, int):
+            return b":%d\r\n" % reply
+        if isinstance(reply, bytes):
+            return b"$%d\r\n%s\r\n" % (len(reply), reply)
+        if isinstance(reply, str):
+            return self._encode(reply.encode())
+        if isinstance(reply, tuple) and not reply:
+            # Nil array: an EXEC refused because a watched key changed
+            return b"*-1\r\n"
+        return b"*%d\r\n" % len(reply) + b"".join(self._encode(item) for item in reply)
+    
+    def _touch(self, key: bytes) -> None:
+        self.versions[key] = self.versions.get(key, 0) + 1
+    
+    def _string(self, key: bytes) -> Optional[bytes]:
+        value = self.strings.get(key)
+        if value is None:
+            return None
+        if value[1] is not None and value[1] <= time.time():
+            del self.strings[key]
+            self._touch(key)
+            return None
+        return value[0]
+    
+    def _dispatch(self, command: List[bytes], state: Dict[str, Any]) -> Any:
+        name = command[0].upper().decode()
+        with self.lock:
+            self.commands.append(command[0].upper())
+            if name == "MULTI":
+                state['queued'] = []
+                return "OK"
+            if name == "EXEC":
+                queued, state['queued'] = state['queued'], None
+                watched, state['watched'] = state['watched'], {}
+                if any(self.versions.get(key, 0) != version for key, version in watched.items()):
+                    return ()
+                return [self._run(name, args) for name, args in queued]
+            if state['queued'] is not None:
+                state['queued'].append((name, command[1:]))
+                return "QUEUED"
+            if name == "WATCH":
+                state['watched'].update((key, self.versions.get(key, 0)) for key in command[1:])
+                return "OK"
+            if name == "UNWATCH":
+                state['watched'] = {}
+                return "OK"
+            return self._run(name, command[1:])
+    
+    def _run(self, name: str, args: List[bytes]) -> Any:
+        if name in ("PING", "AUTH", "SELECT"):
+            return "OK"
+        if name == "GET":
+            return self._string(args[0])
+        if name == "MGET":
+            return [self._string(key) for key in args]
+        if name == "SET":
+            expires_at = time.time() + int(args[3]) / 1000 if len(args) > 3 and args[2].upper() == b"PX" else None
+            self.strings[args[0]] = (args[1], expires_at)
+            self._touch(args[0])
+            return "OK"
+        if name == "DEL":
+            deleted = 0
+            for key in args:
+                existed = self._string(key) is not None or key in self.hashes or key in self.zsets
+                self.strings.pop(key, None)
+                self.hashes.pop(key, None)
+                self.zsets.pop(key, None)
+                if existed:
+                    deleted += 1
+                    self._touch(key)
+            return deleted
+        if name == "SCAN":
+            pattern = args[args.index(b"MATCH") + 1].decode() if b"MATCH" in args else "*"
+            keys = [key for key in (*self.strings, *self.hashes, *self.zsets) if fnmatch.fnmatchcase(key.decode(), pattern)]
+            return [b"0", keys]
+        
+        if name.startswith("H"):
+            fields = self.hashes.get(args[0], {})
+            if name == "HGET":
+                return fields.get(args[1])
+            if name == "HMGET":
+                return [fields.get(field) for field in args[1:]]
+            if name == "HSCAN":
+                return [b"0", [item for pair in fields.items() for item in pair]]
+            fields = self.hashes.setdefault(args[0], fields)
+            self._touch(args[0])
+            if name == "HSET":
+                fields[args[1]] = args[2]
+                return 1
+            if name == "HDEL":
+                return sum(1 for field in args[1:] if fields.pop(field, None) is not None)
+            if name == "HINCRBY":
+                fields[args[1]] = str(int(fields.get(args[1], b"0")) + int(args[2])).encode()
+                return int(fields[args[1]])
+        
+        if name.startswith("Z"):
+            members = self.zsets.get(args[0], {})
+            if name == "ZCARD":
+                return len(members)
+            if name in ("ZCOUNT", "ZRANGEBYSCORE"):
+                low, high = float(args[1]), float(args[2])
+                found = sorted((score, member) for member, score in members.items() if low <= score <= high)
+                if name == "ZCOUNT":
+                    return len(found)
+                if b"LIMIT" in args:
+                    offset, count = (int(arg) for arg in args[args.index(b"LIMIT") + 1:][:2])
+                    found = found[offset:offset + count]
+                return [member for _, member in found]
+            members = self.zsets.setdefault(args[0], members)
+            self._touch(args[0])
+            if name == "ZADD":
+                members[args[2]] = float(args[1])
+                return 1
+            if name == "ZREM":
+                return sum(1 for member in args[1:] if members.pop(member, None) is not None)
+        return RuntimeError(f"unknown command '{name}'")
+
+class ScriptedHTTPServer:
+    """Local HTTP server answering each GET with the next scripted (status, headers, body, delay) reply
+
+    Once the script runs out the last reply is repeated. Every request is
+    logged with its arrival time, so tests can check retry spacing.
+    """
+    
+    def __init__(self, replies: List[Tuple[int, Dict[str, str], bytes, float]]):
+        self.replies = list(replies)
+        self.requests: List[float] = []
+        stub = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                stub.requests.append(time.monotonic())
+                status, headers, body, delay = stub.replies.pop(0) if len(stub.replies) > 1 else stub.replies[0]
+                if delay:
+                    time.sleep(delay)
+                try:
+                    self.send_response(status)
+                    for name, value in {'Content-Type': "text/plain", **headers}.items():
+                        self.send_header(name, value)
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except ConnectionError:
+                    # The client gave up waiting for a delayed reply
+                    pass
+            
+            def log_message(self, *args) -> None:
+                pass
+        
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/"
+    
+    def __enter__(self) -> "ScriptedHTTPServer":
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        self.server.shutdown()
+        self.server.server_close()
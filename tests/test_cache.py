@@ -0,0 +1,68 @@
+"""
+Tests for the cache manager's keys, memory tier and counters
+"""
+import dataclasses
+import time
+
+import pytest
+
+import cache
+from config import AgentConfig
+from service import job_key
+from templates import get_template_queries, get_template_research_query
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    config = dataclasses.replace(AgentConfig(), cache_directory=str(tmp_path / "cache"))
+    monkeypatch.setattr(cache, "get_config", lambda: config)
+    manager = cache.CacheManager()
+    yield manager
+    manager.backend.close()
+
+def test_urls_that_differ_only_in_case_do_not_share_an_entry(manager):
+    manager.cache_result("https://www.youtube.com/watch?v=dQw4w9WgXcQ", "first video", "fetch_webpage")
+    
+    assert manager.get_cached_result("https://www.youtube.com/watch?v=DQW4W9WGXCQ", "fetch_webpage") is None
+    assert manager.get_cached_result("https://www.youtube.com/watch?v=dQw4w9WgXcQ", "fetch_webpage") == "first video"
+
+def test_text_queries_are_case_insensitive(manager):
+    manager.cache_result("Solar Panel Efficiency", "result text", "web_search")
+    
+    assert manager.get_cached_result("solar panel efficiency ", "web_search") == "result text"
+    assert manager.get_cache_stats()['memory_hits'] == 1
+
+def test_queries_that_differ_only_in_whitespace_share_an_entry(manager):
+    manager.cache_result("solar   panel\tefficiency", "result text", "research")
+    
+    assert manager.get_cached_result(" Solar panel efficiency", "research") == "result text"
+
+def test_service_coalesces_jobs_that_share_a_research_cache_entry(manager):
+    assert job_key({'query': "Solar  panel efficiency "}) == job_key({'query': "solar panel\nefficiency"})
+    
+    # batch.run_job caches template research under the combined query, with the topic stripped
+    questions = get_template_queries("academic", "quantum  computing")
+    manager.cache_result(get_template_research_query("quantum  computing", questions), "result text", "research")
+    
+    key = job_key({'template': "academic", 'topic': " quantum  computing "})
+    assert manager.get_cached_result(key, "research") == "result text"
+
+def test_memory_tier_evicts_least_recently_used_entries():
+    memory = cache.MemoryCache(max_entries=2, max_bytes=100)
+    expires_at = time.time() + 60
+    memory.put("a", "first", 10, expires_at)
+    memory.put("b", "second", 10, expires_at)
+    memory.get("a")
+    memory.put("c", "third", 10, expires_at)
+    
+    assert (memory.get("a"), memory.get("b"), memory.get("c")) == ("first", None, "third")
+    
+    memory.put("d", "large", 95, expires_at)
+    assert len(memory) == 1
+    assert memory.total_bytes == 95
+
+def test_memory_tier_drops_expired_entries():
+    memory = cache.MemoryCache(max_entries=10, max_bytes=100)
+    memory.put("a", "gone", 10, time.time() - 1)
+    
+    assert memory.get("a") is None
+    assert memory.total_bytes == 0
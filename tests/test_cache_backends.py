@@ -0,0 +1,174 @@
+"""
+Tests for the local cache backends, the SQLite schema upgrade, and the Redis backend against a local RESP stand-in
+"""
+import json
+import socket
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from cache_backends import (
+    FallbackCacheBackend, JsonFileCacheBackend, RedisCacheBackend, RespConnectionPool, SQLiteCacheBackend,
+    decode_payload, encode_payload
+)
+from stubs import RespStubServer
+
+def make_entry(query: str, result, ttl: float = 3600) -> dict:
+    now = time.time()
+    return {'query': query, 'tool_name': "web_search", 'result': result,
+            'timestamp': now, 'ttl_seconds': ttl, 'expires_at': now + ttl}
+
+@pytest.fixture(params=["sqlite", "json"])
+def local_backend(request, tmp_path):
+    if request.param == "sqlite":
+        backend = SQLiteCacheBackend(tmp_path / "cache.sqlite3", compression="none")
+    else:
+        backend = JsonFileCacheBackend(tmp_path / "cache")
+    yield backend
+    backend.close()
+
+def test_local_backend_round_trip_and_expiry(local_backend):
+    local_backend.put("new", make_entry("solar panels", {'summary': "kept"}))
+    local_backend.put("old", make_entry("wind turbines", "expired", ttl=-10))
+    
+    assert local_backend.get("new")['result'] == {'summary': "kept"}
+    assert local_backend.get("missing") is None
+    assert local_backend.count_entries()[0] == 2
+    assert sorted(local_backend.iter_queries("web_search", time.time())) == [("new", "solar panels")]
+    
+    assert local_backend.count_expired(time.time()) == 1
+    assert local_backend.delete_expired(time.time()) == 1
+    assert local_backend.get("old") is None
+    assert local_backend.clear() == 1
+    assert local_backend.count_entries()[0] == 0
+
+def test_sqlite_upgrades_databases_without_expiry_columns(tmp_path):
+    db_path = tmp_path / "cache.sqlite3"
+    conn = sqlite3.connect(str(db_path))
+    conn.execute(
+        """CREATE TABLE cache_entries (key TEXT PRIMARY KEY, tool_name TEXT NOT NULL, query TEXT NOT NULL,
+        result TEXT NOT NULL, timestamp REAL NOT NULL, size INTEGER NOT NULL)"""
+    )
+    result = json.dumps({'summary': "from an older version"})
+    conn.execute("INSERT INTO cache_entries VALUES ('a', 'research', 'q', ?, 1000.0, ?)", (result, len(result)))
+    conn.commit()
+    conn.close()
+    
+    backend = SQLiteCacheBackend(db_path, default_ttl_seconds=3600)
+    entry = backend.get("a")
+    
+    assert entry['result'] == {'summary': "from an older version"}
+    assert (entry['expires_at'], entry['ttl_seconds']) == (4600.0, 3600.0)
+    assert backend.count_entries() == (1, len(result), len(result))
+    backend.close()
+
+@pytest.fixture
+def redis_stub():
+    with RespStubServer() as server:
+        yield server
+
+@pytest.fixture
+def backend(redis_stub):
+    backend = RedisCacheBackend(RespConnectionPool(redis_stub.url, max_connections=4), namespace="test")
+    yield backend
+    backend.close()
+
+def test_put_get_and_delete(backend):
+    backend.put("a", make_entry("solar panels", "result text"))
+    
+    entry = backend.get("a")
+    assert entry['query'] == "solar panels"
+    assert entry['result'] == "result text"
+    assert backend.get("missing") is None
+    assert backend.count_entries()[0] == 1
+    
+    assert backend.delete("a") is True
+    assert backend.delete("a") is False
+    assert backend.count_entries() == (0, 0, 0)
+
+def test_get_many_is_one_mget(backend, redis_stub):
+    for key in ("a", "b", "c"):
+        backend.put(key, make_entry(key, f"result {key}"))
+    redis_stub.commands.clear()
+    
+    entries = backend.get_many(["a", "missing", "c"])
+    
+    assert sorted(entries) == ["a", "c"]
+    assert entries['c']['result'] == "result c"
+    assert redis_stub.commands == [b"MGET"]
+
+def test_stats_track_replaced_sizes(backend, redis_stub):
+    backend.put("a", make_entry("q", "x" * 10))
+    backend.put("a", make_entry("q", "y" * 5000))
+    
+    count, stored, _ = backend.count_entries()
+    payload, _ = redis_stub.strings[b"test:entry:a"]
+    assert count == 1
+    assert stored == len(payload)
+    assert decode_payload(payload)['result'] == "y" * 5000
+
+def test_concurrent_writers_do_not_drift_stats(backend, redis_stub):
+    def write(worker: int) -> None:
+        for round_number in range(20):
+            backend.put("shared", make_entry("q", "z" * (worker * 100 + round_number)))
+    
+    threads = [threading.Thread(target=write, args=(worker,)) for worker in range(1, 5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    payload, _ = redis_stub.strings[b"test:entry:shared"]
+    count, stored, raw = backend.count_entries()
+    assert (count, stored) == (1, len(payload))
+    assert raw == encode_payload(decode_payload(payload))[1]
+
+def test_server_expired_values_leave_no_index_records(backend, redis_stub):
+    backend.put("kept", make_entry("kept", "still here"))
+    backend.put("gone", make_entry("gone", "expired", ttl=-10))
+    time.sleep(0.01)
+    
+    assert backend.get("gone") is None
+    count, stored, _ = backend.count_entries()
+    assert count == 1
+    assert stored == len(redis_stub.strings[b"test:entry:kept"][0])
+    assert b"gone" not in redis_stub.hashes[b"test:meta"]
+
+def test_delete_expired_counts_deleted_values(backend):
+    backend.put("old", make_entry("old", "x", ttl=1))
+    backend.put("new", make_entry("new", "y"))
+    
+    assert backend.count_expired(time.time() + 10) == 1
+    assert backend.delete_expired(time.time() + 10) == 1
+    assert backend.get("new") is not None
+
+def test_failed_connection_is_not_returned_to_the_pool(redis_stub):
+    pool = RespConnectionPool(redis_stub.url, max_connections=1)
+    with pytest.raises(ValueError):
+        with pool.connection():
+            raise ValueError("bad reply")
+    assert pool._idle.empty()
+    
+    with pool.connection() as connection:
+        assert connection.execute("PING") == "OK"
+    assert pool._idle.qsize() == 1
+    pool.close()
+
+def test_falls_back_to_local_store_when_redis_is_unreachable(tmp_path):
+    # Reserve a port and release it so nothing is listening there
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    
+    shared = RedisCacheBackend(RespConnectionPool(f"redis://127.0.0.1:{port}", timeout=0.5))
+    local = SQLiteCacheBackend(tmp_path / "cache.sqlite3")
+    backend = FallbackCacheBackend(shared, local, retry_seconds=30)
+    
+    backend.put("a", make_entry("q", "local result"))
+    
+    assert backend.get("a")['result'] == "local result"
+    assert local.get("a")['result'] == "local result"
+    assert backend.count_entries()[0] == 1
+    backend.close()
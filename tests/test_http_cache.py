@@ -0,0 +1,65 @@
+"""
+Tests for revalidation and storage rules of the HTTP page cache
+"""
+import pytest
+
+from http_cache import HttpCache
+
+@pytest.fixture
+def http_cache(tmp_path):
+    cache = HttpCache(tmp_path / "http_cache.sqlite3")
+    yield cache
+    cache.close()
+
+class FakeOrigin:
+    """Serves scripted responses and records the conditional headers of each request"""
+    
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+        self.extracted = 0
+    
+    def request(self, headers):
+        self.requests.append(dict(headers))
+        status, response_headers, body = self.responses.pop(0)
+        return {'status': status, 'headers': response_headers, 'body': body,
+                'media_type': "text/html", 'charset': "utf-8", 'truncated': False}
+    
+    def extract(self, response):
+        self.extracted += 1
+        return response['body'].decode()
+
+VALIDATORS = {'ETag': '"v1"', 'Last-Modified': "Mon, 05 Oct 2026 10:00:00 GMT"}
+
+def test_stale_page_is_revalidated_and_304_reuses_the_extract(http_cache):
+    origin = FakeOrigin(
+        (200, {'Cache-Control': "no-cache", **VALIDATORS}, b"page text"),
+        (304, {'Cache-Control': "max-age=60"}, b""),
+    )
+    url = "https://example.com/page"
+    
+    assert http_cache.fetch_text(url, origin.request, origin.extract, "v") == "page text"
+    assert http_cache.fetch_text(url, origin.request, origin.extract, "v") == "page text"
+    
+    assert origin.requests == [{}, {'If-None-Match': '"v1"', 'If-Modified-Since': VALIDATORS['Last-Modified']}]
+    assert origin.extracted == 1
+    assert http_cache.get_stats()['revalidated'] == 1
+    
+    # The 304 made the page fresh for a minute, so the next use does not touch the network
+    assert http_cache.fetch_text(url, origin.request, origin.extract, "v") == "page text"
+    assert len(origin.requests) == 2
+    assert http_cache.get_stats()['fresh_hits'] == 1
+
+def test_no_store_responses_are_not_kept(http_cache):
+    origin = FakeOrigin(
+        (200, {'Cache-Control': "private, no-store", **VALIDATORS}, b"first"),
+        (200, {'Cache-Control': "private, no-store", **VALIDATORS}, b"second"),
+    )
+    url = "https://example.com/account"
+    
+    assert http_cache.fetch_text(url, origin.request, origin.extract, "v") == "first"
+    assert http_cache.fetch_text(url, origin.request, origin.extract, "v") == "second"
+    
+    assert origin.requests == [{}, {}]
+    assert http_cache.lookup(url, "v") is None
+    assert http_cache.get_stats()['urls'] == 0
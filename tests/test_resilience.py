@@ -0,0 +1,154 @@
+"""
+Tests for rate limiting, retries and circuit breaking against local stand-in HTTP servers
+"""
+import dataclasses
+import threading
+import time
+from collections import OrderedDict
+
+import pytest
+import requests
+
+import http_client
+import resilience
+from config import AgentConfig
+from resilience import CircuitBreaker, CircuitOpenError, ProviderGuard
+from stubs import ScriptedHTTPServer
+
+def make_guard(max_retries: int = 3, failure_threshold: int = 5, reset_seconds: float = 60) -> ProviderGuard:
+    return ProviderGuard("stub", rate=0, burst=1, max_retries=max_retries, backoff_seconds=0.01,
+                         backoff_max_seconds=5, failure_threshold=failure_threshold, reset_seconds=reset_seconds)
+
+def fetch(url: str, timeout: float = 2.0) -> bytes:
+    return http_client.fetch_response(url, 10000, timeout=timeout)['body']
+
+def test_transient_errors_are_retried_with_backoff():
+    replies = [(503, {}, b"busy", 0), (502, {}, b"bad gateway", 0), (200, {}, b"ok", 0)]
+    with ScriptedHTTPServer(replies) as server:
+        guard = make_guard()
+        assert guard.call(fetch, server.url) == b"ok"
+    
+    assert len(server.requests) == 3
+    assert guard.get_stats() == {'calls': 3, 'retries': 2, 'failures': 0, 'rejected': 0, 'state': "closed"}
+
+def test_retry_after_is_honoured():
+    replies = [(429, {'Retry-After': "0.3"}, b"slow down", 0), (200, {}, b"ok", 0)]
+    with ScriptedHTTPServer(replies) as server:
+        assert make_guard().call(fetch, server.url) == b"ok"
+    
+    first, second = server.requests
+    assert second - first >= 0.3
+
+def test_client_errors_are_not_retried():
+    with ScriptedHTTPServer([(404, {}, b"missing", 0)]) as server:
+        guard = make_guard()
+        with pytest.raises(requests.HTTPError):
+            guard.call(fetch, server.url)
+    
+    assert len(server.requests) == 1
+    assert guard.breaker.state == "closed"
+
+def test_circuit_opens_probes_and_closes():
+    replies = [(200, {}, b"late", 1.0), (500, {}, b"down", 0), (200, {}, b"back", 0)]
+    with ScriptedHTTPServer(replies) as server:
+        guard = make_guard(max_retries=0, failure_threshold=1, reset_seconds=0.2)
+        
+        # A slow upstream times out and opens the circuit
+        with pytest.raises(requests.RequestException):
+            guard.call(fetch, server.url, timeout=0.2)
+        assert guard.breaker.state == "open"
+        with pytest.raises(CircuitOpenError):
+            guard.call(fetch, server.url)
+        assert len(server.requests) == 1
+        
+        # The first probe fails, so the circuit reopens
+        time.sleep(0.25)
+        with pytest.raises(requests.HTTPError):
+            guard.call(fetch, server.url)
+        assert guard.breaker.state == "open"
+        with pytest.raises(CircuitOpenError):
+            guard.call(fetch, server.url)
+        
+        # The next probe succeeds and closes it
+        time.sleep(0.25)
+        assert guard.call(fetch, server.url) == b"back"
+        assert guard.breaker.state == "closed"
+        assert guard.call(fetch, server.url) == b"back"
+    
+    assert len(server.requests) == 4
+    assert guard.get_stats()['rejected'] == 2
+
+def test_stale_half_open_probe_reopens_the_circuit():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0.05, probe_timeout_seconds=0.1)
+    breaker.record_failure()
+    time.sleep(0.06)
+    breaker.before_call("stub")
+    assert breaker.state == "half_open"
+    
+    # The probe never records a result; other callers are refused until it times out
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call("stub")
+    time.sleep(0.11)
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call("stub")
+    assert breaker.state == "open"
+    
+    time.sleep(0.06)
+    breaker.before_call("stub")
+    assert breaker.state == "half_open"
+
+def test_counters_are_exact_under_concurrency():
+    guard = make_guard()
+    
+    def work() -> None:
+        for _ in range(500):
+            guard.call(lambda: "ok")
+    
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert guard.get_stats()['calls'] == 4000
+
+@pytest.fixture
+def fresh_guards(monkeypatch):
+    config = dataclasses.replace(
+        AgentConfig(), provider_burst=2,
+        provider_rate_limits={"duckduckgo": 20.0, "web": 20.0}, provider_concurrency={"duckduckgo": 2, "web": 4}
+    )
+    monkeypatch.setattr(resilience, "get_config", lambda: config)
+    monkeypatch.setattr(resilience, "_guards", OrderedDict())
+    monkeypatch.setattr(resilience, "_limits", {})
+
+def test_providers_with_shared_limits_draw_from_one_bucket(fresh_guards):
+    api = resilience.get_guard("duckduckgo:api", policy="duckduckgo", shared_limits="duckduckgo")
+    html = resilience.get_guard("duckduckgo:html", policy="duckduckgo", shared_limits="duckduckgo")
+    
+    assert api.bucket is html.bucket
+    assert api.slots is html.slots
+    assert api.breaker is not html.breaker
+    
+    # Calls through either backend spend the same burst
+    html.bucket.acquire()
+    html.bucket.acquire()
+    assert api.bucket.acquire() > 0
+
+def test_web_hosts_keep_their_own_limits(fresh_guards):
+    first = resilience.get_guard("web:a.example", policy="web")
+    second = resilience.get_guard("web:b.example", policy="web")
+    
+    assert first.bucket is not second.bucket
+
+def test_idle_web_host_guards_are_evicted(fresh_guards, monkeypatch):
+    monkeypatch.setattr(resilience, "MAX_PROVIDER_GUARDS", 3)
+    failing = resilience.get_guard("web:down.example", policy="web")
+    failing.breaker.state = "open"
+    failing.breaker._opened_at = time.monotonic()
+    
+    for index in range(10):
+        resilience.get_guard(f"web:host{index}.example", policy="web")
+    
+    assert list(resilience.get_provider_stats()) == ["web:down.example", "web:host8.example", "web:host9.example"]
+    assert resilience.get_guard("web:down.example", policy="web") is failing
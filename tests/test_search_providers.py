@@ -0,0 +1,74 @@
+"""
+Tests for hedged search across local stub providers
+"""
+import time
+
+import pytest
+
+pytest.importorskip("langchain_community")
+
+import search_providers
+from config import get_config
+from search_providers import StaticSearchProvider, get_latency_stats, register_provider
+
+@pytest.fixture
+def providers(monkeypatch):
+    """Register stub providers and make them the configured ones, returning a setup function"""
+    config = get_config()
+    monkeypatch.setattr(config, "enable_hedged_search", True)
+    monkeypatch.setattr(config, "hedge_min_samples", 1000)
+    monkeypatch.setattr(config, "hedge_max_delay_seconds", 0.1)
+    
+    def setup(*stubs: StaticSearchProvider):
+        for stub in stubs:
+            register_provider(stub)
+        monkeypatch.setattr(config, "search_providers", [stub.name for stub in stubs])
+        return stubs
+    return setup
+
+def test_slow_provider_is_hedged_by_a_fast_one(providers):
+    slow, fast = providers(StaticSearchProvider("slow_a", "slow results", latency_seconds=1.0),
+                           StaticSearchProvider("fast_a", "fast results"))
+    
+    start = time.perf_counter()
+    name, results = search_providers.search("solar panels", 5)
+    
+    assert (name, results) == ("fast_a", "fast results")
+    assert time.perf_counter() - start < 0.5
+    assert slow.calls == fast.calls == 1
+
+def test_fast_provider_is_not_hedged(providers):
+    first, second = providers(StaticSearchProvider("fast_b", "first results"),
+                              StaticSearchProvider("spare_b", "second results"))
+    
+    assert search_providers.search("solar panels", 5) == ("fast_b", "first results")
+    assert second.calls == 0
+
+def test_failing_provider_is_hedged_without_waiting(providers, monkeypatch):
+    monkeypatch.setattr(get_config(), "hedge_max_delay_seconds", 5)
+    failing, working = providers(StaticSearchProvider("failing_c", error=RuntimeError("rate limited")),
+                                 StaticSearchProvider("working_c", "results"))
+    
+    start = time.perf_counter()
+    assert search_providers.search("solar panels", 5) == ("working_c", "results")
+    assert time.perf_counter() - start < 1
+    assert failing.calls == 1
+
+def test_all_providers_failing_reports_every_error(providers):
+    providers(StaticSearchProvider("failing_d", error=RuntimeError("down")),
+              StaticSearchProvider("failing_e", error=RuntimeError("also down")))
+    
+    with pytest.raises(RuntimeError, match="failing_d: down; failing_e: also down"):
+        search_providers.search("solar panels", 5)
+
+def test_latency_is_recorded_per_provider(providers):
+    slow, fast = providers(StaticSearchProvider("slow_f", "slow results", latency_seconds=0.3),
+                           StaticSearchProvider("fast_f", "fast results"))
+    search_providers.search("solar panels", 5)
+    time.sleep(0.3)
+    
+    stats = get_latency_stats()
+    assert stats['fast_f']['count'] == 1
+    assert stats['fast_f']['p95'] < 0.1
+    assert stats['slow_f']['count'] == 1
+    assert stats['slow_f']['p50'] >= 0.3
@@ -0,0 +1,45 @@
+"""
+Regression tests for near-duplicate query matching
+"""
+import pytest
+
+from similarity import QuerySimilarityIndex
+
+THRESHOLD = 0.85
+
+def best_match(cached: str, probe: str):
+    index = QuerySimilarityIndex()
+    index.add("cached", cached)
+    # Unrelated queries so the IDF weights are not degenerate
+    index.add("other-1", "history of the printing press")
+    index.add("other-2", "how do vaccines train the immune system")
+    return index.find(probe, THRESHOLD)
+
+@pytest.mark.parametrize("cached, probe", [
+    ("Why is nuclear power safe", "Why is nuclear power not safe"),
+    ("when was the transistor invented", "where was the transistor invented"),
+    ("Who founded Tesla", "Why was Tesla founded"),
+    ("effects of inflation before 2008", "effects of inflation after 2008"),
+    ("companies above the poverty line", "companies under the poverty line"),
+    ("How does solar power work", "Does solar power work"),
+    ("no evidence of life on Mars", "evidence of life on Mars"),
+])
+def test_queries_that_ask_something_else_do_not_match(cached, probe):
+    assert best_match(cached, probe) is None
+
+@pytest.mark.parametrize("cached, probe", [
+    ("How does quantum computing work", "how quantum computing does work"),
+    ("applications of large language models", "the application of a large language model"),
+    ("What are the risks of AI", "what were risks of AI"),
+])
+def test_rewordings_with_the_same_terms_match(cached, probe):
+    match = best_match(cached, probe)
+    assert match is not None
+    assert match[0] == "cached"
+    assert match[2] >= THRESHOLD
+
+def test_removed_query_is_not_matched():
+    index = QuerySimilarityIndex()
+    index.add("cached", "history of jazz")
+    index.remove("cached")
+    assert index.find("jazz history", THRESHOLD) is None
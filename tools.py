@@ -1,57 +1,387 @@
 from langchain_community.tools import WikipediaQueryRun
 from langchain_community.utilities import WikipediaAPIWrapper
-from langchain_community.tools import DuckDuckGoSearchRun
-from langchain_community.utilities import DuckDuckGoSearchAPIWrapper
-from langchain.tools import Tool
+from langchain.tools import Tool, BaseTool
 from langchain_community.tools import ArxivQueryRun
 from langchain_community.utilities import ArxivAPIWrapper
-import requests
 from bs4 import BeautifulSoup
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Any, Dict, Iterable, Iterator, List, Tuple
+from urllib.parse import urlsplit, urlunsplit
+import asyncio
+import json
+import re
 import time
+from cache import get_cached_results, get_or_compute
+from config import get_config
+from dedup import canonical_url
+from evidence import observation_label
+from local_corpus import get_corpus_index
+from passages import select_passages
+from resilience import CircuitOpenError, call_provider
+from session import get_session, get_session_query
+import http_cache
+import http_client
+import search_providers
 
-def get_web_content(url: str) -> str:
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+try:
+    import lxml.html
+except ImportError:
+    lxml = None
+
+ERROR_PREFIXES = ("Error ", "Arxiv exception")
+HTML_TYPES = ("text/html", "application/xhtml+xml")
+TEXT_TYPES = ("text/plain",)
+SKIPPED_TAGS = ("script", "style", "noscript", "template")
+BLOCK_TAGS = frozenset("""
+address article aside blockquote body dd div dl dt figcaption figure footer form h1 h2 h3 h4 h5 h6
+header html li main nav ol p pre section table td th title tr ul
+""".split())
+META_CHARSET = re.compile(rb"""<meta[^>]+charset=["']?([\w.:-]+)""", re.IGNORECASE)
+URL_PATTERN = re.compile(r"https?://[^\s,\"'<>\]]+")
+# Header lines of Wikipedia and arXiv results, kept whenever their content is ranked
+RESULT_HEADERS = re.compile(r"(Page|Title|Published|Authors):")
+
+def normalize_tool_input(tool_input: str) -> str:
     """
-    Fetch and extract text content from a web page.
+    Normalize a tool input so equivalent calls share a cache entry.
     """
-    try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Remove script and style elements
-        for script in soup(["script", "style"]):
-            script.decompose()
-        
-        # Get text content
-        text = soup.get_text()
+    text = " ".join(str(tool_input).split())
+    if text.lower().startswith(("http://", "https://")):
+        # Fragments never reach the server, so they should not split cache entries
+        parts = urlsplit(text)
+        return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or "/", parts.query, ""))
+    return text.lower()
+
+def is_cacheable_result(result) -> bool:
+    """Failures are transient, so only successful observations are cached"""
+    return isinstance(result, str) and not result.startswith(ERROR_PREFIXES)
+
+def focus_observation(text: str, tool_input: str, budget: int, pinned: Optional[re.Pattern] = None) -> str:
+    """
+    Cut a tool observation down to budget characters, keeping the passages most relevant to the research.
+
+    Passages are ranked with BM25 against the current research query plus
+    the tool input (unless it is a URL). Errors are passed through as is.
+    """
+    config = get_config()
+    if not is_cacheable_result(text) or not config.enable_passage_ranking:
+        return text
+    
+    query = get_session_query() or ""
+    if not is_url(tool_input):
+        query = f"{query} {tool_input}"
+    return select_passages(text, query, budget, config.passage_words, pinned)
+
+def is_url(tool_input: str) -> bool:
+    """Whether a tool input is an http(s) URL"""
+    return str(tool_input).strip().lower().startswith(("http://", "https://"))
+
+def already_retrieved(url: str) -> Optional[str]:
+    """Return a short note if the current research session has already shown this URL to the agent"""
+    session = get_session()
+    if session is None or not get_config().enable_observation_dedup:
+        return None
+    previous = session.ledger.previous_url(url)
+    return f"[Already retrieved in {previous} earlier in this research session]" if previous else None
+
+def deduplicate_observation(text: str, tool_name: str, tool_input: str) -> str:
+    """
+    Replace content the agent has already seen in this research session with short references.
+
+    Near-duplicate passages (by word-shingle overlap) from any earlier
+    tool call, such as syndicated stories or pages quoted by Wikipedia,
+    are cut so repeated text does not grow the agent's scratchpad.
+    """
+    config = get_config()
+    session = get_session()
+    if session is None or not config.enable_observation_dedup or not is_cacheable_result(text):
+        return text
+    
+    label = observation_label(tool_name, tool_input)
+    if is_url(tool_input):
+        session.ledger.record_url(tool_input, label)
+    return session.ledger.filter(text, label, config.dedup_min_words)
+
+def pooled_result(tool_name: str, tool_input: str, compute, evidence=None, known: Optional[str] = None) -> str:
+    """
+    Get a tool observation from the session's evidence pool, or compute it through the result cache.
+
+    The pool is shared by every agent run of the research (such as the
+    sub-questions of a template), so a call made by any of them is reused
+    even when result caching is off. Pass evidence explicitly from threads
+    that do not see the session, and known when the cached result has
+    already been looked up (for example in a batch).
+    """
+    key = normalize_tool_input(tool_input)
+    
+    def cached() -> str:
+        if known is not None:
+            return known
+        return get_or_compute(key, compute, tool_name, should_cache=is_cacheable_result)
+    
+    if evidence is None:
+        session = get_session()
+        evidence = session.evidence if session is not None and get_config().enable_evidence_pool else None
+    if evidence is None:
+        return cached()
+    return evidence.get_or_compute(tool_name, key, observation_label(tool_name, tool_input), cached, is_cacheable_result)
+
+def with_result_cache(tool: BaseTool, provider: Optional[str] = None, budget: Optional[int] = None,
+                      pinned: Optional[re.Pattern] = None) -> Tool:
+    """
+    Wrap a tool so repeated calls with the same normalized input are served from the cache.
+
+    When provider is given, calls that miss the cache also go through that
+    provider's rate limit, retries and circuit breaker. When budget is
+    given, the full observation is cached and each call returns the
+    passages most relevant to its own research session.
+    """
+    def run(tool_input: str) -> str:
+        if provider is None:
+            return tool.run(tool_input)
+        try:
+            return call_provider(provider, tool.run, tool_input, is_failure=lambda result: not is_cacheable_result(result))
+        except CircuitOpenError as e:
+            return f"Error running {tool.name}: {e}"
+    
+    def cached_run(tool_input: str) -> str:
+        seen = already_retrieved(tool_input) if is_url(tool_input) else None
+        if seen:
+            return seen
         
-        # Clean up text
-        lines = (line.strip() for line in text.splitlines())
-        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-        text = ' '.join(chunk for chunk in chunks if chunk)
+        result = pooled_result(tool.name, tool_input, lambda: run(tool_input))
+        if budget:
+            result = focus_observation(result, tool_input, budget, pinned)
+        return deduplicate_observation(result, tool.name, tool_input)
+    
+    async def acached_run(tool_input: str) -> str:
+        # Cache locks and the tool clients block, so the whole lookup runs off the event loop
+        return await asyncio.to_thread(cached_run, tool_input)
+    
+    return Tool(name=tool.name, description=tool.description, func=cached_run, coroutine=acached_run)
+
+def clean_text(text: str) -> str:
+    """
+    Collapse the whitespace left over from markup into single spaces.
+    """
+    lines = (line.strip() for line in text.splitlines())
+    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+    return ' '.join(chunk for chunk in chunks if chunk)
+
+def collect_text(strings: Iterable[str], max_chars: int) -> str:
+    """
+    Join text nodes until the cleaned text exceeds max_chars, then stop reading.
+
+    The cleaned length is only re-measured each time the raw text doubles,
+    so collection stays linear in the text actually consumed.
+    """
+    pieces = []
+    raw_length = 0
+    next_check = max_chars
+    for string in strings:
+        pieces.append(string)
+        raw_length += len(string)
+        if raw_length > next_check:
+            if len(clean_text("".join(pieces))) > max_chars:
+                break
+            next_check = raw_length * 2
+    return clean_text("".join(pieces))
+
+def _decode_html(body: bytes, charset: Optional[str]) -> str:
+    """Decode an HTML body using the header charset, then any <meta> charset, then UTF-8"""
+    if charset is None:
+        match = META_CHARSET.search(body[:2048])
+        charset = match.group(1).decode('ascii') if match else None
+    try:
+        return body.decode(charset or 'utf-8', errors='replace')
+    except LookupError:
+        return body.decode('utf-8', errors='replace')
+
+def _nearest_block(node, get_parent, get_tag):
+    """Walk up from node to the closest block-level element (or None)"""
+    while node is not None and get_tag(node) not in BLOCK_TAGS:
+        node = get_parent(node)
+    return node
+
+def _with_block_breaks(strings: Iterable[Tuple[str, Any]]) -> Iterator[str]:
+    """Yield text nodes, inserting a line break whenever the enclosing block element changes"""
+    previous = None
+    for text, block in strings:
+        if block is not previous:
+            yield "\n"
+            previous = block
+        yield text
+
+def _lexbor_strings(body: bytes, charset: Optional[str]) -> Iterator[Tuple[str, Any]]:
+    tree = LexborHTMLParser(_decode_html(body, charset))
+    tree.strip_tags(list(SKIPPED_TAGS))
+    blocks: Dict[int, Any] = {}
+    for node in tree.root.traverse(include_text=True):
+        if node.tag == "-text":
+            block = _nearest_block(node.parent, lambda n: n.parent, lambda n: n.tag)
+            # selectolax creates a new wrapper per access, so blocks are keyed by memory id
+            key = block.mem_id if block is not None else None
+            yield node.text(deep=False), blocks.setdefault(key, block)
+
+def _lxml_strings(root) -> Iterator[Tuple[str, Any]]:
+    # Drop skipped elements with everything inside them (but keep their tail text), as the other backends do
+    for element in list(root.iter(*SKIPPED_TAGS)):
+        element.drop_tree()
+    
+    get_parent = lambda element: element.getparent()
+    get_tag = lambda element: element.tag
+    for element in root.iter():
+        # Comments and processing instructions have a non-string tag
+        if isinstance(element.tag, str) and element.text:
+            yield element.text, _nearest_block(element, get_parent, get_tag)
+        if element.tail:
+            yield element.tail, _nearest_block(element.getparent(), get_parent, get_tag)
+
+def _soup_strings(soup) -> Iterator[Tuple[str, Any]]:
+    for string in soup.strings:
+        yield string, _nearest_block(string.parent, lambda tag: tag.parent, lambda tag: tag.name)
+
+def _iter_html_strings(body: bytes, charset: Optional[str]) -> Iterator[str]:
+    """
+    Yield the text nodes of an HTML document in order, skipping scripts and styles.
+
+    Uses selectolax (lexbor) or lxml when installed and falls back to
+    BeautifulSoup's pure-Python parser otherwise. Nodes are produced lazily
+    so callers can stop as soon as they have enough text, and a line break
+    separates text from different block elements (paragraphs, list items)
+    so sentences and passages can be told apart.
+    """
+    if LexborHTMLParser is not None:
+        yield from _with_block_breaks(_lexbor_strings(body, charset))
+        return
+    
+    if lxml is not None:
+        parser = lxml.html.HTMLParser(encoding=charset) if charset else None
+        try:
+            root = lxml.html.document_fromstring(body, parser=parser)
+        except (ValueError, LookupError, lxml.etree.ParserError):
+            root = None
+        if root is not None:
+            yield from _with_block_breaks(_lxml_strings(root))
+            return
+    
+    soup = BeautifulSoup(body, 'html.parser', from_encoding=charset)
+    for element in soup(list(SKIPPED_TAGS)):
+        element.decompose()
+    yield from _with_block_breaks(_soup_strings(soup))
+
+def fetch_web_text(url: str) -> str:
+    """
+    Fetch a web page and extract its leading text, up to passage_scan_chars when passages are ranked.
+    """
+    config = get_config()
+    max_chars = config.passage_scan_chars if config.enable_passage_ranking else config.web_content_max_chars
+    
+    def request(headers: Dict[str, str]) -> Dict[str, Any]:
+        return call_provider(
+            f"web:{urlsplit(url).netloc.lower()}", http_client.fetch_response,
+            url, config.web_content_max_bytes, allowed_types=HTML_TYPES + TEXT_TYPES, headers=headers, policy="web"
+        )
+    
+    def extract(response: Dict[str, Any]) -> str:
+        if response['media_type'] in TEXT_TYPES:
+            text = clean_text(response['body'].decode(response['charset'] or 'utf-8', errors='replace'))
+        else:
+            text = collect_text(_iter_html_strings(response['body'], response['charset']), max_chars)
         
         # Limit text length
-        return text[:3000] + "..." if len(text) > 3000 else text
+        return text[:max_chars] + "..." if len(text) > max_chars else text
+    
+    try:
+        # Unchanged pages are revalidated with a conditional request and not downloaded or parsed again
+        return http_cache.fetch_text(url, request, extract, variant=f"text:{max_chars}")
         
     except Exception as e:
         return f"Error fetching content from {url}: {str(e)}"
 
+def parse_url_list(tool_input: str) -> List[str]:
+    """
+    Read URLs from a JSON list or from text separated by commas, spaces or newlines, dropping duplicate pages.
+    """
+    try:
+        parsed = json.loads(tool_input)
+    except (TypeError, ValueError):
+        parsed = None
+    candidates = [str(item) for item in parsed] if isinstance(parsed, list) else URL_PATTERN.findall(str(tool_input))
+    
+    urls = []
+    seen = set()
+    for url in candidates:
+        url = url.strip()
+        key = canonical_url(url)
+        if url and key not in seen:
+            seen.add(key)
+            urls.append(url)
+    return urls
+
+def get_web_contents(tool_input: str) -> str:
+    """
+    Fetch several web pages concurrently and return a text extract for each.
+
+    Each page goes through pooled_result under the get_web_content tool's
+    cache entries and fetch_web_text's HTTP cache, so pages fetched earlier
+    (singly or in a batch) are not downloaded again, and pages already
+    shown in this research session are only referenced.
+    """
+    config = get_config()
+    urls = parse_url_list(tool_input)
+    if not urls:
+        return "Error fetching web contents: no http(s) URLs found in the input"
+    
+    skipped = urls[config.web_batch_max_urls:]
+    urls = urls[:config.web_batch_max_urls]
+    
+    # Session checks happen here because worker threads do not see the session
+    session = get_session()
+    evidence = session.evidence if session is not None and config.enable_evidence_pool else None
+    
+    def fetch(url: str):
+        start = time.perf_counter()
+        text = pooled_result("get_web_content", url, lambda: fetch_web_text(url), evidence, known.get(keys[url]))
+        return text, time.perf_counter() - start
+    
+    started = time.perf_counter()
+    fetched = {url: (already_retrieved(url), 0.0) for url in urls}
+    pending = [url for url in urls if fetched[url][0] is None]
+    if pending:
+        # One cache round trip for the whole batch (MGET on a shared backend) instead of one per URL
+        keys = {url: normalize_tool_input(url) for url in pending}
+        known = get_cached_results(list(dict.fromkeys(keys.values())), "get_web_content")
+        with ThreadPoolExecutor(max_workers=min(config.web_batch_workers, len(pending))) as executor:
+            fetched.update(zip(pending, executor.map(fetch, pending)))
+    results = [fetched[url] for url in urls]
+    elapsed = time.perf_counter() - started
+    
+    failed = sum(1 for text, _ in results if not is_cacheable_result(text))
+    sections = [f"Fetched {len(urls) - failed} of {len(urls)} pages in {elapsed:.2f}s"]
+    for number, (url, (text, seconds)) in enumerate(zip(urls, results), 1):
+        status = "error" if not is_cacheable_result(text) else "ok"
+        if url in pending:
+            text = focus_observation(text, url, config.web_content_max_chars)
+            text = deduplicate_observation(text, "get_web_content", url)
+        sections.append(f"[{number}] {url} ({status}, {seconds:.2f}s)\n{text}")
+    if skipped:
+        sections.append(f"Skipped {len(skipped)} URLs over the batch limit of {config.web_batch_max_urls}: {', '.join(skipped)}")
+    return "\n\n".join(sections)
+
 def search_news(query: str) -> str:
     """
     Search for recent news articles related to the query.
     """
     try:
-        # Use DuckDuckGo to search for recent news
-        search_wrapper = DuckDuckGoSearchAPIWrapper(region="en-us", time="d", max_results=5)
-        search_tool = DuckDuckGoSearchRun(api_wrapper=search_wrapper)
-        
+        # Search the past day on major news sites
         news_query = f"{query} site:reuters.com OR site:bbc.com OR site:cnn.com OR site:npr.org OR site:apnews.com"
-        results = search_tool.run(news_query)
+        _, results = search_providers.search(news_query, get_config().max_news_results, region="en-us", time_range="d")
         
         return f"Recent news about '{query}':\n{results}"
         
@@ -63,11 +393,8 @@ def enhanced_web_search(query: str) -> str:
     Enhanced web search that combines multiple search strategies.
     """
     try:
-        search_wrapper = DuckDuckGoSearchAPIWrapper(max_results=8)
-        search_tool = DuckDuckGoSearchRun(api_wrapper=search_wrapper)
-        
-        # Perform search
-        results = search_tool.run(query)
+        # Perform search; a slow provider is hedged with the next configured one
+        _, results = search_providers.search(query, get_config().max_search_results)
         
         # Add timestamp
         timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
@@ -76,14 +403,79 @@ def enhanced_web_search(query: str) -> str:
     except Exception as e:
         return f"Error performing web search: {str(e)}"
 
+def search_local_corpus(query: str) -> str:
+    """
+    Search the configured local document directory and return the best matching passages.
+    """
+    config = get_config()
+    index = get_corpus_index()
+    if index is None:
+        return "Error searching local documents: no local corpus is configured"
+    
+    try:
+        # Pick up added, changed and deleted files without blocking this search
+        index.refresh_if_stale(config.local_corpus_refresh_seconds)
+        results = index.search(query, config.local_corpus_max_results)
+    except Exception as e:
+        return f"Error searching local documents: {str(e)}"
+    
+    if not results:
+        if index.refreshing:
+            return f"No local documents matched '{query}' yet; the local corpus is still being indexed."
+        return f"No local documents matched '{query}'."
+    
+    sections = [f"Local documents matching '{query}':"]
+    for number, result in enumerate(results, 1):
+        sections.append(f"[{number}] {result['path']} - {result['title']}\n{result['snippet']}")
+    return deduplicate_observation("\n\n".join(sections), "search_local_corpus", query)
+
+def recall_evidence(query: str) -> str:
+    """
+    Search the observations already gathered in this research session, including by parallel sub-questions.
+    """
+    session = get_session()
+    if session is None or not len(session.evidence):
+        return "No evidence has been gathered in this research session yet."
+    
+    passages = session.evidence.search(query, get_config().evidence_recall_max_chars)
+    if not passages:
+        return f"No gathered evidence matches '{query}'. Gathered so far: {', '.join(session.evidence.labels())}"
+    return deduplicate_observation(f"Gathered evidence about '{query}':\n{passages}", "recall_evidence", query)
+
+# Async versions for AgentExecutor.ainvoke. The search, Wikipedia and arXiv
+# clients are blocking libraries, so each call runs on a worker thread and
+# the event loop overlaps several calls from one model turn.
+
+async def aget_web_contents(tool_input: str) -> str:
+    """Async version of get_web_contents"""
+    return await asyncio.to_thread(get_web_contents, tool_input)
+
+async def asearch_local_corpus(query: str) -> str:
+    """Async version of search_local_corpus"""
+    return await asyncio.to_thread(search_local_corpus, query)
+
+async def arecall_evidence(query: str) -> str:
+    """Async version of recall_evidence"""
+    return await asyncio.to_thread(recall_evidence, query)
+
+async def asearch_news(query: str) -> str:
+    """Async version of search_news"""
+    return await asyncio.to_thread(search_news, query)
+
+async def aenhanced_web_search(query: str) -> str:
+    """Async version of enhanced_web_search"""
+    return await asyncio.to_thread(enhanced_web_search, query)
+
 def get_research_tools():
     """Return a comprehensive list of tools for the research agent"""
+    config = get_config()
+    ranked = config.enable_passage_ranking
     
     # Wikipedia tool
     wikipedia = WikipediaQueryRun(
         api_wrapper=WikipediaAPIWrapper(
-            top_k_results=3,
-            doc_content_chars_max=3000
+            top_k_results=config.max_wikipedia_results,
+            doc_content_chars_max=config.passage_scan_chars if ranked else config.wikipedia_max_chars
         )
     )
     
@@ -91,21 +483,23 @@ def get_research_tools():
     web_search = Tool(
         name="web_search",
         description="Search the web for current information, news, and general knowledge. Use this for recent developments, current events, or when Wikipedia doesn't have enough information.",
-        func=enhanced_web_search
+        func=enhanced_web_search,
+        coroutine=aenhanced_web_search
     )
     
     # News search tool
     news_search = Tool(
         name="news_search",
         description="Search for recent news articles and current events related to the query. Use this specifically for latest news and recent developments.",
-        func=search_news
+        func=search_news,
+        coroutine=asearch_news
     )
     
     # Academic papers search
     arxiv_search = ArxivQueryRun(
         api_wrapper=ArxivAPIWrapper(
-            top_k_results=3,
-            doc_content_chars_max=2000
+            top_k_results=config.max_arxiv_results,
+            doc_content_chars_max=config.passage_scan_chars if ranked else config.arxiv_max_chars
         )
     )
     
@@ -113,7 +507,45 @@ def get_research_tools():
     web_content_tool = Tool(
         name="get_web_content",
         description="Extract text content from a specific web page URL. Use this when you have a specific URL and want to get detailed content from it.",
-        func=get_web_content
+        func=fetch_web_text
+    )
+    
+    # Batch web content tool; caches per URL under the get_web_content tool's entries via pooled_result and fetch_web_text
+    web_contents_tool = Tool(
+        name="get_web_contents",
+        description="Extract text content from several web pages at once. Input is a JSON list or a comma-separated list of URLs. Use this instead of repeated get_web_content calls when you have more than one URL.",
+        func=get_web_contents,
+        coroutine=aget_web_contents
     )
     
-    return [wikipedia, web_search, news_search, arxiv_search, web_content_tool]
+    # Wikipedia and arXiv are guarded here; the other tools guard their own requests.
+    # Long observations are cached whole and cut to their most relevant passages per call.
+    tools = [
+        with_result_cache(wikipedia, provider="wikipedia", budget=config.wikipedia_max_chars, pinned=RESULT_HEADERS),
+        with_result_cache(web_search),
+        with_result_cache(news_search),
+        with_result_cache(arxiv_search, provider="arxiv", budget=config.arxiv_max_chars, pinned=RESULT_HEADERS),
+        with_result_cache(web_content_tool, budget=config.web_content_max_chars)
+    ]
+    tools.append(web_contents_tool)
+    
+    # Evidence tool; answers from observations already made in this session, without any network calls
+    if config.enable_evidence_pool:
+        tools.append(Tool(
+            name="recall_evidence",
+            description="Search the evidence already gathered in this research session, including by other agents researching related questions. Use this before repeating a search that may already have been made.",
+            func=recall_evidence,
+            coroutine=arecall_evidence
+        ))
+    
+    # Local corpus tool; not cached, since the index changes with the files and answers in milliseconds
+    corpus_index = get_corpus_index()
+    if corpus_index is not None:
+        corpus_index.start_background_refresh()
+        tools.append(Tool(
+            name="search_local_corpus",
+            description="Search the user's local document collection (notes, papers, saved pages) for passages matching the query. Use this first when the question may be answered by the user's own documents.",
+            func=search_local_corpus,
+            coroutine=asearch_local_corpus
+        ))
+    return tools